@@ -1,10 +1,15 @@
 from django.contrib import admin
-from .models import Grado, Seccion, Apoderado, Estudiante, Asistencia
+from .models import Grado, Seccion, Apoderado, Estudiante, Asistencia, ResumenDiario, DiaNoLectivo, EjecucionTarea, ImportJob, SubidaArchivo
 #Esto te permite ver y gestionar todos los datos desde el panel de administración.
 admin.site.register(Grado)
 admin.site.register(Seccion)
 admin.site.register(Apoderado)
 admin.site.register(Estudiante)
 admin.site.register(Asistencia)
+admin.site.register(ResumenDiario)
+admin.site.register(DiaNoLectivo)
+admin.site.register(EjecucionTarea)
+admin.site.register(ImportJob)
+admin.site.register(SubidaArchivo)
 
 # Register your models here.
@@ -0,0 +1,106 @@
+"""
+Calendario escolar en memoria.
+
+Son lectivos los días de lunes a viernes que no estén en ``DiaNoLectivo``.
+Cada worker guarda los días no lectivos en un ``frozenset`` más una tupla
+ordenada (para contar por rango con ``bisect``); se invalidan con las
+señales de ``DiaNoLectivo`` con una ``versiones.Version``, igual que
+``resolver.py``.
+
+Las operaciones por rango (``contar_lectivos``, ``dias_lectivos``) se
+calculan con aritmética de fechas sobre ese conjunto: semanas completas x 5
+más el resto, menos los feriados del rango. Recalcular meses completos no
+hace ninguna consulta por día.
+"""
+
+import bisect
+import threading
+from datetime import timedelta
+
+from .versiones import Version
+
+# Lunes=0 ... Viernes=4
+DIAS_SEMANA_LECTIVOS = frozenset(range(5))
+
+_VERSION = Version('asistencia:calendario:version')
+
+_lock = threading.Lock()
+_conjunto = None
+_ordenados = None
+_version = None
+
+
+def _cargar():
+    global _conjunto, _ordenados, _version
+    from .models import DiaNoLectivo
+    version = _VERSION.leer()
+    fechas = frozenset(DiaNoLectivo.objects.values_list('fecha', flat=True))
+    # Solo los que caen entre semana restan días lectivos
+    ordenados = tuple(sorted(f for f in fechas if f.weekday() in DIAS_SEMANA_LECTIVOS))
+    with _lock:
+        _conjunto, _ordenados, _version = fechas, ordenados, version
+    return fechas, ordenados
+
+
+def _datos():
+    conjunto, ordenados = _conjunto, _ordenados
+    if conjunto is None or _VERSION.leer() != _version:
+        conjunto, ordenados = _cargar()
+    return conjunto, ordenados
+
+
+def no_lectivos():
+    """``frozenset`` con las fechas de ``DiaNoLectivo``."""
+    return _datos()[0]
+
+
+def es_lectivo(fecha):
+    return fecha.weekday() in DIAS_SEMANA_LECTIVOS and fecha not in no_lectivos()
+
+
+def _dias_de_semana(desde, hasta):
+    """Cantidad de días lunes-viernes entre ``desde`` y ``hasta`` (inclusive)."""
+    total = (hasta - desde).days + 1
+    if total <= 0:
+        return 0
+    semanas, resto = divmod(total, 7)
+    inicio = desde.weekday()
+    return semanas * len(DIAS_SEMANA_LECTIVOS) + sum(
+        1 for i in range(resto) if (inicio + i) % 7 in DIAS_SEMANA_LECTIVOS
+    )
+
+
+def contar_lectivos(desde, hasta):
+    """Número de días lectivos entre ``desde`` y ``hasta`` (inclusive)."""
+    _, ordenados = _datos()
+    feriados = bisect.bisect_right(ordenados, hasta) - bisect.bisect_left(ordenados, desde)
+    return max(_dias_de_semana(desde, hasta) - feriados, 0)
+
+
+def dias_lectivos(desde, hasta):
+    """Lista de fechas lectivas entre ``desde`` y ``hasta`` (inclusive)."""
+    conjunto = no_lectivos()
+    inicio = desde.weekday()
+    return [
+        desde + timedelta(days=i)
+        for i in range((hasta - desde).days + 1)
+        if (inicio + i) % 7 in DIAS_SEMANA_LECTIVOS and desde + timedelta(days=i) not in conjunto
+    ]
+
+
+def excluir_no_lectivos(queryset, campo='fecha'):
+    """Quita de ``queryset`` las filas cuyo ``campo`` cae en un día no lectivo."""
+    # __week_day de Django: 1=domingo ... 7=sábado
+    fines = [(d + 1) % 7 + 1 for d in range(7) if d not in DIAS_SEMANA_LECTIVOS]
+    queryset = queryset.exclude(**{f'{campo}__week_day__in': fines})
+    conjunto = no_lectivos()
+    if conjunto:
+        queryset = queryset.exclude(**{f'{campo}__in': conjunto})
+    return queryset
+
+
+def invalidar():
+    global _conjunto
+    with _lock:
+        _conjunto = None
+    _VERSION.publicar_al_confirmar()
@@ -0,0 +1,46 @@
+"""
+Estadísticas del dashboard.
+
+Los conteos del día salen de un solo ``aggregate`` sobre las filas de
+``ResumenDiario`` de la fecha (una por sección, en lugar de recontar
+``Asistencia``) y los totales de catálogo de otro ``aggregate`` sobre
+``Grado``. El resultado se guarda en el
+cache con un TTL corto; cada escritura de asistencia (``registro.py``) y los
+cambios de estudiantes/grados (``signals.py``) lo invalidan, así el
+dashboard que queda abierto y se recarga toda la mañana casi nunca consulta
+la base de datos.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from . import resumen
+from .models import Grado, ResumenDiario
+
+TTL_SEGUNDOS = 30
+
+
+def _clave(fecha):
+    return f'asistencia:dashboard:{fecha}'
+
+
+def resumen_del_dia(fecha):
+    """Diccionario con los totales que muestra el dashboard para ``fecha``."""
+    clave = _clave(fecha)
+    datos = cache.get(clave)
+    if datos is not None:
+        return datos
+
+    datos = resumen.totales(ResumenDiario.objects.filter(fecha=fecha))
+    datos['asistencias_hoy'] = datos.pop('total')
+    # Todo estudiante tiene grado, así que el LEFT JOIN cuenta a todos
+    datos.update(Grado.objects.aggregate(
+        total_grados=Count('id', distinct=True),
+        total_estudiantes=Count('estudiante', distinct=True),
+    ))
+    cache.set(clave, datos, TTL_SEGUNDOS)
+    return datos
+
+
+def invalidar(*fechas):
+    cache.delete_many([_clave(fecha) for fecha in fechas])
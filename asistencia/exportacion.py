@@ -0,0 +1,100 @@
+"""
+Exportación del reporte de asistencia a CSV y XLSX con memoria constante.
+
+Las filas se leen con ``values_list(...).iterator(chunk_size=...)`` (sin
+instanciar modelos ni cachear el queryset) y se escriben a medida que llegan:
+
+* CSV: cada fila se entrega directamente a ``StreamingHttpResponse``.
+* XLSX: openpyxl en modo ``write_only`` vuelca cada fila a disco; el archivo
+  final se guarda en un ``SpooledTemporaryFile`` (en memoria hasta
+  ``MAX_EN_MEMORIA``, luego en disco) y se envía por bloques. Fecha y hora
+  van como celdas de fecha/hora, no como texto.
+
+Limitación: un .xlsx es un zip y openpyxl no puede emitirlo antes de
+cerrarlo, así que el primer byte del XLSX sale cuando terminó de escribirse
+todo el libro (el CSV sí empieza de inmediato). La memoria no depende del
+número de filas.
+"""
+
+import csv
+import tempfile
+
+try:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    _HAS_OPENPYXL = True
+except Exception:
+    _HAS_OPENPYXL = False
+
+CHUNK_FILAS = 2000
+BLOQUE_BYTES = 64 * 1024
+MAX_EN_MEMORIA = 8 * 1024 * 1024
+
+ENCABEZADOS = ['Fecha', 'Hora', 'Estudiante', 'DNI', 'Grado', 'Sección', 'Estado', 'Observación']
+_CAMPOS = (
+    'fecha', 'hora', 'estudiante__nombre', 'estudiante__apellido', 'estudiante__dni',
+    'estudiante__grado__nombre', 'estudiante__seccion__nombre', 'estado', 'observacion',
+)
+_ESTADOS = {'puntual': 'Puntual', 'tarde': 'Tarde', 'falta': 'Falta'}
+
+
+def filas(asistencias, como_texto=True):
+    """
+    Genera las filas del reporte (mismas columnas que la tabla HTML). Con
+    ``como_texto=False`` la fecha y la hora quedan como ``date``/``time``.
+    """
+    consulta = asistencias.order_by('-fecha', '-hora', 'id').values_list(*_CAMPOS)
+    for fecha, hora, nombre, apellido, dni, grado, seccion, estado, observacion in consulta.iterator(chunk_size=CHUNK_FILAS):
+        yield [
+            fecha.strftime('%d/%m/%Y') if como_texto else fecha,
+            hora.strftime('%H:%M') if como_texto else hora,
+            f'{nombre} {apellido}',
+            dni,
+            grado,
+            seccion,
+            _ESTADOS.get(estado, estado),
+            observacion or '',
+        ]
+
+
+class _Eco:
+    """Objeto tipo archivo para ``csv.writer`` que devuelve lo escrito."""
+
+    def write(self, valor):
+        return valor
+
+
+def csv_stream(asistencias):
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel abra el CSV con tildes correctas
+    yield '﻿' + escritor.writerow(ENCABEZADOS)
+    for fila in filas(asistencias):
+        yield escritor.writerow(fila)
+
+
+def xlsx_stream(asistencias):
+    """Escribe el XLSX en un temporal (modo write-only) y lo entrega por bloques."""
+    if not _HAS_OPENPYXL:
+        raise RuntimeError('openpyxl no está instalado. Instala con: pip install openpyxl')
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet('Asistencias')
+    hoja.append(ENCABEZADOS)
+    for fecha, hora, *resto in filas(asistencias, como_texto=False):
+        celda_fecha = WriteOnlyCell(hoja, value=fecha)
+        celda_fecha.number_format = 'DD/MM/YYYY'
+        celda_hora = WriteOnlyCell(hoja, value=hora)
+        celda_hora.number_format = 'HH:MM'
+        hoja.append([celda_fecha, celda_hora, *resto])
+    temporal = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+    libro.save(temporal)
+    temporal.seek(0)
+
+    def bloques():
+        with temporal:
+            while True:
+                bloque = temporal.read(BLOQUE_BYTES)
+                if not bloque:
+                    break
+                yield bloque
+
+    return bloques()
@@ -18,3 +18,4 @@ class SeccionMultipleForm(forms.Form):
 class ImportFileForm(forms.Form):
     archivo = forms.FileField(label='Archivo (.xlsx o .csv)')
     periodo = forms.IntegerField(required=False, label='Periodo (año)', initial=timezone.now().year)
+    vista_previa = forms.BooleanField(required=False, initial=True, label='Revisar los cambios antes de importar')
@@ -0,0 +1,42 @@
+"""
+Reglas de horario para el registro de asistencia.
+
+- Registro permitido desde las 12:00 hasta las 17:30
+- Puntual: 12:00 - 12:30 (inclusive)
+- Tarde: después de 12:30 hasta 17:30
+- Después de las 17:30 no se registra; las faltas las marca ``marcar_faltas``
+  (un escaneo de kiosko sin conexión que se sincroniza después reemplaza la
+  falta, ver ``registro.py``)
+"""
+
+from datetime import time
+
+EARLIEST_REGISTRO = time(12, 0)
+INICIO_CLASE = time(12, 30)
+LIMITE_PUNTUAL = time(12, 30)
+FIN_CLASE = time(17, 30)
+
+
+def formato_hora(hora, segundos=False):
+    """Formato de 12 horas usado en los mensajes (ej. 12:05 pm)."""
+    fmt = '%I:%M:%S %p' if segundos else '%I:%M %p'
+    return hora.strftime(fmt).lstrip('0').replace('AM', 'am').replace('PM', 'pm')
+
+
+def estado_para(hora):
+    """
+    Devuelve 'puntual' o 'tarde' según la hora local (naive), o ``None`` si
+    la hora está fuera del horario de registro.
+    """
+    if hora < EARLIEST_REGISTRO or hora > FIN_CLASE:
+        return None
+    if hora <= LIMITE_PUNTUAL:
+        return 'puntual'
+    return 'tarde'
+
+
+def mensaje_fuera_de_horario(hora):
+    """Mensaje para un escaneo rechazado por horario (mismo texto de la vista QR)."""
+    if hora < EARLIEST_REGISTRO:
+        return f'No es posible registrar asistencia: el horario de registro inicia a las {formato_hora(EARLIEST_REGISTRO)}'
+    return f'No es posible registrar asistencia: el horario de clase finalizó a las {formato_hora(FIN_CLASE)}'
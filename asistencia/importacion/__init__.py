@@ -0,0 +1,8 @@
+"""
+Importación masiva de estudiantes (la usa ``import_estudiantes``).
+
+- ``lectura``: lee el .xlsx/.csv en streaming y agrupa las filas en lotes.
+- ``columnas``: resuelve los encabezados a campos una vez por archivo y arma el
+  extractor de filas.
+- ``motor``: escribe los estudiantes por lotes con los catálogos precargados.
+"""
@@ -0,0 +1,253 @@
+"""
+Cola de importaciones en la base de datos (``ImportJob``).
+
+La vista de subida solo guarda el archivo y llama a ``encolar``; el comando
+``procesar_importaciones`` (proceso ``worker`` del Procfile) toma trabajos
+con ``tomar`` y los ejecuta con ``ejecutar``. Así una importación no muere
+cuando gunicorn recicla un worker web y no compiten varias importaciones a
+la vez por la base de datos.
+
+- ``tomar`` usa ``select_for_update(skip_locked=True)``: varios workers
+  pueden revisar la cola a la vez sin tomar el mismo trabajo. No toma nada
+  si ya hay ``limite`` trabajos activos en todos los workers (por defecto
+  ``ASISTENCIA_IMPORTACION_CONCURRENCIA``). Contar
+  los activos y tomar el trabajo se serializa entre workers con un lock
+  consultivo de PostgreSQL (``pg_advisory_xact_lock``) dentro de la misma
+  transacción; si no, dos workers podrían contar a la vez y pasarse del
+  límite.
+- Mientras corre, un hilo actualiza ``latido`` cada ``LATIDO`` segundos. Un
+  trabajo ``procesando`` sin latido en ``LATIDO_VENCIDO`` (el worker murió)
+  vuelve a la cola con ``recuperar_vencidos``.
+- Un error inesperado se reintenta hasta ``ASISTENCIA_IMPORTACION_INTENTOS``
+  veces con espera creciente. Los errores del archivo (formato, columnas)
+  no se reintentan. El reintento sigue desde el punto de control del
+  trabajo (``punto_control``, que ``import_estudiantes`` guarda con cada lote
+  confirmado), así que solo repite el lote que estaba en curso.
+- Cada cambio de un trabajo (tomado, progreso, fin) cambia su versión en el
+  cache con ``notificar``. ``import_status`` usa ``etag`` para responder 304
+  si el estado no cambió y ``aesperar`` para la espera larga (long polling)
+  sin consultar la base de datos en cada vuelta.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from asistencia.models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+LATIDO = 15
+LATIDO_VENCIDO = timedelta(minutes=2)
+ESPERA_REINTENTO = timedelta(minutes=1)
+
+# Estado del modelo -> estado que muestra la página de importación
+ESTADOS_WEB = {'pendiente': 'queued', 'procesando': 'processing', 'ok': 'done', 'error': 'failed'}
+ESTADOS_ACTIVOS = ('pendiente', 'procesando')
+
+# Cada cuánto revisa ``aesperar`` la versión en el cache
+INTERVALO_ESPERA = 0.5
+
+# Clave del lock consultivo de ``tomar`` (cualquier entero de 64 bits fijo)
+LOCK_TOMAR = 0x61736973_746f6d61
+
+
+def _instancia():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def concurrencia():
+    return getattr(settings, 'ASISTENCIA_IMPORTACION_CONCURRENCIA', 1)
+
+
+def max_intentos():
+    return getattr(settings, 'ASISTENCIA_IMPORTACION_INTENTOS', 3)
+
+
+def ruta(trabajo):
+    return os.path.join(settings.MEDIA_ROOT or 'media', 'uploads', trabajo.archivo)
+
+
+def encolar(archivo, periodo=None):
+    """Agrega a la cola el archivo ``archivo`` (nombre dentro de media/uploads)."""
+    return ImportJob.objects.create(archivo=archivo, periodo=periodo)
+
+
+def _clave(trabajo_id):
+    return f'asistencia:importjob:{trabajo_id}:version'
+
+
+def notificar(trabajo_id):
+    """Marca que el trabajo cambió; despierta a quien espera en ``aesperar``."""
+    cache.set(_clave(trabajo_id), uuid.uuid4().hex, None)
+
+
+def version(trabajo_id):
+    return cache.get(_clave(trabajo_id))
+
+
+async def aesperar(trabajo_id, anterior, segundos):
+    """
+    Espera hasta ``segundos`` a que la versión del trabajo deje de ser
+    ``anterior``. Devuelve ``True`` si cambió.
+    """
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        if await cache.aget(_clave(trabajo_id)) != anterior:
+            return True
+        await asyncio.sleep(INTERVALO_ESPERA)
+    return False
+
+
+def etag(estado):
+    """ETag (entre comillas) del dict de estado que devuelve ``import_status``."""
+    contenido = json.dumps(estado, sort_keys=True, default=str).encode()
+    return '"%s"' % hashlib.md5(contenido, usedforsecurity=False).hexdigest()
+
+
+def como_estado(trabajo):
+    """Progreso y resultado en el formato que consume ``import_status``."""
+    # Lote activo (se puede revertir); usa el prefetch de 'lotes' si lo hay
+    lote = next((l.pk for l in trabajo.lotes.all() if l.estado == 'activo'), None)
+    return {
+        'id': trabajo.archivo,
+        'status': ESTADOS_WEB.get(trabajo.estado, trabajo.estado),
+        'periodo': trabajo.periodo,
+        'uploaded_at': trabajo.creado,
+        'started_at': trabajo.inicio,
+        'finished_at': trabajo.fin,
+        'processed': trabajo.procesados,
+        'total': trabajo.total,
+        'created': trabajo.creados,
+        'updated': trabajo.actualizados,
+        'unchanged': trabajo.sin_cambios,
+        'errors_log': trabajo.errores_log or None,
+        'attempts': trabajo.intentos,
+        'message': trabajo.mensaje,
+        'batch': lote,
+    }
+
+
+def _bloquear_toma():
+    """
+    Serializa ``tomar`` hasta el fin de la transacción. En SQLite no hace
+    falta: solo hay un escritor a la vez y la segunda toma falla al escribir.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [LOCK_TOMAR])
+
+
+def tomar(ahora=None, limite=None):
+    """
+    Toma el trabajo pendiente más antiguo y lo marca ``procesando``.
+    Devuelve ``None`` si no hay pendientes o ya hay ``limite`` trabajos
+    activos (por defecto ``concurrencia()``).
+    """
+    ahora = ahora or timezone.now()
+    limite = limite or concurrencia()
+    with transaction.atomic():
+        _bloquear_toma()
+        activos = ImportJob.objects.filter(estado='procesando', latido__gte=ahora - LATIDO_VENCIDO).count()
+        if activos >= limite:
+            return None
+        trabajo = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(estado='pendiente', disponible_desde__lte=ahora)
+            .order_by('disponible_desde', 'id')
+            .first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = 'procesando'
+        trabajo.intentos += 1
+        trabajo.inicio = ahora
+        trabajo.latido = ahora
+        trabajo.fin = None
+        trabajo.instancia = _instancia()
+        trabajo.mensaje = ''
+        trabajo.save(update_fields=['estado', 'intentos', 'inicio', 'latido', 'fin', 'instancia', 'mensaje'])
+    notificar(trabajo.pk)
+    return trabajo
+
+
+def _fallo(trabajo, mensaje, reintentar=True, ahora=None):
+    """Devuelve el trabajo a la cola con espera creciente o lo deja en error."""
+    ahora = ahora or timezone.now()
+    if reintentar and trabajo.intentos < max_intentos():
+        espera = ESPERA_REINTENTO * 2 ** max(trabajo.intentos - 1, 0)
+        campos = {'estado': 'pendiente', 'disponible_desde': ahora + espera, 'mensaje': f'Reintento {trabajo.intentos + 1}: {mensaje}'}
+    else:
+        campos = {'estado': 'error', 'fin': ahora, 'mensaje': mensaje}
+    # Solo si sigue siendo nuestro (otro worker pudo haberlo retomado)
+    ImportJob.objects.filter(pk=trabajo.pk, estado='procesando', instancia=trabajo.instancia).update(**campos)
+    notificar(trabajo.pk)
+
+
+def recuperar_vencidos(ahora=None):
+    """Reencola (o marca con error) los trabajos cuyo worker dejó de dar latidos."""
+    ahora = ahora or timezone.now()
+    recuperados = 0
+    with transaction.atomic():
+        vencidos = ImportJob.objects.select_for_update(skip_locked=True).filter(
+            estado='procesando', latido__lt=ahora - LATIDO_VENCIDO,
+        )
+        for trabajo in vencidos:
+            _fallo(trabajo, f'El worker {trabajo.instancia} dejó de responder', ahora=ahora)
+            recuperados += 1
+    return recuperados
+
+
+def _latir(trabajo_id, detener):
+    try:
+        while not detener.wait(LATIDO):
+            ImportJob.objects.filter(pk=trabajo_id, estado='procesando').update(latido=timezone.now())
+    except Exception:
+        logger.exception('No se pudo registrar el latido de la importación %s', trabajo_id)
+    finally:
+        connection.close()
+
+
+def ejecutar(trabajo):
+    """Ejecuta ``import_estudiantes`` para un trabajo ya tomado con ``tomar``."""
+    detener = threading.Event()
+    latidos = threading.Thread(target=_latir, args=(trabajo.pk, detener), daemon=True)
+    latidos.start()
+    salida = StringIO()
+    try:
+        opciones = {'trabajo': trabajo.pk, 'stdout': salida}
+        if trabajo.periodo:
+            opciones['periodo'] = trabajo.periodo
+        call_command('import_estudiantes', ruta(trabajo), **opciones)
+    except CommandError as e:
+        # Problema del archivo: reintentar no sirve
+        _fallo(trabajo, str(e), reintentar=False)
+    except Exception as e:
+        logger.exception('Importación %s falló', trabajo.archivo)
+        _fallo(trabajo, f'{type(e).__name__}: {e}')
+    else:
+        resumen = salida.getvalue().strip().splitlines()
+        ImportJob.objects.filter(pk=trabajo.pk, estado='procesando', instancia=trabajo.instancia).update(
+            estado='ok', fin=timezone.now(), mensaje=resumen[-1] if resumen else '',
+        )
+        notificar(trabajo.pk)
+    finally:
+        detener.set()
+        latidos.join()
+    trabajo.refresh_from_db()
+    return trabajo
@@ -0,0 +1,259 @@
+"""
+Mapeo de columnas del padrón a campos del estudiante.
+
+``resolver_columnas`` se ejecuta una sola vez por archivo: compara los
+encabezados normalizados con los alias conocidos de cada campo (``CAMPOS``,
+en orden de prioridad) y falla con ``ErrorColumnas`` si el archivo no trae lo
+mínimo (DNI, nombres y apellidos). El ``Mapeo`` resultante guarda, por campo,
+los índices de las columnas presentes, y ``Mapeo.extractor()`` devuelve una
+función que convierte una fila (tupla) en los datos del estudiante usando
+solo indexación y expresiones regulares ya compiladas.
+
+Lo usan ``import_estudiantes`` (a través del motor), ``rollback_import`` y la
+vista previa de la subida web.
+"""
+
+import datetime as _dt
+import re
+from collections import namedtuple
+
+# Campo lógico -> encabezados normalizados aceptados (el primero con valor gana)
+CAMPOS = {
+    'nombre': ('nombres', 'nombre', 'first_name'),
+    'apellido_paterno': ('apellido_paterno', 'apellido_p', 'apellido'),
+    'apellido_materno': ('apellido_materno', 'apellido_m'),
+    # tolerate common misspelling 'apelidos_y_nombres'
+    'apellidos_y_nombres': ('apellidos_y_nombres', 'apelidos_y_nombres'),
+    'dni': ('dni', 'documento'),
+    'fecha_nacimiento': ('fecha_nacimiento', 'birthdate'),
+    'grado': ('grado', 'grade', 'grado_seccion', 'curso', 'nivel'),
+    'seccion': ('seccion', 'section', 'seccion_grado'),
+    'codigo_interno': ('codigo_del_estudiante', 'codigo_estudiante', 'codigo', 'codigo_interno'),
+    'estado_matricula': ('estado_de_matricula', 'estado_matricula', 'matricula_estado'),
+    'observaciones': ('observacion', 'observaciones', 'obs'),
+    'ap_nombre': ('apoderado_nombre', 'tutor_nombre'),
+    'ap_apellido': ('apoderado_apellido', 'tutor_apellido'),
+    'ap_celular': ('apoderado_celular', 'tutor_celular'),
+    'ap_correo': ('apoderado_correo', 'tutor_correo'),
+}
+
+# Si no hay un encabezado exacto, se acepta uno que contenga estas palabras
+# (p. ej. 'numero_de_dni', 'nro_documento')
+PARCIALES = {'dni': ('dni', 'documento')}
+# ... salvo que sea de otra persona: 'dni_apoderado' no es el DNI del estudiante
+_OTRA_PERSONA = ('apoderado', 'tutor', 'padre', 'madre', 'representante', 'responsable', 'familiar')
+
+_SEPARADORES = re.compile(r'[\|,;]+')
+# '5-A', '5 A', '5/A'
+_GRADO_SECCION = re.compile(r"^\s*([A-Za-z0-9ñÑ°º]+)\s*[-/\\\s]+\s*([A-Za-z0-9ñÑ]+)\s*$")
+# 'A-5' -> sección-grado
+_SECCION_GRADO = re.compile(r"^\s*([A-Za-zñÑ]+)\s*[-/\\\s]+\s*([0-9]+)\s*$")
+
+_FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y')
+
+
+class ErrorColumnas(Exception):
+    pass
+
+
+class FilaInvalida(Exception):
+    pass
+
+
+def split_grado_seccion(text):
+    if not text:
+        return ('', '')
+    s = str(text).strip()
+    s2 = _SEPARADORES.sub('-', s)
+    m = _GRADO_SECCION.match(s2)
+    if m:
+        return (m.group(1).strip(), m.group(2).strip())
+    m2 = _SECCION_GRADO.match(s2)
+    if m2:
+        return (m2.group(2).strip(), m2.group(1).strip())
+    # If single token with space-separated tokens, take first as grado and last as seccion
+    parts = s.split()
+    if len(parts) >= 2:
+        return (parts[0].strip(), parts[-1].strip())
+    # fallback: return text as grado and empty seccion
+    return (s, '')
+
+
+def parse_fecha(valor):
+    """Fecha desde date/datetime (openpyxl) o texto en formatos comunes."""
+    if not valor:
+        return None
+    if isinstance(valor, _dt.datetime):
+        return valor.date()
+    if isinstance(valor, _dt.date):
+        return valor
+    fs = str(valor).strip()
+    for fmt in _FORMATOS_FECHA:
+        try:
+            return _dt.datetime.strptime(fs, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class Mapeo(namedtuple('Mapeo', ['encabezados', 'indices', 'ignoradas'])):
+    """
+    ``indices``: campo -> tupla de índices de columna (en orden de prioridad).
+    ``ignoradas``: encabezados que no corresponden a ningún campo.
+    """
+
+    def indice(self, campo):
+        """Primer índice de ``campo`` o ``None`` si el archivo no lo trae."""
+        indices = self.indices.get(campo)
+        return indices[0] if indices else None
+
+    def descripcion(self):
+        """``[(campo, [encabezados])]`` para mostrar el mapeo al usuario."""
+        return [(campo, [self.encabezados[i] for i in indices]) for campo, indices in self.indices.items()]
+
+    def como_dict(self, fila):
+        """Fila original como diccionario (para el CSV de errores)."""
+        return dict(zip(self.encabezados, fila))
+
+    def extractor(self):
+        """
+        Función ``fila -> datos`` (mismo resultado que recorrer los alias
+        con ``r.get(a) or r.get(b) ...``). Lanza ``FilaInvalida`` si falta
+        dni, nombre o apellido.
+        """
+        def _getter(campo):
+            indices = self.indices.get(campo, ())
+            if not indices:
+                return lambda fila: None
+            if len(indices) == 1:
+                i = indices[0]
+                return lambda fila: fila[i]
+
+            def primero(fila):
+                for i in indices:
+                    if fila[i]:
+                        return fila[i]
+                return fila[indices[-1]]
+            return primero
+
+        def _texto(getter):
+            def valor(fila):
+                v = getter(fila)
+                return str(v).strip() if v else ''
+            return valor
+
+        nombre_de = _getter('nombre')
+        paterno_de = _getter('apellido_paterno')
+        materno_de = _getter('apellido_materno')
+        completo_de = _getter('apellidos_y_nombres')
+        dni_de = _getter('dni')
+        fecha_de = _getter('fecha_nacimiento')
+        grado_de = _getter('grado')
+        seccion_de = _getter('seccion')
+        celular_de = _getter('ap_celular')
+        textos = {
+            campo: _texto(_getter(campo))
+            for campo in ('codigo_interno', 'estado_matricula', 'observaciones', 'ap_nombre', 'ap_apellido', 'ap_correo')
+        }
+
+        def extraer(fila):
+            nombre = nombre_de(fila) or ''
+            apellido_p = paterno_de(fila) or ''
+            apellido_m = materno_de(fila) or ''
+            apellido = ''
+            if apellido_p or apellido_m:
+                apellido = ' '.join([str(x) for x in (apellido_p, apellido_m) if x])
+            else:
+                completo = completo_de(fila)
+                if completo:
+                    # intentar dividir "APELLIDOS Y NOMBRES" en apellidos y nombres
+                    ac = str(completo)
+                    if ',' in ac:
+                        parts = [p.strip() for p in ac.split(',', 1)]
+                        apellido = parts[0]
+                        if not nombre:
+                            nombre = parts[1]
+                    else:
+                        words = ac.split()
+                        if len(words) >= 3:
+                            # tomar los últimos dos como apellidos
+                            apellido = ' '.join(words[-2:])
+                            if not nombre:
+                                nombre = ' '.join(words[:-2])
+                        else:
+                            # no hay forma clara: asignar todo a apellido
+                            apellido = ac
+
+            nombre = str(nombre).strip() if nombre else ''
+            apellido = apellido.strip()
+            dni = str(dni_de(fila) or '').strip()
+            if not dni or not nombre or not apellido:
+                raise FilaInvalida('fila incompleta (dni/nombre/apellido)')
+
+            grado_nombre, seccion_nombre = split_grado_seccion(grado_de(fila))
+            raw_seccion = seccion_de(fila)
+            # if seccion separately provided, prefer that
+            if raw_seccion:
+                seccion_nombre = str(raw_seccion).strip()
+            datos = {
+                'nombre': nombre,
+                'apellido': apellido,
+                'dni': dni,
+                'fecha_nacimiento': parse_fecha(fecha_de(fila)),
+                'grado': str(grado_nombre).strip() if grado_nombre else '',
+                'seccion': str(seccion_nombre).strip()[:5] if seccion_nombre else '',  # seccion max_length safety
+                'ap_celular': celular_de(fila) or '',
+            }
+            for campo, valor in textos.items():
+                datos[campo] = valor(fila)
+            return datos
+
+        return extraer
+
+
+def resolver_columnas(encabezados, requeridos=None):
+    """
+    Resuelve los encabezados normalizados de un archivo a un ``Mapeo``.
+
+    Sin ``requeridos`` se exige un padrón de estudiantes: DNI y, o bien
+    "apellidos y nombres", o bien nombres y algún apellido. Con
+    ``requeridos`` (tupla de campos) solo se exigen esos.
+    """
+    posicion = {}
+    for i, h in enumerate(encabezados):
+        if h:
+            # Con encabezados repetidos gana la última columna (como dict(zip(...)))
+            posicion[h] = i
+    indices = {}
+    for campo, alias in CAMPOS.items():
+        encontrados = tuple(posicion[a] for a in alias if a in posicion)
+        if not encontrados and campo in PARCIALES:
+            encontrados = tuple(
+                i for i, h in enumerate(encabezados)
+                if h and any(p in h for p in PARCIALES[campo]) and not any(o in h for o in _OTRA_PERSONA)
+            )[:1]
+        if encontrados:
+            indices[campo] = encontrados
+    usados = {i for grupo in indices.values() for i in grupo}
+    ignoradas = [h for i, h in enumerate(encabezados) if h and i not in usados]
+    mapeo = Mapeo(list(encabezados), indices, ignoradas)
+
+    if requeridos is not None:
+        faltan = [c for c in requeridos if c not in indices]
+    else:
+        faltan = []
+        if 'dni' not in indices:
+            faltan.append('dni')
+        if 'apellidos_y_nombres' not in indices:
+            if 'nombre' not in indices:
+                faltan.append('nombres')
+            if 'apellido_paterno' not in indices and 'apellido_materno' not in indices:
+                faltan.append('apellido_paterno/apellido_materno')
+    if faltan:
+        esperadas = ', '.join(CAMPOS['dni'] + CAMPOS['nombre'] + CAMPOS['apellido_paterno'] + CAMPOS['apellidos_y_nombres'])
+        raise ErrorColumnas(
+            f"Formato de columnas no reconocido: falta {', '.join(faltan)}. "
+            f"Encabezados del archivo: {', '.join(h for h in encabezados if h) or '(ninguno)'}. "
+            f"Se esperan columnas como: {esperadas}."
+        )
+    return mapeo
@@ -0,0 +1,130 @@
+"""
+Lectura en streaming de padrones Excel/CSV.
+
+``Lector`` abre el archivo, lee solo la fila de encabezados y luego entrega
+las filas de a una (tuplas alineadas con los encabezados), sin cargar el
+archivo completo: openpyxl en modo ``read_only`` para .xlsx y ``csv.reader``
+perezoso para .csv. ``en_lotes`` agrupa cualquier iterable en listas de
+tamaño fijo, así el importador escribe el primer lote mientras el resto del
+archivo todavía no se ha leído y la memoria no depende del número de filas.
+"""
+
+import csv
+import os
+import re
+import unicodedata
+from itertools import islice
+
+try:
+    import openpyxl
+    _HAS_OPENPYXL = True
+except Exception:
+    _HAS_OPENPYXL = False
+
+EXTENSIONES_EXCEL = ('.xls', '.xlsx')
+
+
+class ErrorLectura(Exception):
+    pass
+
+
+def normalizar_clave(k):
+    """Quita acentos y convierte el encabezado a snake_case en minúsculas."""
+    if not k:
+        return ''
+    # remover acentos
+    nk = unicodedata.normalize('NFKD', str(k)).encode('ascii', 'ignore').decode('ascii')
+    # reemplazar no-alphanum por guion bajo
+    return re.sub(r'[^0-9a-zA-Z]+', '_', nk).strip('_').lower()
+
+
+def en_lotes(iterable, tamano):
+    """Agrupa ``iterable`` en listas de hasta ``tamano`` elementos."""
+    iterador = iter(iterable)
+    while True:
+        lote = list(islice(iterador, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+class Lector:
+    """
+    Lector de un archivo .xlsx o .csv. Usar como context manager::
+
+        with Lector(ruta) as lector:
+            lector.encabezados      # normalizados
+            for fila in lector:     # tuplas del mismo largo que encabezados
+                ...
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.extension = os.path.splitext(filepath)[1].lower()
+        self._libro = None
+        self._archivo = None
+        if self.extension in EXTENSIONES_EXCEL:
+            if not _HAS_OPENPYXL:
+                raise ErrorLectura('openpyxl no está instalado. Instala con: pip install openpyxl')
+            self._libro = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+            hoja = self._libro.active
+            self._filas = hoja.iter_rows(values_only=True)
+            self._max_row = hoja.max_row
+        elif self.extension == '.csv':
+            self._archivo = open(filepath, newline='', encoding='utf-8')
+            self._filas = csv.reader(self._archivo)
+        else:
+            raise ErrorLectura('Formato no soportado. Usa .xlsx o .csv')
+        self.encabezados_originales = list(next(self._filas, None) or [])
+        self.encabezados = [normalizar_clave(h) for h in self.encabezados_originales]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._libro is not None:
+            self._libro.close()
+            self._libro = None
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+    def __iter__(self):
+        ancho = len(self.encabezados)
+        for fila in self._filas:
+            if not fila:
+                # Línea en blanco del CSV (csv.DictReader también las salta)
+                continue
+            fila = tuple(fila)
+            if len(fila) < ancho:
+                fila = fila + (None,) * (ancho - len(fila))
+            elif len(fila) > ancho:
+                fila = fila[:ancho]
+            yield fila
+
+    def dicts(self):
+        """Filas como diccionarios ``{encabezado_normalizado: valor}``."""
+        encabezados = self.encabezados
+        for fila in self:
+            yield dict(zip(encabezados, fila))
+
+    def total_estimado(self):
+        """
+        Número de filas de datos sin parsearlas (para la barra de progreso).
+        En .csv se cuentan saltos de línea, así que un campo con saltos de
+        línea adentro puede sobrestimarlo.
+        """
+        if self.extension in EXTENSIONES_EXCEL:
+            return max((self._max_row or 1) - 1, 0)
+        lineas = 0
+        ultimo = b'\n'
+        with open(self.filepath, 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                lineas += bloque.count(b'\n')
+                ultimo = bloque[-1:]
+        if ultimo != b'\n':
+            lineas += 1
+        return max(lineas - 1, 0)
@@ -0,0 +1,141 @@
+"""
+Reversión de lotes de importación (``LoteImportacion``).
+
+El motor registra un ``CambioImportacion`` por estudiante creado o
+actualizado, con los valores previos de ``CAMPOS_LOTE``. ``revertir`` deshace
+el lote en una transacción y sin el archivo original:
+
+- los estudiantes creados se borran con ``DELETE ... WHERE id IN``, junto
+  con todo lo que los referencia (asistencias y cambios; ``_BORRAR_ANTES``
+  debe cubrir cada modelo con FK a ``Estudiante``), sin cargar cada fila.
+  Lo que harían las señales de ``post_delete`` se hace una vez para todo el
+  lote: se olvidan los días en ``registrados``, se reconstruye
+  ``ResumenDiario`` solo en las secciones y fechas afectadas y se
+  invalidan el resolver QR y las estadísticas;
+- los actualizados recuperan sus valores previos con un ``bulk_update``; si
+  vuelven a otra sección, sus dos secciones entran en la reconstrucción.
+
+No se revierte un lote si un lote posterior (activo) tocó a los mismos
+estudiantes: habría que revertir primero el posterior. Los grados, secciones
+y apoderados creados por la importación se conservan.
+"""
+
+import datetime as _dt
+
+from django.db import transaction
+from django.utils import timezone
+
+from asistencia import estadisticas, registrados, resolver, resumen
+from asistencia.importacion.lectura import en_lotes
+from asistencia.importacion.motor import CAMPOS_LOTE, TAMANO_LOTE
+from asistencia.models import Asistencia, CambioImportacion, Estudiante, LoteImportacion
+
+
+class ErrorReversion(Exception):
+    pass
+
+
+# Modelos con FK a Estudiante, en el orden en que se borran antes que él
+_BORRAR_ANTES = (Asistencia, CambioImportacion)
+
+
+def _borrar(queryset):
+    """
+    Un solo ``DELETE ... WHERE`` sin cargar filas ni disparar señales.
+
+    ``_raw_delete`` es API interna de Django (la que usa el propio
+    ``Collector`` para sus borrados rápidos). ``queryset.delete()`` no sirve:
+    Estudiante y Asistencia tienen receptores de ``post_delete``, así que el
+    ``Collector`` cargaría cada fila y llamaría a las señales una por una.
+
+    Las cascadas no hacen falta: ``revertir`` borra antes los modelos de
+    ``_BORRAR_ANTES`` y ``_relacionados_completos`` se niega a seguir si
+    aparece otra relación hacia Estudiante o hacia esos modelos. Lo que
+    harían las señales (``registrados``, ``ResumenDiario``, resolver QR y
+    estadísticas) lo hace ``revertir`` explícitamente al final.
+    """
+    return queryset._raw_delete(queryset.db)
+
+
+def _relacionados_completos():
+    """
+    Verifica que ``_BORRAR_ANTES`` cubre todas las relaciones hacia
+    ``Estudiante`` y que ningún modelo apunta a los de ``_BORRAR_ANTES``
+    (``_borrar`` no sigue cascadas).
+    """
+    relacionados = {
+        r.related_model for r in Estudiante._meta.related_objects if r.one_to_many or r.one_to_one
+    }
+    dependientes = [r for modelo in _BORRAR_ANTES for r in modelo._meta.related_objects]
+    return relacionados <= set(_BORRAR_ANTES) and not dependientes
+
+
+def _restaurado(estudiante_id, anterior):
+    valores = dict(anterior)
+    if valores.get('fecha_nacimiento'):
+        valores['fecha_nacimiento'] = _dt.date.fromisoformat(valores['fecha_nacimiento'])
+    return Estudiante(pk=estudiante_id, **valores)
+
+
+def revertir(lote_id):
+    """
+    Revierte el lote ``lote_id``. Devuelve ``(eliminados, restaurados)``.
+    Lanza ``ErrorReversion`` si no se puede.
+    """
+    with transaction.atomic():
+        lote = LoteImportacion.objects.select_for_update().filter(pk=lote_id).first()
+        if lote is None:
+            raise ErrorReversion(f'No existe el lote {lote_id}')
+        if lote.estado != 'activo':
+            raise ErrorReversion(f'El lote {lote_id} ya fue revertido')
+        posteriores = (
+            CambioImportacion.objects.filter(lote__estado='activo', lote_id__gt=lote.pk)
+            .filter(estudiante__cambios_importacion__lote=lote)
+            .values_list('lote_id', flat=True).distinct()
+        )
+        posteriores = sorted(set(posteriores))
+        if posteriores:
+            raise ErrorReversion(
+                f"Lotes posteriores modificaron a los mismos estudiantes; reviértelos primero: {', '.join(map(str, posteriores))}"
+            )
+
+        if not _relacionados_completos():
+            raise ErrorReversion('Hay relaciones hacia Estudiante que la reversión no sabe borrar')
+        creados = list(lote.cambios.filter(creado=True).values_list('estudiante_id', flat=True))
+        fechas = set()
+        secciones = set()
+        for ids in en_lotes(creados, TAMANO_LOTE):
+            asistencias = Asistencia.objects.filter(estudiante_id__in=ids)
+            for fecha, seccion_id in asistencias.values_list('fecha', 'estudiante__seccion_id').distinct():
+                fechas.add(fecha)
+                secciones.add(seccion_id)
+            for modelo in _BORRAR_ANTES:
+                _borrar(modelo.objects.filter(estudiante_id__in=ids))
+            _borrar(Estudiante.objects.filter(id__in=ids))
+
+        actualizados = lote.cambios.filter(creado=False).values_list('estudiante_id', 'anterior')
+        restaurados = [_restaurado(estudiante_id, anterior) for estudiante_id, anterior in actualizados.iterator()]
+        # Los que vuelven a otra sección mueven sus asistencias en el resumen
+        previas = {e.pk: e.seccion_id for e in restaurados}
+        for ids in en_lotes(list(previas), TAMANO_LOTE):
+            actuales = Estudiante.objects.filter(id__in=ids).values_list('id', 'seccion_id')
+            movidos = {estudiante_id: seccion_id for estudiante_id, seccion_id in actuales if seccion_id != previas[estudiante_id]}
+            if not movidos:
+                continue
+            for estudiante_id, fecha in Asistencia.objects.filter(estudiante_id__in=movidos).values_list('estudiante_id', 'fecha'):
+                fechas.add(fecha)
+                secciones.update((movidos[estudiante_id], previas[estudiante_id]))
+        if restaurados:
+            campos = [c[:-3] if c.endswith('_id') else c for c in CAMPOS_LOTE]
+            Estudiante.objects.bulk_update(restaurados, campos, batch_size=TAMANO_LOTE)
+
+        lote.estado = 'revertido'
+        lote.revertido_en = timezone.now()
+        lote.save(update_fields=['estado', 'revertido_en'])
+
+        if fechas:
+            resumen.reconstruir(min(fechas), max(fechas), secciones=secciones, fechas=fechas)
+    registrados.olvidar_dias(fechas)
+    resolver.invalidar()
+    estadisticas.invalidar(timezone.localdate(), *fechas)
+    return len(creados), len(restaurados)
@@ -0,0 +1,373 @@
+"""
+Motor de importación de estudiantes por lotes.
+
+Antes se hacía, por cada fila, ``get_or_create`` de grado, sección y
+apoderado, un ``Estudiante.objects.get(dni=...)`` y un ``save()``/``create()``.
+El motor precarga los catálogos (grados, secciones y apoderados) en
+diccionarios al empezar, crea los que falten con ``bulk_create`` y escribe los
+estudiantes de cada lote con un ``bulk_update`` y un ``bulk_create`` dentro
+de una transacción. Los estudiantes existentes se buscan con un solo
+``dni__in`` por lote.
+
+Los conteos (creados/actualizados) y las filas con error son los mismos que
+producía el comando fila por fila: un DNI repetido en el archivo cuenta como
+una creación y luego una actualización, aunque repita los mismos datos.
+
+``bulk_create``/``bulk_update`` no disparan señales, así que ``finalizar``
+invalida el mapa de códigos QR y las estadísticas del dashboard.
+
+Cada estudiante guarda la huella (``huella``) de los datos con los que se
+importó. Al reimportar, las filas cuya huella coincide con la guardada antes
+de esta importación se cuentan como ``sin_cambios`` y no se escriben ni
+vuelven a generar su QR.
+
+Si se pasa un ``LoteImportacion``, por cada estudiante creado o actualizado
+se guarda un ``CambioImportacion`` (con los valores previos, ``CAMPOS_LOTE``)
+para poder revertir el lote (ver ``lotes.py``).
+
+Las filas llegan como tuplas y se convierten con el extractor del ``Mapeo``
+de columnas (``columnas.resolver_columnas``), resuelto una vez por archivo.
+
+``conteos``/``reanudar`` guardan y restauran el avance para seguir una
+importación interrumpida desde su punto de control.
+"""
+
+import hashlib
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from asistencia import estadisticas, resolver
+from asistencia.importacion.columnas import FilaInvalida
+from asistencia.models import Apoderado, CambioImportacion, Estudiante, Grado, Seccion
+
+TAMANO_LOTE = 500
+
+GRADO_PLACEHOLDER = 'Sin Grado'
+# Seccion tiene max_length=5, usar placeholder corto
+SECCION_PLACEHOLDER = 'Sin'
+
+# Campos que escribe la importación (y que revertir un lote restaura)
+CAMPOS_LOTE = (
+    'nombre', 'apellido', 'fecha_nacimiento', 'grado_id', 'seccion_id', 'apoderado_id', 'periodo',
+    'codigo_interno', 'estado_matricula', 'observaciones', 'huella_importacion',
+)
+
+
+def _respaldo(estudiante):
+    """Valores de ``CAMPOS_LOTE`` serializables a JSON."""
+    anterior = {campo: getattr(estudiante, campo) for campo in CAMPOS_LOTE}
+    if anterior['fecha_nacimiento']:
+        anterior['fecha_nacimiento'] = anterior['fecha_nacimiento'].isoformat()
+    return anterior
+
+
+def huella(d, periodo=None):
+    """Huella (hex de 32) de los datos extraídos de una fila y el periodo asignado."""
+    partes = [str(periodo or '')]
+    for campo in sorted(d):
+        valor = d[campo]
+        partes.append('' if valor is None else str(valor))
+    return hashlib.blake2b('\x1f'.join(partes).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class MotorImportacion:
+    """
+    Importa estudiantes lote a lote: ``procesar(filas)`` por cada lote y
+    ``finalizar()`` al terminar. ``mapeo`` es el ``Mapeo`` de columnas del
+    archivo. Acumula ``creados``, ``actualizados``, ``sin_cambios``,
+    ``procesados`` y ``total_errores``. ``errores`` guarda solo las filas con
+    error (originales, con la clave ``error``) que aún no se retiraron con
+    ``tomar_errores``: quien importa las vuelca al CSV después de cada lote.
+
+    ``lote`` (opcional) es el ``LoteImportacion`` donde registrar los cambios.
+    ``avisar(nivel, mensaje)`` recibe los avisos por fila ('warning'/'error').
+    """
+
+    def __init__(self, mapeo, periodo=None, avisar=None, lote=None):
+        self.mapeo = mapeo
+        self.lote = lote
+        # Estudiantes que ya tienen su CambioImportacion en este lote
+        self._en_lote = set()
+        # DNIs ya vistos en este archivo: una repetición siempre se escribe
+        self._vistos = set()
+        self._extraer = mapeo.extractor()
+        self.periodo = periodo
+        self.avisar = avisar or (lambda nivel, mensaje: None)
+        self.creados = 0
+        self.actualizados = 0
+        self.sin_cambios = 0
+        self.procesados = 0
+        self.total_errores = 0
+        self.errores = []
+        # Catálogos en memoria: nombre -> id
+        self.grados = dict(Grado.objects.values_list('nombre', 'id'))
+        self.secciones = {}
+        for seccion_id, grado_id, nombre in Seccion.objects.order_by('-id').values_list('id', 'grado_id', 'nombre'):
+            # Si hubiera duplicados queda el de menor id (el que devolvería get_or_create)
+            self.secciones[(grado_id, nombre)] = seccion_id
+        self.apoderados_correo = dict(Apoderado.objects.values_list('correo', 'id'))
+        self.apoderados_nombre = {}
+        for apoderado_id, nombre, apellido in Apoderado.objects.order_by('-id').values_list('id', 'nombre', 'apellido'):
+            self.apoderados_nombre[(nombre, apellido)] = apoderado_id
+
+    # ---------------------------------------------------------------
+    # Catálogos
+    # ---------------------------------------------------------------
+    def _asegurar_grados(self, nombres):
+        faltantes = {n for n in nombres if n and n not in self.grados}
+        if not faltantes:
+            return
+        Grado.objects.bulk_create([Grado(nombre=n) for n in sorted(faltantes)], ignore_conflicts=True)
+        self.grados.update(Grado.objects.filter(nombre__in=faltantes).values_list('nombre', 'id'))
+
+    def _asegurar_secciones(self, claves):
+        faltantes = {c for c in claves if c not in self.secciones}
+        if not faltantes:
+            return
+        Seccion.objects.bulk_create([Seccion(grado_id=g, nombre=n) for g, n in sorted(faltantes)])
+        creadas = Seccion.objects.filter(
+            grado_id__in={g for g, _ in faltantes}, nombre__in={n for _, n in faltantes},
+        ).order_by('-id').values_list('id', 'grado_id', 'nombre')
+        for seccion_id, grado_id, nombre in creadas:
+            if (grado_id, nombre) in faltantes:
+                self.secciones[(grado_id, nombre)] = seccion_id
+
+    def _asegurar_apoderados(self, datos):
+        por_correo = {}
+        for d in datos:
+            if d['ap_correo'] and d['ap_correo'] not in self.apoderados_correo:
+                por_correo.setdefault(d['ap_correo'], Apoderado(
+                    correo=d['ap_correo'],
+                    nombre=d['ap_nombre'] or 'N/A',
+                    apellido=d['ap_apellido'] or 'N/A',
+                    celular=d['ap_celular'] or '',
+                ))
+        if por_correo:
+            Apoderado.objects.bulk_create(por_correo.values(), ignore_conflicts=True)
+            self.apoderados_correo.update(
+                Apoderado.objects.filter(correo__in=por_correo).values_list('correo', 'id')
+            )
+        for d in datos:
+            clave = (d['ap_nombre'], d['ap_apellido'])
+            if not d['ap_correo'] and any(clave) and clave not in self.apoderados_nombre:
+                # Sin correo (campo único) no se puede crear en lote: caso raro, uno a uno
+                apoderado, _ = Apoderado.objects.get_or_create(
+                    nombre=clave[0], apellido=clave[1], defaults={'celular': d['ap_celular'] or '', 'correo': ''},
+                )
+                self.apoderados_nombre[clave] = apoderado.id
+
+    def _apoderado_id(self, d):
+        if d['ap_correo']:
+            return self.apoderados_correo.get(d['ap_correo'])
+        if d['ap_nombre'] or d['ap_apellido']:
+            return self.apoderados_nombre.get((d['ap_nombre'], d['ap_apellido']))
+        return None
+
+    # ---------------------------------------------------------------
+    # Lotes
+    # ---------------------------------------------------------------
+    def procesar(self, filas):
+        """
+        Importa un lote de filas (tuplas alineadas con los encabezados).
+        Devuelve la lista de DNIs escritos (para generar sus QR).
+        """
+        extraer = self._extraer
+        validas = []
+        for fila in filas:
+            try:
+                validas.append((fila, extraer(fila)))
+            except FilaInvalida as e:
+                r = self.mapeo.como_dict(fila)
+                self._error(r, str(e))
+                self.avisar('warning', f'Se salta fila incompleta (dni/nombre/apellido): {r}')
+        if not validas:
+            return []
+
+        with transaction.atomic():
+            guardadas = dict(
+                Estudiante.objects.filter(dni__in={d['dni'] for _, d in validas}).values_list('dni', 'huella_importacion')
+            )
+            # Solo se escriben las filas cuya huella cambió (o DNIs nuevos).
+            # Un DNI repetido en el archivo cuenta como actualización, como
+            # en el comando fila por fila
+            cambiadas = []
+            for fila, d in validas:
+                d['huella'] = huella(d, self.periodo)
+                repetido = d['dni'] in self._vistos
+                self._vistos.add(d['dni'])
+                if not repetido and guardadas.get(d['dni']) == d['huella']:
+                    self.sin_cambios += 1
+                    continue
+                cambiadas.append((fila, d))
+            self.procesados += len(validas) - len(cambiadas)
+            validas = cambiadas
+            if not validas:
+                return []
+
+            existentes = {
+                e.dni: e for e in Estudiante.objects.filter(dni__in={d['dni'] for _, d in validas if d['dni'] in guardadas})
+            }
+            nuevos_dnis = {d['dni'] for _, d in validas} - set(existentes)
+            sin_grado = any(not d['grado'] for _, d in validas if d['dni'] in nuevos_dnis)
+            self._asegurar_grados([d['grado'] for _, d in validas] + ([GRADO_PLACEHOLDER] if sin_grado else []))
+            claves_seccion = {
+                (self.grados[d['grado']], d['seccion']) for _, d in validas if d['grado'] and d['seccion']
+            }
+            if nuevos_dnis:
+                # Placeholder para estudiantes nuevos sin sección (en su grado o en 'Sin Grado')
+                claves_seccion |= {
+                    (self.grados[d['grado'] or GRADO_PLACEHOLDER], SECCION_PLACEHOLDER)
+                    for _, d in validas
+                    if d['dni'] in nuevos_dnis and not (d['grado'] and d['seccion'])
+                }
+            self._asegurar_secciones(claves_seccion)
+            self._asegurar_apoderados([d for _, d in validas])
+            return self._escribir_estudiantes(validas, existentes)
+
+    def _kwargs(self, d):
+        kwargs = {'nombre': d['nombre'], 'apellido': d['apellido'], 'dni': d['dni'], 'huella_importacion': d['huella']}
+        if d['fecha_nacimiento']:
+            kwargs['fecha_nacimiento'] = d['fecha_nacimiento']
+        grado_id = self.grados.get(d['grado']) if d['grado'] else None
+        if grado_id:
+            kwargs['grado_id'] = grado_id
+            if d['seccion']:
+                kwargs['seccion_id'] = self.secciones[(grado_id, d['seccion'])]
+        apoderado_id = self._apoderado_id(d)
+        if apoderado_id:
+            kwargs['apoderado_id'] = apoderado_id
+        if self.periodo:
+            kwargs['periodo'] = self.periodo
+        for campo in ('codigo_interno', 'estado_matricula', 'observaciones'):
+            if d[campo]:
+                kwargs[campo] = d[campo]
+        return kwargs
+
+    def _escribir_estudiantes(self, validas, existentes):
+        por_actualizar = {}
+        campos = set()
+        nuevos = []
+        escritos = []
+        cambios = []
+        for fila, d in validas:
+            kwargs = self._kwargs(d)
+            estudiante = existentes.get(d['dni'])
+            if estudiante is not None:
+                if self.lote is not None and estudiante.pk and estudiante.pk not in self._en_lote:
+                    cambios.append(CambioImportacion(lote=self.lote, estudiante_id=estudiante.pk, anterior=_respaldo(estudiante)))
+                    self._en_lote.add(estudiante.pk)
+                for k, v in kwargs.items():
+                    setattr(estudiante, k, v)
+                if estudiante.pk:
+                    por_actualizar[estudiante.pk] = estudiante
+                    campos.update(kwargs)
+                self.actualizados += 1
+            else:
+                # Faltan grado o sección: placeholder
+                if 'grado_id' not in kwargs:
+                    kwargs['grado_id'] = self.grados[GRADO_PLACEHOLDER]
+                if 'seccion_id' not in kwargs:
+                    kwargs['seccion_id'] = self.secciones[(kwargs['grado_id'], SECCION_PLACEHOLDER)]
+                estudiante = Estudiante(**kwargs, codigo_qr=d['dni'])
+                existentes[d['dni']] = estudiante
+                nuevos.append((fila, estudiante))
+                self.creados += 1
+            escritos.append(d['dni'])
+
+        if por_actualizar:
+            Estudiante.objects.bulk_update(por_actualizar.values(), sorted(campos), batch_size=TAMANO_LOTE)
+        fallidos = self._crear(nuevos)
+        if fallidos:
+            escritos = [dni for dni in escritos if dni not in fallidos]
+        if self.lote is not None:
+            cambios += self._cambios_creados([e for _, e in nuevos if e.dni not in fallidos])
+            # ignore_conflicts: si el estudiante ya está en el lote vale el primer cambio
+            CambioImportacion.objects.bulk_create(cambios, batch_size=TAMANO_LOTE, ignore_conflicts=True)
+        self.procesados += len(escritos)
+        return escritos
+
+    def _cambios_creados(self, creados):
+        sin_pk = [e.dni for e in creados if e.pk is None]
+        if sin_pk:
+            # Motores que no devuelven los ids de bulk_create
+            ids = dict(Estudiante.objects.filter(dni__in=sin_pk).values_list('dni', 'id'))
+            for e in creados:
+                if e.pk is None:
+                    e.pk = ids.get(e.dni)
+        cambios = []
+        for e in creados:
+            if e.pk and e.pk not in self._en_lote:
+                cambios.append(CambioImportacion(lote=self.lote, estudiante_id=e.pk, creado=True))
+                self._en_lote.add(e.pk)
+        return cambios
+
+    def _crear(self, nuevos):
+        """
+        ``bulk_create`` de los estudiantes nuevos. Si el lote falla se
+        reintenta uno a uno (con savepoint) para registrar qué fila falló.
+        Devuelve los DNIs que no se pudieron crear.
+        """
+        if not nuevos:
+            return set()
+        try:
+            with transaction.atomic():
+                Estudiante.objects.bulk_create([e for _, e in nuevos], batch_size=TAMANO_LOTE)
+            return set()
+        except DatabaseError:
+            pass
+        fallidos = set()
+        for fila, estudiante in nuevos:
+            estudiante.pk = None
+            try:
+                with transaction.atomic():
+                    estudiante.save(force_insert=True)
+            except Exception as e:
+                fallidos.add(estudiante.dni)
+                self.creados -= 1
+                self._error(self.mapeo.como_dict(fila), f'error creando estudiante: {e}')
+                self.avisar('error', f'Error creando estudiante {estudiante.dni}: {e}')
+        return fallidos
+
+    def _error(self, fila, mensaje):
+        self.errores.append({**fila, 'error': mensaje})
+        self.total_errores += 1
+
+    def tomar_errores(self):
+        """Devuelve las filas con error pendientes y las descarta del motor."""
+        errores, self.errores = self.errores, []
+        return errores
+
+    def conteos(self):
+        """Conteos acumulados (para el punto de control; las filas con error no)."""
+        return {
+            'creados': self.creados, 'actualizados': self.actualizados, 'sin_cambios': self.sin_cambios,
+            'procesados': self.procesados, 'errores': self.total_errores,
+        }
+
+    def reanudar(self, conteos):
+        """Sigue una importación interrumpida desde los ``conteos`` guardados."""
+        self.creados = conteos['creados']
+        self.actualizados = conteos['actualizados']
+        self.sin_cambios = conteos['sin_cambios']
+        self.procesados = conteos['procesados']
+        self.total_errores = conteos['errores']
+        if self.lote is not None:
+            # Los DNIs sin cambios de los lotes ya confirmados no se recuperan
+            for estudiante_id, dni in self.lote.cambios.values_list('estudiante_id', 'estudiante__dni'):
+                self._en_lote.add(estudiante_id)
+                self._vistos.add(dni)
+
+    def finalizar(self):
+        if self.lote is not None:
+            if self._en_lote:
+                self.lote.creados = self.creados
+                self.lote.actualizados = self.actualizados
+                self.lote.save(update_fields=['creados', 'actualizados'])
+            else:
+                # Nada que revertir (p. ej. reimportación sin cambios)
+                self.lote.delete()
+                self.lote = None
+        # bulk_create/bulk_update no disparan post_save
+        resolver.invalidar()
+        estadisticas.invalidar(timezone.localdate())
@@ -0,0 +1,52 @@
+"""
+Progreso de la importación con escrituras limitadas.
+
+``Progreso`` recibe el avance después de cada lote pero solo llama a
+``escribir`` si pasaron ``cada_segundos`` desde la última escritura (y el
+avance cambió), así una importación de 10k filas hace unas pocas
+escrituras en vez de una por fila o por lote. ``terminar`` escribe siempre.
+
+``escribir_json`` reemplaza un archivo de estado de forma atómica (temporal
++ ``os.replace``): quien lo lee nunca ve un JSON a medio escribir.
+"""
+
+import json
+import os
+import time
+
+INTERVALO = 1.0
+
+
+class Progreso:
+    def __init__(self, escribir, cada_segundos=INTERVALO, reloj=time.monotonic):
+        self.escribir = escribir
+        self.cada_segundos = cada_segundos
+        self.reloj = reloj
+        self.escrituras = 0
+        self._ultimo = None
+        self._instante = None
+
+    def avanzar(self, procesados, **campos):
+        ahora = self.reloj()
+        if procesados == self._ultimo:
+            return False
+        if self._instante is not None and ahora - self._instante < self.cada_segundos:
+            return False
+        self._escribir(procesados, ahora, campos)
+        return True
+
+    def terminar(self, procesados, **campos):
+        self._escribir(procesados, self.reloj(), campos)
+
+    def _escribir(self, procesados, ahora, campos):
+        self.escribir(procesados, **campos)
+        self.escrituras += 1
+        self._ultimo = procesados
+        self._instante = ahora
+
+
+def escribir_json(ruta, datos):
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, default=str, ensure_ascii=False)
+    os.replace(temporal, ruta)
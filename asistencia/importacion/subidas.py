@@ -0,0 +1,241 @@
+"""
+Subida de padrones grandes por partes (``SubidaArchivo``).
+
+El formulario de importación recibe el archivo completo en una sola
+petición (límite 10 MB). Para archivos de 50-100 MB por conexiones lentas la
+página los envía por partes:
+
+1. ``crear`` registra la subida (nombre, tamaño, periodo) y crea
+   ``MEDIA_ROOT/uploads/<archivo>.part`` vacío.
+2. Cada parte llega en un ``PUT`` con el byte donde empieza. ``recibir`` la
+   lee del cuerpo de la petición por bloques a un temporal, calculando su
+   sha256 mientras llega (y comparándolo con el del navegador si lo manda),
+   y luego la agrega al final del ``.part`` con el registro bloqueado. Nada
+   del archivo queda en memoria y cada petición dura lo que tarda una parte.
+3. Si la parte no empieza donde termina lo recibido, ``DesfaseSubida`` avisa
+   cuántos bytes hay: el navegador sigue desde ahí (reanudar tras un corte).
+4. Con el último byte la subida queda ``completa`` y, al confirmarse la
+   transacción (``on_commit``), ``publicar`` renombra el ``.part`` al nombre
+   final y lo encola como ``ImportJob`` (salvo que se pida la vista previa:
+   se encola al confirmarla). Si la transacción se revierte el archivo sigue
+   siendo ``.part`` y la parte se puede reenviar.
+5. ``publicar`` se puede repetir: si falla (disco, base de datos) la subida
+   queda ``completa`` sin trabajo y se reintenta cuando el navegador reenvía
+   una parte o cuando el worker de importaciones revisa la cola
+   (``publicar_pendientes``).
+
+La huella de la subida es el sha256 de la lista de sha256 de sus partes (en
+hex, concatenados en orden). Cada parte se hashea mientras llega, así que
+completar la subida no vuelve a leer el archivo (hasta ``TAMANO_MAXIMO``)
+con el registro bloqueado. El navegador la puede calcular con los mismos
+sha256 que envía en ``X-Sha256``.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+from asistencia.importacion import cola
+from asistencia.models import ImportJob, SubidaArchivo
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONES = ('.xlsx', '.xls', '.csv')
+# Tamaño de parte sugerido: a 1 Mbps una parte tarda ~16 s, bajo el timeout de gunicorn
+TAMANO_PARTE = 2 * 1024 * 1024
+TAMANO_MAXIMO = 200 * 1024 * 1024
+BLOQUE = 64 * 1024
+
+
+class ErrorSubida(Exception):
+    pass
+
+
+class DesfaseSubida(ErrorSubida):
+    """La parte no empieza donde termina lo ya recibido."""
+
+    def __init__(self, subida):
+        super().__init__(f'Se esperaba la parte que empieza en el byte {subida.recibidos}')
+        self.recibidos = subida.recibidos
+
+
+def tamano_parte():
+    return getattr(settings, 'ASISTENCIA_SUBIDA_PARTE', TAMANO_PARTE)
+
+
+def tamano_maximo():
+    return getattr(settings, 'ASISTENCIA_SUBIDA_MAX', TAMANO_MAXIMO)
+
+
+def directorio():
+    carpeta = os.path.join(settings.MEDIA_ROOT or 'media', 'uploads')
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def ruta_parcial(subida):
+    return os.path.join(directorio(), f'{subida.archivo}.part')
+
+
+def validar_nombre(nombre):
+    """Extensión del archivo ``nombre``; ``ErrorSubida`` si no se puede importar."""
+    ext = os.path.splitext(nombre)[1].lower()
+    if ext not in EXTENSIONES:
+        raise ErrorSubida('Tipo de archivo no soportado. Usa .xlsx, .xls o .csv')
+    if ext in ('.xls', '.xlsx'):
+        try:
+            import openpyxl  # noqa: F401
+        except Exception:
+            raise ErrorSubida('Soporte para .xlsx no disponible en el servidor (falta openpyxl). Convierte a CSV o instala openpyxl.')
+    return ext
+
+
+def como_estado(subida):
+    return {
+        'id': str(subida.pk),
+        'nombre': subida.nombre_original,
+        'archivo': subida.archivo,
+        'estado': subida.estado,
+        'tamano': subida.tamano,
+        'recibidos': subida.recibidos,
+        'parte': tamano_parte(),
+        'huella': subida.huella or None,
+        'trabajo': subida.trabajo_id,
+        'vista_previa': subida.vista_previa,
+    }
+
+
+def crear(nombre, tamano, periodo=None, vista_previa=False):
+    ext = validar_nombre(nombre)
+    if tamano <= 0:
+        raise ErrorSubida('El archivo está vacío')
+    if tamano > tamano_maximo():
+        raise ErrorSubida(f'Archivo demasiado grande. Límite: {tamano_maximo() // (1024 * 1024)} MB')
+    subida = SubidaArchivo.objects.create(
+        nombre_original=os.path.basename(nombre)[:255], archivo=f'import_{uuid.uuid4().hex}{ext}',
+        tamano=tamano, periodo=periodo, vista_previa=vista_previa,
+    )
+    open(ruta_parcial(subida), 'wb').close()
+    return subida
+
+
+def _leer_parte(flujo, longitud, destino):
+    """Copia ``longitud`` bytes de ``flujo`` a ``destino``; devuelve su sha256."""
+    suma = hashlib.sha256()
+    faltan = longitud
+    while faltan:
+        bloque = flujo.read(min(BLOQUE, faltan))
+        if not bloque:
+            raise ErrorSubida('La parte llegó incompleta')
+        suma.update(bloque)
+        destino.write(bloque)
+        faltan -= len(bloque)
+    return suma.hexdigest()
+
+
+def recibir(subida_id, inicio, flujo, longitud, sha256=None):
+    """
+    Recibe la parte de ``longitud`` bytes que empieza en el byte ``inicio``.
+    ``flujo`` es el cuerpo de la petición. Devuelve la ``SubidaArchivo``
+    actualizada (``completa`` y encolada si era la última parte).
+    """
+    subida = SubidaArchivo.objects.get(pk=subida_id)
+    if subida.estado != 'recibiendo':
+        # Reenvío tras perder la respuesta de la última parte: ya no falta
+        # nada; si la publicación había fallado se reintenta aquí
+        publicar(subida)
+        raise DesfaseSubida(subida)
+    if inicio != subida.recibidos:
+        raise DesfaseSubida(subida)
+    if longitud <= 0 or longitud > tamano_parte():
+        raise ErrorSubida(f'Cada parte debe tener entre 1 y {tamano_parte()} bytes')
+    if inicio + longitud > subida.tamano:
+        raise ErrorSubida('La parte excede el tamaño declarado')
+
+    parcial = ruta_parcial(subida)
+    temporal = f'{parcial}.{uuid.uuid4().hex}'
+    try:
+        with open(temporal, 'wb') as destino:
+            suma = _leer_parte(flujo, longitud, destino)
+        if sha256 and sha256.lower() != suma:
+            raise ErrorSubida('El sha256 de la parte no coincide; reenvíala')
+
+        with transaction.atomic():
+            subida = SubidaArchivo.objects.select_for_update().get(pk=subida_id)
+            # Otra petición pudo haber agregado esta parte mientras llegaba
+            if subida.estado != 'recibiendo' or subida.recibidos != inicio:
+                raise DesfaseSubida(subida)
+            try:
+                with open(parcial, 'r+b') as archivo, open(temporal, 'rb') as parte:
+                    # Descarta lo que dejó un intento que murió antes de registrar su parte
+                    archivo.truncate(subida.recibidos)
+                    archivo.seek(subida.recibidos)
+                    shutil.copyfileobj(parte, archivo, BLOQUE)
+            except FileNotFoundError:
+                raise ErrorSubida('Se perdió el archivo parcial; vuelve a subir el archivo')
+            subida.recibidos += longitud
+            subida.partes = subida.partes + [suma]
+            if subida.recibidos == subida.tamano:
+                _completar(subida, parcial)
+            subida.save()
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return subida
+
+
+def huella(partes):
+    """Huella del archivo a partir de los sha256 (hex) de sus partes."""
+    return hashlib.sha256(''.join(partes).encode('ascii')).hexdigest()
+
+
+def _completar(subida, parcial):
+    subida.huella = huella(subida.partes)
+    subida.estado = 'completa'
+    # robust: un error se registra en el log y no cambia la respuesta; la
+    # subida ya está confirmada y publicar se reintenta más tarde
+    transaction.on_commit(lambda: publicar(subida), robust=True)
+
+
+def publicar(subida):
+    """
+    Renombra el archivo de una subida completa y lo encola. Se puede llamar
+    varias veces: sigue desde donde quedó una llamada que falló y no encola
+    dos veces.
+    """
+    final = os.path.join(directorio(), subida.archivo)
+    try:
+        os.replace(ruta_parcial(subida), final)
+    except FileNotFoundError:
+        # Ya renombrado (o borrado por limpiar_subidas)
+        pass
+    if subida.vista_previa or subida.trabajo_id:
+        return
+    with transaction.atomic():
+        actual = SubidaArchivo.objects.select_for_update().get(pk=subida.pk)
+        # Sin archivo no hay qué encolar; un ImportJob del mismo archivo
+        # significa que ya se encoló (y el trabajo se borró: SET_NULL)
+        if actual.trabajo_id is None and os.path.exists(final) and not ImportJob.objects.filter(archivo=subida.archivo).exists():
+            actual.trabajo = cola.encolar(subida.archivo, subida.periodo)
+            actual.save(update_fields=['trabajo'])
+        subida.trabajo = actual.trabajo
+
+
+def publicar_pendientes():
+    """Reintenta ``publicar`` las subidas completas que quedaron sin encolar."""
+    publicadas = 0
+    pendientes = SubidaArchivo.objects.filter(estado='completa', vista_previa=False, trabajo__isnull=True)
+    for subida in pendientes:
+        try:
+            publicar(subida)
+        except Exception:
+            logger.exception('No se pudo publicar la subida %s', subida.pk)
+            continue
+        if subida.trabajo_id:
+            publicadas += 1
+    return publicadas
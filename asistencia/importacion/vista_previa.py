@@ -0,0 +1,133 @@
+"""
+Vista previa (simulación) de una importación, sin escribir nada.
+
+``previsualizar`` lee el archivo en lotes de ``TAMANO_LOTE`` filas, como la
+importación: por cada lote carga los estudiantes existentes con esos DNIs
+(una consulta ``dni__in``, solo los campos que escribe la importación) y
+clasifica sus filas como las clasificaría ``MotorImportacion``:
+
+- rechazada: le falta dni, nombre o apellido;
+- sin cambios: su huella coincide con la guardada (o con la de una fila
+  anterior del mismo DNI);
+- creada: DNI nuevo (si se repite en el archivo, la siguiente fila cuenta
+  como actualización, igual que en el motor);
+- actualizada: el resto, con los campos que cambian.
+
+Devuelve los conteos y una muestra de los cambios y de las filas
+rechazadas. Entre lotes solo se guarda la huella de cada DNI ya visto (para
+los repetidos), así que la memoria no depende del tamaño de las filas; un
+DNI repetido en otro lote compara sus campos con la base de datos. Los
+apoderados no entran en la comparación campo a campo. Lo usan
+``import_estudiantes --dry-run`` y la página de vista previa.
+"""
+
+from asistencia.importacion.columnas import FilaInvalida
+from asistencia.importacion.lectura import en_lotes
+from asistencia.importacion.motor import GRADO_PLACEHOLDER, SECCION_PLACEHOLDER, TAMANO_LOTE, huella
+from asistencia.models import Estudiante
+
+MUESTRA = 20
+
+# Campos comparados: nombre en la vista previa -> campo en la base de datos
+CAMPOS = (
+    ('nombre', 'nombre'), ('apellido', 'apellido'), ('fecha_nacimiento', 'fecha_nacimiento'),
+    ('grado', 'grado__nombre'), ('seccion', 'seccion__nombre'), ('periodo', 'periodo'),
+    ('codigo_interno', 'codigo_interno'), ('estado_matricula', 'estado_matricula'),
+    ('observaciones', 'observaciones'),
+)
+
+
+def _valores(d, periodo):
+    """Valores que la importación escribiría (los mismos casos que ``MotorImportacion._kwargs``)."""
+    valores = {'nombre': d['nombre'], 'apellido': d['apellido']}
+    if d['fecha_nacimiento']:
+        valores['fecha_nacimiento'] = d['fecha_nacimiento']
+    if d['grado']:
+        valores['grado'] = d['grado']
+        if d['seccion']:
+            valores['seccion'] = d['seccion']
+    if periodo:
+        valores['periodo'] = periodo
+    for campo in ('codigo_interno', 'estado_matricula', 'observaciones'):
+        if d[campo]:
+            valores[campo] = d[campo]
+    return valores
+
+
+def _existentes(dnis):
+    """``{dni: {campo: valor, 'huella': ...}}`` de los estudiantes con esos DNIs."""
+    columnas = ['dni', 'huella_importacion'] + [columna for _, columna in CAMPOS]
+    actuales = {}
+    for fila in Estudiante.objects.filter(dni__in=dnis).values_list(*columnas):
+        valores = dict(zip((campo for campo, _ in CAMPOS), fila[2:]))
+        valores['huella'] = fila[1]
+        actuales[fila[0]] = valores
+    return actuales
+
+
+def previsualizar(filas, mapeo, periodo=None, muestra=MUESTRA):
+    """
+    Simula la importación de ``filas`` (tuplas alineadas con los
+    encabezados del ``mapeo``). No escribe en la base de datos.
+    """
+    extraer = mapeo.extractor()
+    resultado = {
+        'total': 0, 'creados': 0, 'actualizados': 0, 'sin_cambios': 0, 'rechazados': 0,
+        'columnas': mapeo.descripcion(), 'ignoradas': list(mapeo.ignoradas),
+        'cambios': [], 'errores': [],
+    }
+    # DNIs de las filas ya clasificadas
+    vistos = set()
+    # La fila 1 del archivo son los encabezados
+    numeradas = enumerate(filas, start=2)
+    for lote in en_lotes(numeradas, TAMANO_LOTE):
+        validas = []
+        for numero, fila in lote:
+            resultado['total'] += 1
+            try:
+                validas.append((numero, extraer(fila)))
+            except FilaInvalida as e:
+                resultado['rechazados'] += 1
+                if len(resultado['errores']) < muestra:
+                    resultado['errores'].append({'fila': numero, 'error': str(e), 'datos': mapeo.como_dict(fila)})
+        if validas:
+            _clasificar(validas, vistos, periodo, resultado, muestra)
+    return resultado
+
+
+def _clasificar(validas, vistos, periodo, resultado, muestra):
+    """Clasifica un lote de filas válidas ``(numero, datos)``."""
+    actuales = _existentes({d['dni'] for _, d in validas})
+    for numero, d in validas:
+        h = huella(d, periodo)
+        dni = d['dni']
+        previo = actuales.get(dni)
+        if dni in vistos:
+            # Repetido: siempre es una actualización (como en el motor),
+            # comparada con la fila anterior del archivo
+            if previo is None:
+                previo = {}
+        elif previo is not None and previo['huella'] == h:
+            resultado['sin_cambios'] += 1
+            vistos.add(dni)
+            continue
+        nuevos = _valores(d, periodo)
+        if previo is None:
+            resultado['creados'] += 1
+            accion = 'crear'
+            # Sin grado o sección el motor usa los placeholders
+            if 'seccion' not in nuevos:
+                nuevos['seccion'] = SECCION_PLACEHOLDER
+                nuevos.setdefault('grado', GRADO_PLACEHOLDER)
+            cambios = {campo: (None, valor) for campo, valor in nuevos.items()}
+            actuales[dni] = {**nuevos, 'huella': h}
+        else:
+            resultado['actualizados'] += 1
+            accion = 'actualizar'
+            cambios = {campo: (previo.get(campo), valor) for campo, valor in nuevos.items() if previo.get(campo) != valor}
+            previo.update(nuevos)
+            previo['huella'] = h
+            actuales[dni] = previo
+        vistos.add(dni)
+        if len(resultado['cambios']) < muestra:
+            resultado['cambios'].append({'fila': numero, 'dni': dni, 'accion': accion, 'campos': cambios})
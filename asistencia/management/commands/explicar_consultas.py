@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from asistencia.models import Asistencia, Estudiante, Grado, ResumenDiario
+from asistencia import paginacion
+
+
+class Command(BaseCommand):
+    help = 'Muestra el plan (EXPLAIN) de la consulta principal de cada vista para verificar que usan índices.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', type=str, help='Fecha de referencia YYYY-MM-DD. Por defecto hoy.')
+        parser.add_argument('--analyze', action='store_true', help='Ejecuta las consultas (EXPLAIN ANALYZE, solo PostgreSQL).')
+
+    def consultas(self, fecha):
+        """Pares (nombre, queryset) con la consulta principal de cada vista."""
+        estudiante_id = Estudiante.objects.values_list('id', flat=True).first() or 0
+        grado_id = Grado.objects.values_list('id', flat=True).first() or 0
+        periodo = Estudiante.objects.values_list('periodo', flat=True).first() or fecha.year
+        inicio = fecha - timedelta(days=180)
+        reporte = Asistencia.objects.filter(fecha__gte=inicio, fecha__lte=fecha)
+        return [
+            ('dashboard: resumen del día', ResumenDiario.objects.filter(fecha=fecha)),
+            ('dashboard: grados y estudiantes', Grado.objects.annotate(n=Count('estudiante'))),
+            ('escaneo: registrados del día', Asistencia.objects.filter(fecha=fecha).values_list('estudiante_id', 'hora')),
+            ('registro: existente por estudiante y fecha',
+             Asistencia.objects.filter(estudiante_id=estudiante_id, fecha=fecha).values_list('id', 'hora', 'estado')),
+            ('dashboard: estado dentro de una fecha', Asistencia.objects.filter(fecha=fecha, estado='tarde')),
+            ('reporte: primera página', reporte.order_by(*paginacion.ORDEN)[:paginacion.TAMANO_PAGINA + 1]),
+            ('reporte: página siguiente (cursor)',
+             reporte.filter(paginacion.despues_de(fecha, time(12, 0), 0))
+             .order_by(*paginacion.ORDEN)[:paginacion.TAMANO_PAGINA + 1]),
+            ('reporte: por grado en el rango', reporte.filter(estudiante__grado_id=grado_id).order_by(*paginacion.ORDEN)[:paginacion.TAMANO_PAGINA + 1]),
+            ('reporte: por estudiante (totales)', reporte.filter(estudiante_id=estudiante_id).values('estado')),
+            ('reporte: totales desde el resumen',
+             ResumenDiario.objects.filter(fecha__gte=inicio, fecha__lte=fecha, seccion__grado_id=grado_id)),
+            ('marcar_faltas: asistencias de un grupo de estudiantes en el rango',
+             Asistencia.objects.filter(
+                 estudiante_id__in=Estudiante.objects.filter(periodo=periodo).values_list('id', flat=True)[:100],
+                 fecha__in=[inicio, fecha]).values_list('id', 'estudiante_id', 'fecha', 'hora', 'estado')),
+            ('estudiantes: por periodo, grado y sección',
+             Estudiante.objects.filter(periodo=periodo, grado_id=grado_id)),
+        ]
+
+    def handle(self, *args, **options):
+        try:
+            fecha = datetime.strptime(options['fecha'], '%Y-%m-%d').date() if options.get('fecha') else timezone.localdate()
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Usa YYYY-MM-DD')
+        opciones = {}
+        if options.get('analyze'):
+            if connection.vendor != 'postgresql':
+                raise CommandError('--analyze solo está disponible en PostgreSQL')
+            opciones = {'analyze': True}
+
+        self.stdout.write(f'Motor: {connection.vendor}. Fecha de referencia: {fecha}')
+        for nombre, qs in self.consultas(fecha):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {nombre}'))
+            self.stdout.write(qs.explain(**opciones))
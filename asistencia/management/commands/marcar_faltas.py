@@ -1,39 +1,52 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from datetime import datetime
-from asistencia.models import Estudiante, Asistencia
+from asistencia.models import Estudiante, hora_local
+from asistencia.registro import registrar_faltas
+from asistencia import calendario
 
 
 class Command(BaseCommand):
-    help = 'Marca como falta a estudiantes que no tengan registro de asistencia en la fecha indicada (por defecto hoy).'
+    help = 'Marca como falta a estudiantes que no tengan registro de asistencia en la fecha (o rango) indicada (por defecto hoy). Omite fines de semana y días no lectivos.'
 
     def add_arguments(self, parser):
         parser.add_argument('--fecha', type=str, help='Fecha en formato YYYY-MM-DD. Por defecto hoy.')
+        parser.add_argument('--desde', type=str, help='Fecha inicial YYYY-MM-DD para marcar un rango (inclusive).')
+        parser.add_argument('--hasta', type=str, help='Fecha final YYYY-MM-DD del rango (inclusive). Por defecto igual a --desde.')
         parser.add_argument('--periodo', type=int, help='Periodo (año escolar) para filtrar estudiantes', default=None)
 
     def handle(self, *args, **options):
         fecha_arg = options.get('fecha')
         periodo = options.get('periodo')
 
-        if fecha_arg:
-            fecha = datetime.strptime(fecha_arg, '%Y-%m-%d').date()
-        else:
-            fecha = timezone.now().date()
+        try:
+            if options.get('desde'):
+                if fecha_arg:
+                    raise CommandError('Usa --fecha o --desde/--hasta, no ambos')
+                desde = datetime.strptime(options['desde'], '%Y-%m-%d').date()
+                hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date() if options.get('hasta') else desde
+            elif options.get('hasta'):
+                raise CommandError('--hasta requiere --desde')
+            else:
+                desde = hasta = datetime.strptime(fecha_arg, '%Y-%m-%d').date() if fecha_arg else timezone.localdate()
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Usa YYYY-MM-DD')
+        if hasta < desde:
+            raise CommandError('--hasta debe ser igual o posterior a --desde')
 
         qs = Estudiante.objects.all()
         if periodo:
             qs = qs.filter(periodo=periodo)
 
-        total = 0
-        marcadas = 0
-        for est in qs:
-            total += 1
-            # Si ya existe alguna asistencia para la fecha indicada, no marcar falta
-            if Asistencia.objects.filter(estudiante=est, fecha=fecha).exists():
-                continue
-            # Crear la falta usando la misma fecha (no confiar en auto_now_add para consistencia)
-            Asistencia.objects.create(estudiante=est, fecha=fecha, hora=timezone.now().time(), estado='falta')
-            marcadas += 1
-            # NOTE: removed verbose debug prints; use logging in production if needed
-
-        self.stdout.write(self.style.SUCCESS(f'Proceso terminado. Estudiantes revisados: {total}, faltas registradas: {marcadas}'))
+        hora = hora_local()
+        fechas = calendario.dias_lectivos(desde, hasta)
+        if not fechas:
+            self.stdout.write(self.style.WARNING(f'Sin días lectivos entre {desde} y {hasta}: no se registran faltas.'))
+            return
+        omitidos = (hasta - desde).days + 1 - len(fechas)
+        if omitidos and desde != hasta:
+            self.stdout.write(f'Se omiten {omitidos} días no lectivos del rango.')
+        total, marcadas = registrar_faltas(qs, fechas, hora)
+        for fecha in fechas:
+            prefijo = f'{fecha}: ' if desde != hasta else ''
+            self.stdout.write(self.style.SUCCESS(f'{prefijo}Proceso terminado. Estudiantes revisados: {total}, faltas registradas: {marcadas[fecha]}'))
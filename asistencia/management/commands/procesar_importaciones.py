@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+import signal
+import threading
+import time
+from asistencia.importacion import cola, subidas
+
+
+class Command(BaseCommand):
+    help = ('Worker de la cola de importaciones (ImportJob). Pensado para correr como proceso "worker" del Procfile; '
+            'varias instancias no toman el mismo trabajo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=int, default=5, help='Segundos entre revisiones de la cola (por defecto 5).')
+        parser.add_argument('--concurrencia', type=int, default=None,
+                            help='Importaciones simultáneas en total (contando las de otros workers) hasta las que '
+                                 'este worker toma trabajos (por defecto ASISTENCIA_IMPORTACION_CONCURRENCIA).')
+        parser.add_argument('--una-vez', action='store_true', help='Procesa los trabajos disponibles y termina.')
+
+    def handle(self, *args, **options):
+        limite = options.get('concurrencia') or cola.concurrencia()
+        if options.get('una_vez'):
+            cola.recuperar_vencidos()
+            subidas.publicar_pendientes()
+            while True:
+                trabajo = cola.tomar(limite=limite)
+                if trabajo is None:
+                    break
+                self._reportar(cola.ejecutar(trabajo))
+            return
+
+        detener = []
+        signal.signal(signal.SIGTERM, lambda *a: detener.append(True))
+        hilos = []
+        self.stdout.write(f"Worker de importaciones iniciado (hasta {limite} a la vez, cada {options['intervalo']} s).")
+        try:
+            while not detener:
+                close_old_connections()
+                cola.recuperar_vencidos()
+                # Subidas por partes cuyo encolado falló al completarse
+                subidas.publicar_pendientes()
+                hilos = [h for h in hilos if h.is_alive()]
+                while len(hilos) < limite:
+                    trabajo = cola.tomar(limite=limite)
+                    if trabajo is None:
+                        break
+                    self.stdout.write(f'Tomado {trabajo.archivo} (intento {trabajo.intentos}).')
+                    hilo = threading.Thread(target=self._ejecutar, args=(trabajo,))
+                    hilo.start()
+                    hilos.append(hilo)
+                close_old_connections()
+                for _ in range(options['intervalo']):
+                    if detener:
+                        break
+                    time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        # Terminar las importaciones en curso antes de salir
+        for hilo in hilos:
+            hilo.join()
+        self.stdout.write('Worker de importaciones detenido.')
+
+    def _ejecutar(self, trabajo):
+        try:
+            self._reportar(cola.ejecutar(trabajo))
+        finally:
+            connection.close()
+
+    def _reportar(self, trabajo):
+        estilo = self.style.SUCCESS if trabajo.estado == 'ok' else self.style.ERROR
+        self.stdout.write(estilo(f'{trabajo.archivo}: {trabajo.estado}. {trabajo.mensaje}'))
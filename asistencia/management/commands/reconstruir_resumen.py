@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import datetime
+from asistencia import estadisticas
+from asistencia.resumen import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario por sección (ResumenDiario) desde Asistencia para un rango de fechas (por defecto hoy).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=str, help='Fecha inicial YYYY-MM-DD. Por defecto hoy.')
+        parser.add_argument('--hasta', type=str, help='Fecha final YYYY-MM-DD (inclusive). Por defecto igual a --desde.')
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.strptime(options['desde'], '%Y-%m-%d').date() if options.get('desde') else timezone.localdate()
+            hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date() if options.get('hasta') else desde
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Usa YYYY-MM-DD')
+        if hasta < desde:
+            raise CommandError('--hasta debe ser igual o posterior a --desde')
+
+        filas = reconstruir(desde, hasta)
+        estadisticas.invalidar(timezone.localdate())
+        self.stdout.write(self.style.SUCCESS(f'Resumen reconstruido del {desde} al {hasta}. Filas: {filas}'))
@@ -1,32 +1,23 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from asistencia.models import Estudiante, Grado, Seccion
+from asistencia.models import Estudiante, Grado, Seccion, LoteImportacion
+from asistencia.importacion.lotes import ErrorReversion, revertir
+from asistencia.importacion.columnas import ErrorColumnas, resolver_columnas
+from asistencia.importacion.lectura import Lector, ErrorLectura, en_lotes
+from asistencia.importacion.motor import TAMANO_LOTE
 import os
-import csv
-import unicodedata
-import re
 from django.db import models
 
-try:
-    import openpyxl
-    _HAS_OPENPYXL = True
-except Exception:
-    _HAS_OPENPYXL = False
-
-
-def _norm_key(k):
-    if not k:
-        return ''
-    nk = unicodedata.normalize('NFKD', str(k)).encode('ascii', 'ignore').decode('ascii')
-    nk = re.sub(r'[^0-9a-zA-Z]+', '_', nk).strip('_').lower()
-    return nk
-
 
 class Command(BaseCommand):
-    help = 'Rollback parcial de importación: elimina estudiantes importados con grado/seccion placeholder (Sin Grado / Sin).\nUsa --dry-run para ver qué se eliminaría.'
+    help = ('Revierte una importación. Con --lote deshace el lote completo (borra los creados y restaura los '
+            'actualizados) sin necesitar el archivo. Con un archivo (importaciones anteriores a los lotes) elimina '
+            'los estudiantes importados con grado/seccion placeholder (Sin Grado / Sin).\nUsa --dry-run para ver qué se haría.')
 
     def add_arguments(self, parser):
-        parser.add_argument('filepath', type=str, help='Ruta al archivo subido (archivo en media/uploads o ruta absoluta)')
+        parser.add_argument('filepath', type=str, nargs='?', help='Ruta al archivo subido (archivo en media/uploads o ruta absoluta)')
+        parser.add_argument('--lote', type=int, help='Id del lote de importación a revertir')
+        parser.add_argument('--listar', action='store_true', help='Lista los últimos lotes de importación')
         parser.add_argument('--dry-run', action='store_true', help='No borra, solo muestra qué se eliminaría')
         parser.add_argument('--yes', action='store_true', help='Confirma la eliminación sin pedir interacción')
 
@@ -35,6 +26,15 @@ class Command(BaseCommand):
         dry = options.get('dry_run')
         assume_yes = options.get('yes')
 
+        if options.get('listar'):
+            for lote in LoteImportacion.objects.all()[:20]:
+                self.stdout.write(f'{lote.pk}: {lote.creado:%Y-%m-%d %H:%M} {lote.archivo} | creados={lote.creados} actualizados={lote.actualizados} | {lote.estado}')
+            return
+        if options.get('lote'):
+            return self._revertir_lote(options['lote'], dry, assume_yes)
+        if not filepath:
+            raise CommandError('Indica --lote ID (ver --listar) o la ruta del archivo importado')
+
         # If only filename provided, assume media/uploads
         if not os.path.isabs(filepath):
             uploads_dir = os.path.join(settings.MEDIA_ROOT or 'media', 'uploads')
@@ -45,57 +45,37 @@ class Command(BaseCommand):
         if not os.path.exists(filepath):
             raise CommandError(f'Archivo no encontrado: {filepath}')
 
-        # parse file to extract DNIs
-        dnis = set()
-        _, ext = os.path.splitext(filepath)
-        if ext.lower() in ('.xls', '.xlsx'):
-            if not _HAS_OPENPYXL:
-                raise CommandError('openpyxl no está instalado; instala openpyxl o convierte el archivo a CSV')
-            wb = openpyxl.load_workbook(filepath)
-            ws = wb.active
-            raw_headers = [cell.value for cell in next(ws.iter_rows(min_row=1, max_row=1))]
-            headers = [_norm_key(h) for h in raw_headers]
-            dni_idx = None
-            for i, h in enumerate(headers):
-                if 'dni' in h or 'documento' in h:
-                    dni_idx = i
-                    break
-            if dni_idx is None:
+        # Leer los DNIs en streaming y buscar los candidatos por lotes
+        try:
+            lector = Lector(filepath)
+        except ErrorLectura as e:
+            raise CommandError(str(e))
+        with lector:
+            try:
+                dni_idx = resolver_columnas(lector.encabezados, requeridos=('dni',)).indice('dni')
+            except ErrorColumnas:
                 raise CommandError('No se encontró columna DNI en el archivo')
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                val = row[dni_idx]
-                if val:
-                    dnis.add(str(val).strip())
-        elif ext.lower() == '.csv':
-            with open(filepath, newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                # find dni-key
-                # normalize keys of first row
-                rows = list(reader)
-                if not rows:
-                    raise CommandError('CSV vacío')
-                nk_map = { _norm_key(k): k for k in rows[0].keys() }
-                dni_key = None
-                for nk in nk_map.keys():
-                    if 'dni' in nk or 'documento' in nk:
-                        dni_key = nk_map[nk]
-                        break
-                if not dni_key:
-                    raise CommandError('No se encontró columna DNI en el CSV')
-                for r in rows:
-                    v = r.get(dni_key)
-                    if v:
-                        dnis.add(str(v).strip())
-        else:
-            raise CommandError('Formato no soportado. Usa .csv o .xlsx')
-
-        if not dnis:
+
+            hay_dnis = False
+            candidatos = set()
+            for filas in en_lotes(lector, TAMANO_LOTE):
+                dnis = {str(f[dni_idx]).strip() for f in filas if f[dni_idx]}
+                if not dnis:
+                    continue
+                hay_dnis = True
+                # Students matching DNIs with placeholder grado/seccion
+                candidatos.update(
+                    Estudiante.objects.filter(dni__in=dnis)
+                    .filter(models.Q(grado__nombre='Sin Grado') | models.Q(seccion__nombre='Sin'))
+                    .values_list('id', flat=True)
+                )
+
+        if not hay_dnis:
             self.stdout.write(self.style.WARNING('No se encontraron DNIs en el archivo. Nada para hacer.'))
             return
 
-        # Find students matching DNIs with placeholder grado/seccion
-        qs_placeholder = Estudiante.objects.filter(dni__in=list(dnis)).filter(models.Q(grado__nombre='Sin Grado') | models.Q(seccion__nombre='Sin'))
-        count = qs_placeholder.count()
+        qs_placeholder = Estudiante.objects.filter(id__in=candidatos).select_related('grado', 'seccion')
+        count = len(candidatos)
 
         if count == 0:
             self.stdout.write(self.style.WARNING('No se encontraron estudiantes con grado/sección placeholder entre los DNIs del archivo.'))
@@ -115,13 +95,34 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR('Operación cancelada por el usuario.'))
                 return
 
-        # Perform deletion
-        deleted_info = []
-        for e in qs_placeholder:
-            dni = e.dni
-            e.delete()
-            deleted_info.append(dni)
+        # Perform deletion (un solo borrado por conjunto)
+        deleted_info = list(qs_placeholder.order_by('dni').values_list('dni', flat=True))
+        qs_placeholder.delete()
 
         self.stdout.write(self.style.SUCCESS(f'Estudiantes eliminados: {len(deleted_info)}'))
         for d in deleted_info:
             self.stdout.write(f' * {d}')
+
+    def _revertir_lote(self, lote_id, dry, assume_yes):
+        lote = LoteImportacion.objects.filter(pk=lote_id).first()
+        if lote is None:
+            raise CommandError(f'No existe el lote {lote_id}')
+        creados = lote.cambios.filter(creado=True).count()
+        actualizados = lote.cambios.filter(creado=False).count()
+        self.stdout.write(self.style.WARNING(
+            f'Lote {lote.pk} ({lote.archivo}, {lote.creado:%Y-%m-%d %H:%M}): se eliminarán {creados} estudiantes '
+            f'creados y se restaurarán {actualizados} actualizados.'
+        ))
+        if dry:
+            self.stdout.write(self.style.SUCCESS('Dry-run activado; no se modificó nada.'))
+            return
+        if not assume_yes:
+            confirm = input('Confirmar reversión del lote? escriba SI para confirmar: ')
+            if confirm.strip().upper() != 'SI':
+                self.stdout.write(self.style.ERROR('Operación cancelada por el usuario.'))
+                return
+        try:
+            eliminados, restaurados = revertir(lote.pk)
+        except ErrorReversion as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Lote {lote.pk} revertido. Eliminados: {eliminados}, Restaurados: {restaurados}'))
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from datetime import datetime
+import signal
+import time
+from asistencia import planificador
+
+
+class Command(BaseCommand):
+    help = ('Planificador de tareas diarias (faltas, resumen, limpieza de subidas). '
+            'Pensado para correr como proceso "clock" del Procfile; varias instancias no duplican tareas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=int, default=30, help='Segundos entre revisiones (por defecto 30).')
+        parser.add_argument('--una-vez', action='store_true', help='Revisa y ejecuta las tareas pendientes una sola vez y termina.')
+        parser.add_argument('--ejecutar', type=str, help='Ejecuta ahora la tarea indicada (reintenta si falló).')
+        parser.add_argument('--fecha', type=str, help='Fecha YYYY-MM-DD para --ejecutar. Por defecto hoy.')
+        parser.add_argument('--listar', action='store_true', help='Lista las tareas registradas y sus horas.')
+
+    def handle(self, *args, **options):
+        if options.get('listar'):
+            for t in planificador.TAREAS.values():
+                extra = ' (solo días lectivos)' if t.solo_lectivos else ''
+                self.stdout.write(f"{t.nombre}: {planificador.hora_de(t).strftime('%H:%M')}{extra}")
+            return
+
+        if options.get('ejecutar'):
+            t = planificador.TAREAS.get(options['ejecutar'])
+            if t is None:
+                raise CommandError(f"Tarea desconocida. Disponibles: {', '.join(planificador.TAREAS)}")
+            try:
+                fecha = datetime.strptime(options['fecha'], '%Y-%m-%d').date() if options.get('fecha') else timezone.localdate()
+            except ValueError:
+                raise CommandError('Formato de fecha inválido. Usa YYYY-MM-DD')
+            ejecucion = planificador.ejecutar(t, fecha, reintentar=True)
+            if ejecucion is None:
+                self.stdout.write(self.style.WARNING(f'{t.nombre} {fecha}: ya ejecutada o en curso en otra instancia.'))
+            else:
+                self._reportar(ejecucion)
+            return
+
+        if options.get('una_vez'):
+            for ejecucion in planificador.ciclo():
+                self._reportar(ejecucion)
+            return
+
+        detener = []
+        signal.signal(signal.SIGTERM, lambda *a: detener.append(True))
+        hechas = set()
+        self.stdout.write(f"Planificador iniciado ({len(planificador.TAREAS)} tareas, cada {options['intervalo']} s).")
+        try:
+            while not detener:
+                close_old_connections()
+                for ejecucion in planificador.ciclo(hechas=hechas):
+                    self._reportar(ejecucion)
+                # Olvidar días anteriores
+                hoy = timezone.localdate()
+                hechas = {h for h in hechas if h[1] == hoy}
+                close_old_connections()
+                for _ in range(options['intervalo']):
+                    if detener:
+                        break
+                    time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write('Planificador detenido.')
+
+    def _reportar(self, ejecucion):
+        estilo = self.style.SUCCESS if ejecucion.estado == 'ok' else self.style.ERROR
+        segundos = ejecucion.duracion.total_seconds() if ejecucion.duracion else 0
+        self.stdout.write(estilo(f'{ejecucion.nombre} {ejecucion.fecha}: {ejecucion.estado} en {segundos:.1f} s. {ejecucion.mensaje}'))
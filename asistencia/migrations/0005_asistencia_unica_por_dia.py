@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:50
+
+import asistencia.models
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def eliminar_duplicados(apps, schema_editor):
+    """Deja solo el primer registro por (estudiante, fecha) antes de crear la restricción."""
+    Asistencia = apps.get_model('asistencia', 'Asistencia')
+    duplicados = (
+        Asistencia.objects.values('estudiante_id', 'fecha')
+        .annotate(n=Count('id'), primero=Min('id'))
+        .filter(n__gt=1)
+    )
+    for d in list(duplicados):
+        Asistencia.objects.filter(estudiante_id=d['estudiante_id'], fecha=d['fecha']).exclude(id=d['primero']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0004_estudiante_codigo_interno_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asistencia',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AlterField(
+            model_name='asistencia',
+            name='hora',
+            field=models.TimeField(default=asistencia.models.hora_local),
+        ),
+        migrations.RunPython(eliminar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='asistencia',
+            constraint=models.UniqueConstraint(fields=('estudiante', 'fecha'), name='asistencia_unica_por_dia'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0005_asistencia_unica_por_dia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asistencia',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def poblar_resumen(apps, schema_editor):
+    """Construye el resumen inicial a partir de las asistencias existentes."""
+    Asistencia = apps.get_model('asistencia', 'Asistencia')
+    Estudiante = apps.get_model('asistencia', 'Estudiante')
+    ResumenDiario = apps.get_model('asistencia', 'ResumenDiario')
+    matriculados = dict(
+        Estudiante.objects.values('seccion_id').annotate(n=Count('id')).values_list('seccion_id', 'n')
+    )
+    agregados = (
+        Asistencia.objects.values('fecha', 'estudiante__seccion_id')
+        .annotate(
+            puntuales=Count('id', filter=Q(estado='puntual')),
+            tardes=Count('id', filter=Q(estado='tarde')),
+            faltas=Count('id', filter=Q(estado='falta')),
+        )
+    )
+    ResumenDiario.objects.bulk_create([
+        ResumenDiario(
+            fecha=a['fecha'],
+            seccion_id=a['estudiante__seccion_id'],
+            puntuales=a['puntuales'],
+            tardes=a['tardes'],
+            faltas=a['faltas'],
+            total_matriculados=matriculados.get(a['estudiante__seccion_id'], 0),
+        )
+        for a in agregados
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0006_asistencia_clave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('puntuales', models.PositiveIntegerField(default=0)),
+                ('tardes', models.PositiveIntegerField(default=0)),
+                ('faltas', models.PositiveIntegerField(default=0)),
+                ('total_matriculados', models.PositiveIntegerField(default=0)),
+                ('seccion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='asistencia.seccion')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'seccion'), name='resumen_unico_por_seccion')],
+            },
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
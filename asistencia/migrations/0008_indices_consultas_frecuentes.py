@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0007_resumendiario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['fecha', 'estado'], name='asistencia_fecha_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['-fecha', '-hora', 'id'], name='asistencia_fecha_hora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='estudiante',
+            index=models.Index(fields=['periodo', 'grado', 'seccion'], name='estudiante_periodo_grado_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0008_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiaNoLectivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('motivo', models.CharField(blank=True, max_length=150)),
+            ],
+            options={
+                'ordering': ['fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0009_dianolectivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EjecucionTarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('en_curso', 'En curso'), ('ok', 'Correcta'), ('error', 'Con error')], default='en_curso', max_length=10)),
+                ('inicio', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fin', models.DateTimeField(blank=True, null=True)),
+                ('duracion', models.DurationField(blank=True, null=True)),
+                ('instancia', models.CharField(blank=True, max_length=150)),
+                ('mensaje', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-inicio'],
+                'constraints': [models.UniqueConstraint(fields=('nombre', 'fecha'), name='tarea_unica_por_dia')],
+            },
+        ),
+    ]
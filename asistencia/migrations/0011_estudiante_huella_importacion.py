@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0010_ejecuciontarea'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estudiante',
+            name='huella_importacion',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0011_estudiante_huella_importacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.CharField(max_length=255, unique=True)),
+                ('periodo', models.IntegerField(blank=True, null=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('ok', 'Terminada'), ('error', 'Con error')], default='pendiente', max_length=12)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('inicio', models.DateTimeField(blank=True, null=True)),
+                ('fin', models.DateTimeField(blank=True, null=True)),
+                ('latido', models.DateTimeField(blank=True, null=True)),
+                ('instancia', models.CharField(blank=True, max_length=150)),
+                ('procesados', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(blank=True, null=True)),
+                ('creados', models.PositiveIntegerField(default=0)),
+                ('actualizados', models.PositiveIntegerField(default=0)),
+                ('sin_cambios', models.PositiveIntegerField(default=0)),
+                ('errores_log', models.CharField(blank=True, max_length=255)),
+                ('mensaje', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-creado'],
+                'indexes': [models.Index(fields=['estado', 'disponible_desde'], name='importjob_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0012_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.CharField(max_length=255)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('estado', models.CharField(choices=[('activo', 'Activo'), ('revertido', 'Revertido')], default='activo', max_length=10)),
+                ('revertido_en', models.DateTimeField(blank=True, null=True)),
+                ('creados', models.PositiveIntegerField(default=0)),
+                ('actualizados', models.PositiveIntegerField(default=0)),
+                ('trabajo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lotes', to='asistencia.importjob')),
+            ],
+            options={
+                'ordering': ['-creado'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CambioImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creado', models.BooleanField(default=False)),
+                ('anterior', models.JSONField(blank=True, null=True)),
+                ('estudiante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cambios_importacion', to='asistencia.estudiante')),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cambios', to='asistencia.loteimportacion')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('lote', 'estudiante'), name='cambio_unico_por_lote')],
+            },
+        ),
+    ]
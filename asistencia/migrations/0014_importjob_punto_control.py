@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:25
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0013_lotes_importacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='punto_control',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+    ]
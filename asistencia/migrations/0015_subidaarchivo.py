@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:26
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0014_importjob_punto_control'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaArchivo',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre_original', models.CharField(max_length=255)),
+                ('archivo', models.CharField(max_length=255, unique=True)),
+                ('periodo', models.IntegerField(blank=True, null=True)),
+                ('tamano', models.PositiveBigIntegerField()),
+                ('recibidos', models.PositiveBigIntegerField(default=0)),
+                ('partes', models.JSONField(blank=True, default=list)),
+                ('huella', models.CharField(blank=True, max_length=64)),
+                ('estado', models.CharField(choices=[('recibiendo', 'Recibiendo'), ('completa', 'Completa')], default='recibiendo', max_length=12)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('trabajo', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='subida', to='asistencia.importjob')),
+            ],
+            options={
+                'ordering': ['-creado'],
+            },
+        ),
+    ]
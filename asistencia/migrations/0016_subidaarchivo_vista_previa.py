@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0015_subidaarchivo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subidaarchivo',
+            name='vista_previa',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -9,6 +9,15 @@ Grado Sección Apoderado Estudiante Asistencia
 #Modelo Grado
 #=======================
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+import uuid
+
+
+def hora_local():
+    """Hora local (naive) usada por defecto en Asistencia.hora."""
+    return timezone.localtime().time().replace(tzinfo=None)
+
 
 class Grado(models.Model):
     nombre = models.CharField(max_length=50, unique=True)
@@ -68,6 +77,15 @@ class Estudiante(models.Model):
     # Estado de matrícula y observaciones (opcional)
     estado_matricula = models.CharField(max_length=50, null=True, blank=True)
     observaciones = models.TextField(null=True, blank=True)
+    # Huella de los campos de la última importación (ver importacion/motor.py):
+    # si la fila del archivo no cambió, el importador no la vuelve a escribir
+    huella_importacion = models.CharField(max_length=32, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # marcar_faltas y listados por periodo, grado y sección
+            models.Index(fields=['periodo', 'grado', 'seccion'], name='estudiante_periodo_grado_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
@@ -86,14 +104,250 @@ class Asistencia(models.Model):
     ]
 
     estudiante = models.ForeignKey(Estudiante, on_delete=models.CASCADE, related_name="asistencias")
-    fecha = models.DateField(auto_now_add=True)
-    hora = models.TimeField(auto_now_add=True)
+    # Valores por defecto (no auto_now_add) para poder registrar con la fecha/hora
+    # calculada por la vista o por marcar_faltas
+    fecha = models.DateField(default=timezone.localdate)
+    hora = models.TimeField(default=hora_local)
     estado = models.CharField(max_length=10, choices=ESTADOS)
     observacion = models.TextField(blank=True, null=True)
+    # Clave enviada por el kiosko sin conexión; evita duplicar un escaneo reenviado
+    clave_idempotencia = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Un solo registro por estudiante y día, garantizado por la base de datos.
+            # Su índice también sirve las búsquedas por (estudiante, fecha) y el
+            # filtro por grado en un rango (join desde Estudiante)
+            models.UniqueConstraint(fields=['estudiante', 'fecha'], name='asistencia_unica_por_dia'),
+        ]
+        indexes = [
+            # Dashboard y marcar_faltas: fecha, y estado dentro de una fecha
+            models.Index(fields=['fecha', 'estado'], name='asistencia_fecha_estado_idx'),
+            # Reporte: orden y cursor (-fecha, -hora, id), ver paginacion.py
+            models.Index(fields=['-fecha', '-hora', 'id'], name='asistencia_fecha_hora_idx'),
+        ]
 
     def __str__(self):
         return f"{self.estudiante} - {self.fecha} - {self.estado}"
 """
 👉 Cada registro pertenece a un estudiante, con fecha y hora automáticas.
+Solo puede existir un registro por estudiante y fecha (ver asistencia/registro.py).
 Usamos choices para limitar el estado a “puntual”, “tarde” o “falta”.
 """
+#=======================
+#Modelo ResumenDiario
+#=======================
+class ResumenDiario(models.Model):
+    fecha = models.DateField()
+    seccion = models.ForeignKey(Seccion, on_delete=models.CASCADE, related_name="resumenes")
+    puntuales = models.PositiveIntegerField(default=0)
+    tardes = models.PositiveIntegerField(default=0)
+    faltas = models.PositiveIntegerField(default=0)
+    total_matriculados = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'seccion'], name='resumen_unico_por_seccion'),
+        ]
+
+    def __str__(self):
+        return f"{self.seccion} - {self.fecha}"
+"""
+👉 Conteos de asistencia por sección y día, mantenidos al registrar (ver asistencia/resumen.py).
+Los reportes y el dashboard suman estas filas en lugar de recontar Asistencia.
+Se reconstruye con: python manage.py reconstruir_resumen --desde AAAA-MM-DD --hasta AAAA-MM-DD
+"""
+#=======================
+#Modelo DiaNoLectivo
+#=======================
+class DiaNoLectivo(models.Model):
+    fecha = models.DateField(unique=True)
+    motivo = models.CharField(max_length=150, blank=True)
+
+    class Meta:
+        ordering = ['fecha']
+
+    def __str__(self):
+        return f"{self.fecha} - {self.motivo}" if self.motivo else str(self.fecha)
+"""
+👉 Feriados, vacaciones y días sin clase (además de sábados y domingos).
+Se cargan en memoria como un conjunto de fechas (ver asistencia/calendario.py);
+marcar_faltas no registra faltas en estos días y los reportes no los cuentan.
+"""
+#=======================
+#Modelo EjecucionTarea
+#=======================
+class EjecucionTarea(models.Model):
+    ESTADOS = [
+        ('en_curso', 'En curso'),
+        ('ok', 'Correcta'),
+        ('error', 'Con error'),
+    ]
+
+    nombre = models.CharField(max_length=100)
+    # Día al que corresponde la ejecución (una por tarea y día)
+    fecha = models.DateField()
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='en_curso')
+    inicio = models.DateTimeField(default=timezone.now)
+    fin = models.DateTimeField(null=True, blank=True)
+    duracion = models.DurationField(null=True, blank=True)
+    # host:pid del planificador que tomó la tarea
+    instancia = models.CharField(max_length=150, blank=True)
+    mensaje = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-inicio']
+        constraints = [
+            # Es el "candado": solo un planificador puede crear la fila del día
+            models.UniqueConstraint(fields=['nombre', 'fecha'], name='tarea_unica_por_dia'),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} {self.fecha} - {self.estado} ({self.duracion or '-'})"
+"""
+👉 Registro de las tareas del planificador (python manage.py run_scheduler).
+La restricción única (nombre, fecha) hace de candado entre varias instancias,
+y duracion/estado sirven para monitorear las ejecuciones desde el admin.
+"""
+
+
+
+#=======================
+#Cola de importaciones
+#=======================
+class ImportJob(models.Model):
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('ok', 'Terminada'),
+        ('error', 'Con error'),
+    ]
+
+    # Nombre del archivo dentro de MEDIA_ROOT/uploads
+    archivo = models.CharField(max_length=255, unique=True)
+    periodo = models.IntegerField(null=True, blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADOS, default='pendiente')
+    creado = models.DateTimeField(default=timezone.now)
+    # No se toma antes de esta hora (espera entre reintentos)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    inicio = models.DateTimeField(null=True, blank=True)
+    fin = models.DateTimeField(null=True, blank=True)
+    # Último aviso de vida del worker; si se atrasa, el trabajo se retoma
+    latido = models.DateTimeField(null=True, blank=True)
+    # host:pid del worker que lo tomó
+    instancia = models.CharField(max_length=150, blank=True)
+    procesados = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    creados = models.PositiveIntegerField(default=0)
+    actualizados = models.PositiveIntegerField(default=0)
+    sin_cambios = models.PositiveIntegerField(default=0)
+    # CSV de filas con error, relativo a MEDIA_ROOT
+    errores_log = models.CharField(max_length=255, blank=True)
+    mensaje = models.TextField(blank=True)
+    # Punto de control: filas del archivo ya confirmadas, conteos y filas con
+    # error hasta ahí. Un reintento sigue desde aquí (ver import_estudiantes)
+    punto_control = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        ordering = ['-creado']
+        indexes = [
+            # El worker busca el pendiente más antiguo disponible
+            models.Index(fields=['estado', 'disponible_desde'], name='importjob_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.archivo} - {self.estado} ({self.procesados}/{self.total or '?'})"
+"""
+👉 Cola de importaciones de estudiantes subidas desde la web. La vista solo
+crea la fila; el comando procesar_importaciones toma los trabajos con
+select_for_update(skip_locked=True) y guarda aquí progreso y resultado.
+"""
+
+
+#=======================
+#Lotes de importación (rollback)
+#=======================
+class LoteImportacion(models.Model):
+    ESTADOS = [
+        ('activo', 'Activo'),
+        ('revertido', 'Revertido'),
+    ]
+
+    # Nombre del archivo importado (solo informativo: revertir no lo necesita)
+    archivo = models.CharField(max_length=255)
+    trabajo = models.ForeignKey(ImportJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='lotes')
+    creado = models.DateTimeField(default=timezone.now)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='activo')
+    revertido_en = models.DateTimeField(null=True, blank=True)
+    creados = models.PositiveIntegerField(default=0)
+    actualizados = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-creado']
+
+    def __str__(self):
+        return f"Lote {self.pk} {self.archivo} - {self.estado} (+{self.creados} / ~{self.actualizados})"
+
+
+class CambioImportacion(models.Model):
+    lote = models.ForeignKey(LoteImportacion, on_delete=models.CASCADE, related_name='cambios')
+    estudiante = models.ForeignKey(Estudiante, on_delete=models.CASCADE, related_name='cambios_importacion')
+    # True: el lote creó al estudiante (revertir lo borra)
+    creado = models.BooleanField(default=False)
+    # Valores previos de los campos importados (revertir los restaura)
+    anterior = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Por lote solo cuenta el primer cambio de cada estudiante
+            models.UniqueConstraint(fields=['lote', 'estudiante'], name='cambio_unico_por_lote'),
+        ]
+
+    def __str__(self):
+        return f"Lote {self.lote_id} - estudiante {self.estudiante_id} ({'creado' if self.creado else 'actualizado'})"
+"""
+👉 Cada importación crea un LoteImportacion y un CambioImportacion por
+estudiante creado o actualizado (con sus valores previos). rollback_import
+--lote revierte el lote con borrados/actualizaciones por conjunto, sin
+volver a leer el archivo.
+"""
+
+
+#=======================
+#Subidas por partes
+#=======================
+class SubidaArchivo(models.Model):
+    ESTADOS = [
+        ('recibiendo', 'Recibiendo'),
+        ('completa', 'Completa'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    nombre_original = models.CharField(max_length=255)
+    # Nombre final dentro de MEDIA_ROOT/uploads (mientras llega: <archivo>.part)
+    archivo = models.CharField(max_length=255, unique=True)
+    periodo = models.IntegerField(null=True, blank=True)
+    tamano = models.PositiveBigIntegerField()
+    recibidos = models.PositiveBigIntegerField(default=0)
+    # sha256 de cada parte recibida, en orden
+    partes = models.JSONField(default=list, blank=True)
+    # Al completar: sha256 de los sha256 de las partes (subidas.huella)
+    huella = models.CharField(max_length=64, blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADOS, default='recibiendo')
+    creado = models.DateTimeField(default=timezone.now)
+    actualizado = models.DateTimeField(auto_now=True)
+    trabajo = models.OneToOneField(ImportJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='subida')
+    # Al completarse no se encola: primero se muestra la vista previa
+    vista_previa = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-creado']
+
+    def __str__(self):
+        return f"{self.nombre_original} - {self.estado} ({self.recibidos}/{self.tamano})"
+"""
+👉 Las subidas grandes llegan por partes (importacion/subidas.py): cada
+parte se agrega al final de <archivo>.part y al completar el archivo se
+encola como ImportJob.
+"""
@@ -0,0 +1,72 @@
+"""
+Paginación por cursor (keyset) para listados de ``Asistencia``.
+
+El orden es ``(-fecha, -hora, id)`` y el cursor es la clave de la última (o
+primera) fila de la página: ``AAAA-MM-DD_HH:MM:SS_id``. Cada página se lee
+con un ``WHERE`` sobre esa clave y un ``LIMIT``, así que el costo no depende
+de qué tan lejos se esté en el listado ni del tamaño del rango de fechas
+(a diferencia de ``OFFSET``).
+"""
+
+from collections import namedtuple
+from datetime import date, time
+
+from django.db.models import Q
+
+TAMANO_PAGINA = 50
+
+ORDEN = ('-fecha', '-hora', 'id')
+_ORDEN_INVERSO = ('fecha', 'hora', '-id')
+
+Pagina = namedtuple('Pagina', ['objetos', 'siguiente', 'anterior'])
+
+
+def codificar(asistencia):
+    return f'{asistencia.fecha.isoformat()}_{asistencia.hora.isoformat()}_{asistencia.id}'
+
+
+def decodificar(cursor):
+    """Devuelve ``(fecha, hora, id)`` o ``None`` si el cursor no es válido."""
+    try:
+        fecha, hora, pk = cursor.split('_')
+        return date.fromisoformat(fecha), time.fromisoformat(hora), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def despues_de(fecha, hora, pk):
+    return Q(fecha__lt=fecha) | Q(fecha=fecha, hora__lt=hora) | Q(fecha=fecha, hora=hora, id__gt=pk)
+
+
+def antes_de(fecha, hora, pk):
+    return Q(fecha__gt=fecha) | Q(fecha=fecha, hora__gt=hora) | Q(fecha=fecha, hora=hora, id__lt=pk)
+
+
+def paginar(queryset, despues=None, antes=None, tamano=TAMANO_PAGINA):
+    """
+    Devuelve una ``Pagina`` de ``queryset`` en orden ``ORDEN``.
+
+    ``despues`` avanza desde un cursor y ``antes`` retrocede; sin ninguno se
+    devuelve la primera página. ``siguiente``/``anterior`` son los cursores
+    para los enlaces (``None`` si no hay más en esa dirección).
+    """
+    clave_antes = decodificar(antes) if antes else None
+    clave_despues = decodificar(despues) if despues and clave_antes is None else None
+
+    if clave_antes is not None:
+        filas = list(queryset.filter(antes_de(*clave_antes)).order_by(*_ORDEN_INVERSO)[:tamano + 1])
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano][::-1]
+        if not filas:
+            return Pagina([], None, None)
+        return Pagina(filas, codificar(filas[-1]), codificar(filas[0]) if hay_mas else None)
+
+    if clave_despues is not None:
+        queryset = queryset.filter(despues_de(*clave_despues))
+    filas = list(queryset.order_by(*ORDEN)[:tamano + 1])
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if not filas:
+        return Pagina([], None, None)
+    anterior = codificar(filas[0]) if clave_despues is not None else None
+    return Pagina(filas, codificar(filas[-1]) if hay_mas else None, anterior)
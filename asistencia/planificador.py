@@ -0,0 +1,195 @@
+"""
+Planificador de tareas de fin de día (``python manage.py run_scheduler``).
+
+Cada tarea se registra con ``@tarea(nombre, hora)`` y corre una vez por día
+a partir de su hora local (si el proceso arrancó tarde, corre al arrancar).
+Antes de ejecutar se inserta la fila ``EjecucionTarea(nombre, fecha)``: la
+restricción única hace de candado en la base de datos, así que aunque varias
+instancias del proceso ``clock`` estén activas solo una ejecuta la tarea. Si
+una instancia muere a mitad de una tarea, la fila queda ``en_curso`` y otra
+puede retomarla pasado ``BLOQUEO_VENCIDO``.
+
+Las horas se pueden cambiar con ``ASISTENCIA_HORARIO_TAREAS`` en settings
+(``{'marcar_faltas': '17:45'}``).
+"""
+
+import logging
+import os
+import socket
+import time as _time
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import calendario, horario
+from .importacion import cola
+from .models import EjecucionTarea, ImportJob, SubidaArchivo
+
+logger = logging.getLogger(__name__)
+
+Tarea = namedtuple('Tarea', ['nombre', 'hora', 'funcion', 'solo_lectivos'])
+
+BLOQUEO_VENCIDO = timedelta(hours=2)
+
+TAREAS = {}
+
+
+def tarea(nombre, hora, solo_lectivos=False):
+    """Registra ``funcion(fecha)`` como tarea diaria a la hora local ``hora``."""
+    def decorador(funcion):
+        TAREAS[nombre] = Tarea(nombre, hora, funcion, solo_lectivos)
+        return funcion
+    return decorador
+
+
+def hora_de(t):
+    """Hora configurada para la tarea (settings) o la de su registro."""
+    configurada = getattr(settings, 'ASISTENCIA_HORARIO_TAREAS', {}).get(t.nombre)
+    if configurada:
+        return datetime.strptime(configurada, '%H:%M').time()
+    return t.hora
+
+
+def _instancia():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _tomar(nombre, fecha, reintentar=False):
+    """
+    Intenta tomar el candado de ``nombre`` para ``fecha``. Devuelve la
+    ``EjecucionTarea`` tomada o ``None`` si otra instancia ya la tiene (o la
+    terminó). Con ``reintentar`` también se retoma una ejecución con error.
+    """
+    try:
+        with transaction.atomic():
+            return EjecucionTarea.objects.create(nombre=nombre, fecha=fecha, instancia=_instancia())
+    except IntegrityError:
+        pass
+    # Retomar una ejecución abandonada (la instancia murió sin registrar el fin)
+    ahora = timezone.now()
+    retomables = Q(estado='en_curso', inicio__lt=ahora - BLOQUEO_VENCIDO)
+    if reintentar:
+        retomables |= Q(estado='error')
+    retomada = EjecucionTarea.objects.filter(retomables, nombre=nombre, fecha=fecha).update(
+        estado='en_curso', inicio=ahora, fin=None, duracion=None, instancia=_instancia(), mensaje='',
+    )
+    if retomada:
+        return EjecucionTarea.objects.get(nombre=nombre, fecha=fecha)
+    return None
+
+
+def ejecutar(t, fecha, reintentar=False):
+    """
+    Ejecuta la tarea ``t`` para ``fecha`` si se obtiene el candado. Devuelve
+    la ``EjecucionTarea`` con estado y duración, o ``None`` si no se ejecutó.
+    """
+    ejecucion = _tomar(t.nombre, fecha, reintentar=reintentar)
+    if ejecucion is None:
+        return None
+    inicio = _time.monotonic()
+    try:
+        resultado = t.funcion(fecha)
+        ejecucion.estado = 'ok'
+        ejecucion.mensaje = str(resultado or '')
+    except Exception as e:
+        logger.exception('Tarea %s falló', t.nombre)
+        ejecucion.estado = 'error'
+        ejecucion.mensaje = f'{type(e).__name__}: {e}'
+    ejecucion.duracion = timedelta(seconds=_time.monotonic() - inicio)
+    ejecucion.fin = timezone.now()
+    ejecucion.save(update_fields=['estado', 'mensaje', 'duracion', 'fin'])
+    return ejecucion
+
+
+def pendientes(ahora):
+    """Tareas cuya hora ya pasó en el día local de ``ahora`` (aware)."""
+    local = timezone.localtime(ahora)
+    fecha = local.date()
+    lectivo = calendario.es_lectivo(fecha)
+    return [
+        t for t in TAREAS.values()
+        if hora_de(t) <= local.time() and (lectivo or not t.solo_lectivos)
+    ]
+
+
+def ciclo(ahora=None, hechas=None):
+    """
+    Ejecuta las tareas pendientes del día. ``hechas`` es un ``set`` de
+    ``(nombre, fecha)`` que el proceso mantiene entre ciclos para no
+    consultar la base de datos por tareas que ya resolvió.
+    """
+    ahora = ahora or timezone.now()
+    fecha = timezone.localtime(ahora).date()
+    hechas = hechas if hechas is not None else set()
+    ejecutadas = []
+    for t in pendientes(ahora):
+        if (t.nombre, fecha) in hechas:
+            continue
+        ejecucion = ejecutar(t, fecha)
+        if ejecucion is not None:
+            ejecutadas.append(ejecucion)
+        # Ejecutada aquí u otra instancia ya la tomó: no volver a intentarlo hoy
+        hechas.add((t.nombre, fecha))
+    return ejecutadas
+
+
+# =====================================================
+# TAREAS REGISTRADAS
+# =====================================================
+def _mas_minutos(hora, minutos):
+    return (datetime.combine(date.min, hora) + timedelta(minutes=minutos)).time()
+
+
+@tarea('marcar_faltas', horario.FIN_CLASE, solo_lectivos=True)
+def marcar_faltas(fecha):
+    salida = StringIO()
+    call_command('marcar_faltas', fecha=fecha.strftime('%Y-%m-%d'), stdout=salida)
+    return salida.getvalue().strip()
+
+
+@tarea('reconstruir_resumen', _mas_minutos(horario.FIN_CLASE, 15))
+def reconstruir_resumen(fecha):
+    salida = StringIO()
+    call_command('reconstruir_resumen', desde=fecha.strftime('%Y-%m-%d'), stdout=salida)
+    return salida.getvalue().strip()
+
+
+@tarea('limpiar_subidas', time(3, 0))
+def limpiar_subidas(fecha):
+    """
+    Borra de media/uploads los archivos (y su .status.json) más antiguos que
+    la retención, junto con los ImportJob terminados y las SubidaArchivo de ese
+    periodo.
+
+    Se conservan, sin importar su antigüedad, los archivos y trabajos de
+    importaciones pendientes o en curso y los de lotes que todavía se pueden
+    revertir (``import_revertir`` busca el lote por ``trabajo__archivo``).
+    """
+    dias = getattr(settings, 'ASISTENCIA_RETENCION_SUBIDAS_DIAS', 30)
+    uploads_dir = os.path.join(settings.MEDIA_ROOT or 'media', 'uploads')
+    if not os.path.isdir(uploads_dir):
+        return 'Sin carpeta de subidas'
+    en_uso = ImportJob.objects.filter(Q(estado__in=cola.ESTADOS_ACTIVOS) | Q(lotes__estado='activo'))
+    conservar = set(en_uso.values_list('archivo', flat=True))
+    limite = _time.time() - dias * 86400
+    borrados = 0
+    for fn in os.listdir(uploads_dir):
+        ruta = os.path.join(uploads_dir, fn)
+        archivo = fn.removesuffix('.status.json').removesuffix('.part')
+        if archivo in conservar:
+            continue
+        if os.path.isfile(ruta) and os.path.getmtime(ruta) < limite:
+            os.remove(ruta)
+            borrados += 1
+    trabajos, _ = ImportJob.objects.filter(
+        estado__in=('ok', 'error'), creado__lt=timezone.now() - timedelta(days=dias),
+    ).exclude(lotes__estado='activo').delete()
+    # Subidas por partes abandonadas o ya encoladas (su .part se borró arriba)
+    SubidaArchivo.objects.filter(actualizado__lt=timezone.now() - timedelta(days=dias)).delete()
+    return f'Archivos borrados: {borrados}, importaciones: {trabajos}'
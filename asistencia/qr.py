@@ -0,0 +1,153 @@
+"""
+Imágenes PNG de los códigos QR de los estudiantes (``MEDIA_ROOT/qrcodes``).
+
+Renderizar un QR es el paso más caro de la importación, así que ya no se
+hace dentro del bucle que escribe en la base de datos:
+
+- ``paralelo``: ``GeneradorQR`` reparte los DNIs de cada lote en un
+  ``ProcessPoolExecutor`` mientras el importador sigue con el lote siguiente.
+- ``diferido``: la importación no genera nada y la vista ``qr_imagen``
+  crea el archivo la primera vez que se pide.
+
+Un archivo que ya existe no se vuelve a generar: su nombre es el DNI y su
+contenido depende solo del DNI. Los archivos se escriben a un temporal y se
+renombran, así nunca queda un PNG a medio escribir que luego se omita.
+"""
+
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import qrcode
+from django.conf import settings
+
+MODOS = ('paralelo', 'diferido')
+# Con menos pendientes que esto no vale la pena levantar procesos
+MINIMO_PARALELO = 200
+# Como en el comando original el archivo se llama como el DNI; solo se
+# rechaza lo que saldría de la carpeta
+_DNI_INVALIDO = re.compile(r'[/\\\x00]|^\.\.?$')
+
+
+def directorio():
+    return os.path.join(settings.MEDIA_ROOT or 'media', 'qrcodes')
+
+
+def ruta(dni, carpeta=None):
+    """Ruta del PNG de ``dni`` o ``None`` si el DNI no sirve como nombre de archivo."""
+    if not dni or _DNI_INVALIDO.search(dni):
+        return None
+    return os.path.join(carpeta or directorio(), f'{dni}.png')
+
+
+def _escribir(dni, destino):
+    qr = qrcode.QRCode(version=1, box_size=10, border=4)
+    qr.add_data(dni)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    temporal = f'{destino}.{os.getpid()}.tmp'
+    try:
+        img.save(temporal, format='PNG')
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def asegurar(dni, carpeta=None):
+    """Genera el PNG de ``dni`` si no existe. Devuelve su ruta."""
+    destino = ruta(dni, carpeta)
+    if destino is None:
+        raise ValueError(f'DNI no válido para nombre de archivo: {dni!r}')
+    if not os.path.exists(destino):
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        _escribir(dni, destino)
+    return destino
+
+
+def _generar_lote(dnis, carpeta):
+    """Trabajo de un proceso: ``(generados, [(dni, error)])``."""
+    generados = 0
+    errores = []
+    for dni in dnis:
+        try:
+            _escribir(dni, os.path.join(carpeta, f'{dni}.png'))
+            generados += 1
+        except Exception as e:
+            errores.append((dni, str(e)))
+    return generados, errores
+
+
+class GeneradorQR:
+    """
+    Genera los QR de la importación fuera del bucle de la base de datos::
+
+        with GeneradorQR(procesos=4) as generador:
+            for lote in ...:
+                generador.agregar(dnis_del_lote)
+        generador.generados, generador.omitidos, generador.errores
+
+    ``agregar`` descarta los DNIs cuyo archivo ya existe y encola el resto;
+    al salir del ``with`` se espera a que terminen todos. Con ``procesos=1``
+    (o pocos pendientes) se genera en el mismo proceso.
+    """
+
+    def __init__(self, procesos=None, carpeta=None):
+        self.carpeta = carpeta or directorio()
+        self.procesos = procesos or getattr(settings, 'ASISTENCIA_QR_PROCESOS', None) or os.cpu_count() or 1
+        self.generados = 0
+        self.omitidos = 0
+        self.errores = []
+        self._pendientes = []
+        self._futuros = []
+        self._pool = None
+        os.makedirs(self.carpeta, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.terminar()
+
+    def agregar(self, dnis):
+        for dni in dict.fromkeys(dnis):
+            destino = ruta(dni, self.carpeta)
+            if destino is None:
+                self.errores.append((dni, 'DNI no válido para nombre de archivo'))
+            elif os.path.exists(destino):
+                self.omitidos += 1
+            else:
+                self._pendientes.append(dni)
+        if self.procesos > 1 and len(self._pendientes) >= MINIMO_PARALELO:
+            self._enviar()
+
+    def _enviar(self):
+        if self._pool is None:
+            # 'spawn': la importación web corre en un hilo del worker y hacer
+            # fork de un proceso con hilos no es seguro
+            self._pool = ProcessPoolExecutor(max_workers=self.procesos, mp_context=multiprocessing.get_context('spawn'))
+        # Un trabajo por proceso para repartir el lote entre todos los núcleos
+        tamano = -(-len(self._pendientes) // self.procesos)
+        for i in range(0, len(self._pendientes), tamano):
+            self._futuros.append(self._pool.submit(_generar_lote, self._pendientes[i:i + tamano], self.carpeta))
+        self._pendientes = []
+
+    def _recoger(self, resultado):
+        generados, errores = resultado
+        self.generados += generados
+        self.errores.extend(errores)
+
+    def terminar(self):
+        if self._pendientes:
+            if self._pool is not None:
+                self._enviar()
+            else:
+                self._recoger(_generar_lote(self._pendientes, self.carpeta))
+                self._pendientes = []
+        for futuro in self._futuros:
+            self._recoger(futuro.result())
+        self._futuros = []
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,88 @@
+"""
+Estudiantes que ya registraron asistencia en el día.
+
+Se guarda en el cache de Django (compartido entre workers; ver ``CACHES`` en
+settings) con una sola clave por fecha local: ``{estudiante_id: hora}``. Así
+la vista de escaneo responde "ya registró asistencia hoy" sin ir a la base
+de datos cuando la cámara lee el mismo carnet varias veces, y un día con
+miles de registros ocupa una entrada del cache y no miles (el cache en
+archivos borra entradas al azar al llenarse).
+
+- Se llena cada vez que un registro se confirma (``registro.py``). Las
+  faltas no se anotan: un escaneo real posterior debe poder reemplazarlas.
+- Si el cache no tiene la fecha (reinicio, cache nuevo, entrada borrada) se
+  reconstruye con una sola consulta a ``Asistencia`` en la primera lectura.
+- La clave expira al terminar el día.
+
+Dos workers que anotan a la vez pueden pisarse y perder una anotación; no
+es un error: ese estudiante simplemente vuelve a pasar por la base de datos,
+cuya restricción única decide.
+"""
+
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.utils import timezone
+
+_PREFIJO = 'asistencia:registrados'
+
+
+def _clave(fecha):
+    return f'{_PREFIJO}:{fecha}'
+
+
+def _segundos_hasta_fin_del_dia(fecha):
+    fin = timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+    # Margen para que un escaneo justo antes de medianoche no expire al instante
+    return max(int((fin - timezone.now()).total_seconds()), 0) + 3600
+
+
+def _del_dia(fecha):
+    horas = cache.get(_clave(fecha))
+    if horas is None:
+        from .models import Asistencia
+        horas = dict(
+            Asistencia.objects.filter(fecha=fecha).exclude(estado='falta').values_list('estudiante_id', 'hora')
+        )
+        cache.set(_clave(fecha), horas, _segundos_hasta_fin_del_dia(fecha))
+    return horas
+
+
+def hora_registrada(estudiante_id, fecha=None):
+    """Hora del registro del día si el estudiante ya registró, o ``None``."""
+    return _del_dia(fecha or timezone.localdate()).get(estudiante_id)
+
+
+async def ahora_registrada(estudiante_id, fecha=None):
+    """Versión async de ``hora_registrada``."""
+    return await sync_to_async(hora_registrada)(estudiante_id, fecha)
+
+
+def marcar(estudiante_id, fecha, hora):
+    marcar_varios([(estudiante_id, fecha, hora)])
+
+
+def marcar_varios(registros):
+    """``registros``: iterable de ``(estudiante_id, fecha, hora)``; una escritura por fecha."""
+    por_fecha = {}
+    for estudiante_id, fecha, hora in registros:
+        por_fecha.setdefault(fecha, {})[estudiante_id] = hora
+    for fecha, nuevos in por_fecha.items():
+        horas = cache.get(_clave(fecha))
+        # Sin la fecha en cache no hay nada que actualizar: la primera lectura
+        # la reconstruye desde la base de datos, ya con estos registros
+        if horas is None or all(horas.get(estudiante_id) == hora for estudiante_id, hora in nuevos.items()):
+            continue
+        horas.update(nuevos)
+        cache.set(_clave(fecha), horas, _segundos_hasta_fin_del_dia(fecha))
+
+
+def olvidar(estudiante_id, fecha):
+    # Se descarta el día completo: la siguiente lectura lo reconstruye
+    cache.delete(_clave(fecha))
+
+
+def olvidar_dias(fechas):
+    """Descarta varios días de una vez (borrados masivos de asistencias)."""
+    cache.delete_many([_clave(fecha) for fecha in fechas])
@@ -0,0 +1,297 @@
+"""
+Ruta única de escritura de asistencias.
+
+La usan la vista de escaneo QR, el registro manual y ``marcar_faltas``
+(``registrar_faltas``).
+Con la restricción ``asistencia_unica_por_dia`` el registro se hace con un
+solo INSERT que ignora el conflicto y devuelve el id insertado
+(``INSERT ... ON CONFLICT DO NOTHING RETURNING``, soportado por PostgreSQL y
+SQLite >= 3.35). Si no se insertó nada es porque el estudiante ya tenía
+asistencia ese día; solo en ese caso se consulta el registro existente.
+
+Una falta no bloquea el día: ``marcar_faltas`` corre al terminar la clase,
+pero un kiosko sin conexión puede sincronizar después escaneos de ese mismo
+día. Si llega un escaneo real (puntual o tarde) y el registro existente es
+una falta, el escaneo la reemplaza (``_reemplazar_falta``) y cuenta como
+registro nuevo.
+
+Cada resultado (nuevo o existente, salvo las faltas) se anota en ``registrados`` para que los
+escaneos repetidos del día se respondan desde el cache, y cada registro
+nuevo se suma a ``ResumenDiario`` (``resumen.py``) e invalida las
+estadísticas cacheadas del dashboard.
+"""
+
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import estadisticas, registrados, resumen
+from .models import Asistencia
+
+# id/hora/estado del registro del día (el nuevo o el que ya existía)
+ResultadoRegistro = namedtuple('ResultadoRegistro', ['id', 'hora', 'estado', 'creada'])
+
+_CAMPOS_INSERT = ('estudiante', 'fecha', 'hora', 'estado', 'observacion')
+_CAMPOS_INSERT_VARIOS = _CAMPOS_INSERT + ('clave_idempotencia',)
+# Filas por INSERT en registrar_varios (6 parámetros por fila)
+_FILAS_POR_INSERT = 100
+
+
+def _sql_insert(campos=_CAMPOS_INSERT, filas=1, retorno=('id',)):
+    qn = connection.ops.quote_name
+    meta = Asistencia._meta
+    columnas = [meta.get_field(f).column for f in campos]
+    valores = ', '.join([f'({", ".join(["%s"] * len(columnas))})'] * filas)
+    return (
+        f'INSERT INTO {qn(meta.db_table)} ({", ".join(qn(c) for c in columnas)}) '
+        f'VALUES {valores} '
+        f'ON CONFLICT ({qn(meta.get_field("estudiante").column)}, {qn(meta.get_field("fecha").column)}) DO NOTHING '
+        f'RETURNING {", ".join(qn(meta.get_field(f).column) for f in retorno)}'
+    )
+
+
+def _existente(estudiante_id, fecha):
+    fila = Asistencia.objects.filter(estudiante_id=estudiante_id, fecha=fecha).values_list('id', 'hora', 'estado').first()
+    return ResultadoRegistro(*fila, False) if fila else None
+
+
+def _reemplazar_falta(asistencia_id, hora, estado, observacion=None, clave=None):
+    """
+    Convierte la falta ``asistencia_id`` en un registro ``estado``. Devuelve
+    False si ya no es una falta (otro escaneo la reemplazó primero).
+    """
+    return bool(Asistencia.objects.filter(id=asistencia_id, estado='falta').update(
+        hora=hora, estado=estado, observacion=observacion, clave_idempotencia=clave,
+    ))
+
+
+def _contar_reemplazo(estudiante_id, fecha, estado):
+    resumen.restar(estudiante_id, fecha, 'falta')
+    resumen.sumar(estudiante_id, fecha, estado)
+    estadisticas.invalidar(fecha)
+
+
+def registrar_asistencia(estudiante_id, fecha, hora, estado, observacion=None):
+    """
+    Registra la asistencia del día si todavía no existe.
+
+    Devuelve un ``ResultadoRegistro``; ``creada`` es False cuando el
+    estudiante ya tenía un registro para ``fecha`` (y en ese caso id/hora/
+    estado son los del registro existente).
+    """
+    resultado = _registrar_asistencia(estudiante_id, fecha, hora, estado, observacion)
+    if resultado.estado == 'falta' and estado != 'falta' and _reemplazar_falta(resultado.id, hora, estado, observacion):
+        _contar_reemplazo(estudiante_id, fecha, estado)
+        resultado = ResultadoRegistro(resultado.id, hora, estado, True)
+    elif resultado.creada:
+        resumen.sumar(estudiante_id, fecha, estado)
+        estadisticas.invalidar(fecha)
+    if resultado.estado != 'falta':
+        registrados.marcar(estudiante_id, fecha, resultado.hora)
+    return resultado
+
+
+def _registrar_asistencia(estudiante_id, fecha, hora, estado, observacion=None):
+    # Dos intentos por si el registro existente se borra entre el INSERT y la consulta
+    for _ in range(2):
+        if connection.vendor in ('postgresql', 'sqlite'):
+            meta = Asistencia._meta
+            valores = [estudiante_id, fecha, hora, estado, observacion]
+            params = [
+                meta.get_field(campo).get_db_prep_save(valor, connection)
+                for campo, valor in zip(_CAMPOS_INSERT, valores)
+            ]
+            with connection.cursor() as cursor:
+                cursor.execute(_sql_insert(), params)
+                fila = cursor.fetchone()
+            if fila:
+                return ResultadoRegistro(fila[0], hora, estado, True)
+        else:
+            # Otros motores: INSERT normal y la restricción única resuelve la carrera
+            try:
+                with transaction.atomic():
+                    asistencia = Asistencia.objects.create(
+                        estudiante_id=estudiante_id, fecha=fecha, hora=hora, estado=estado, observacion=observacion
+                    )
+                return ResultadoRegistro(asistencia.id, hora, estado, True)
+            except IntegrityError:
+                pass
+        existente = _existente(estudiante_id, fecha)
+        if existente:
+            return existente
+    raise IntegrityError(f'No se pudo registrar la asistencia del estudiante {estudiante_id} para {fecha}')
+
+
+async def aregistrar_asistencia(estudiante_id, fecha, hora, estado, observacion=None):
+    """
+    Versión async de ``registrar_asistencia`` (ORM async: ``acreate``/``aget``).
+
+    Se intenta el INSERT directamente; si la restricción única lo rechaza se
+    lee el registro existente. Pensada para ejecutarse en autocommit (ASGI).
+    """
+    try:
+        asistencia = await Asistencia.objects.acreate(
+            estudiante_id=estudiante_id, fecha=fecha, hora=hora, estado=estado, observacion=observacion
+        )
+    except IntegrityError:
+        fila = await Asistencia.objects.filter(estudiante_id=estudiante_id, fecha=fecha).values_list(
+            'id', 'hora', 'estado'
+        ).aget()
+        resultado = ResultadoRegistro(*fila, False)
+    else:
+        resultado = ResultadoRegistro(asistencia.id, hora, estado, True)
+    if resultado.estado == 'falta' and estado != 'falta' and await sync_to_async(_reemplazar_falta)(
+        resultado.id, hora, estado, observacion
+    ):
+        await sync_to_async(_contar_reemplazo)(estudiante_id, fecha, estado)
+        resultado = ResultadoRegistro(resultado.id, hora, estado, True)
+    elif resultado.creada:
+        await sync_to_async(resumen.sumar)(estudiante_id, fecha, estado)
+        await sync_to_async(estadisticas.invalidar)(fecha)
+    if resultado.estado != 'falta':
+        await sync_to_async(registrados.marcar)(estudiante_id, fecha, resultado.hora)
+    return resultado
+
+
+def _insertar_varios(filas):
+    """
+    Inserta ``filas`` (tuplas en el orden de ``_CAMPOS_INSERT_VARIOS``)
+    ignorando las que ya existen. Devuelve ``{(estudiante_id, fecha): id}``
+    solo de las que insertó esta llamada: un escaneo simultáneo que insertó
+    primero no cuenta como nuevo.
+    """
+    insertadas = {}
+    if connection.vendor in ('postgresql', 'sqlite'):
+        meta = Asistencia._meta
+        campos = [meta.get_field(f) for f in _CAMPOS_INSERT_VARIOS]
+        campo_fecha = meta.get_field('fecha')
+        for inicio in range(0, len(filas), _FILAS_POR_INSERT):
+            grupo = filas[inicio:inicio + _FILAS_POR_INSERT]
+            params = [campo.get_db_prep_save(valor, connection) for fila in grupo for campo, valor in zip(campos, fila)]
+            with connection.cursor() as cursor:
+                cursor.execute(_sql_insert(_CAMPOS_INSERT_VARIOS, len(grupo), ('id', 'estudiante', 'fecha')), params)
+                for asistencia_id, estudiante_id, fecha in cursor.fetchall():
+                    insertadas[(estudiante_id, campo_fecha.to_python(fecha))] = asistencia_id
+    else:
+        for fila in filas:
+            try:
+                with transaction.atomic():
+                    asistencia = Asistencia.objects.create(**dict(zip(('estudiante_id',) + _CAMPOS_INSERT_VARIOS[1:], fila)))
+            except IntegrityError:
+                continue
+            insertadas[(asistencia.estudiante_id, asistencia.fecha)] = asistencia.id
+    return insertadas
+
+
+def registrar_varios(registros):
+    """
+    Registra varias asistencias con ``INSERT ... ON CONFLICT DO NOTHING
+    RETURNING`` de varias filas (``_insertar_varios``).
+
+    ``registros`` es un iterable de tuplas
+    ``(estudiante_id, fecha, hora, estado, observacion, clave_idempotencia)``;
+    si hay varias para el mismo estudiante y fecha se toma la primera. Las
+    faltas existentes se reemplazan por los registros que no son falta. Devuelve
+    ``{(estudiante_id, fecha): ResultadoRegistro}``; ``creada`` solo es True
+    para las filas que insertó (o reemplazó) esta llamada.
+    """
+    pendientes = {}
+    for registro in registros:
+        pendientes.setdefault((registro[0], registro[1]), registro)
+    if not pendientes:
+        return {}
+
+    ids = {clave[0] for clave in pendientes}
+    fechas = {clave[1] for clave in pendientes}
+    resultados = {}
+    existentes = Asistencia.objects.filter(estudiante_id__in=ids, fecha__in=fechas).values_list(
+        'id', 'estudiante_id', 'fecha', 'hora', 'estado'
+    )
+    reemplazos = []
+    for asistencia_id, estudiante_id, fecha, hora, estado in existentes:
+        pendiente = pendientes.get((estudiante_id, fecha))
+        if pendiente is None:
+            continue
+        _, _, hora_nueva, estado_nuevo, observacion, clave = pendiente
+        if estado == 'falta' and estado_nuevo != 'falta' and _reemplazar_falta(
+            asistencia_id, hora_nueva, estado_nuevo, observacion, clave
+        ):
+            reemplazos.append((estudiante_id, fecha, estado_nuevo))
+            resultados[(estudiante_id, fecha)] = ResultadoRegistro(asistencia_id, hora_nueva, estado_nuevo, True)
+        else:
+            resultados[(estudiante_id, fecha)] = ResultadoRegistro(asistencia_id, hora, estado, False)
+
+    faltantes = [registro for clave, registro in pendientes.items() if clave not in resultados]
+    insertadas = _insertar_varios(faltantes) if faltantes else {}
+    nuevos = []
+    perdidos = set()
+    for estudiante_id, fecha, hora, estado, _, _ in faltantes:
+        asistencia_id = insertadas.get((estudiante_id, fecha))
+        if asistencia_id is None:
+            # Un escaneo simultáneo insertó primero: se responde con su registro
+            perdidos.add((estudiante_id, fecha))
+            continue
+        nuevos.append((estudiante_id, fecha, estado))
+        resultados[(estudiante_id, fecha)] = ResultadoRegistro(asistencia_id, hora, estado, True)
+    if perdidos:
+        ganadores = Asistencia.objects.filter(
+            estudiante_id__in={p[0] for p in perdidos}, fecha__in={p[1] for p in perdidos}
+        ).values_list('id', 'estudiante_id', 'fecha', 'hora', 'estado')
+        for asistencia_id, estudiante_id, fecha, hora, estado in ganadores:
+            if (estudiante_id, fecha) in perdidos:
+                resultados[(estudiante_id, fecha)] = ResultadoRegistro(asistencia_id, hora, estado, False)
+    # Solo los registros de hoy que no son falta: las faltas y los días
+    # pasados (marcar_faltas, rellenos) no los consulta la vista de escaneo
+    hoy = timezone.localdate()
+    registrados.marcar_varios(
+        (est_id, fecha, r.hora) for (est_id, fecha), r in resultados.items() if r.estado != 'falta' and fecha >= hoy
+    )
+    for estudiante_id, fecha, _ in reemplazos:
+        resumen.restar(estudiante_id, fecha, 'falta')
+    if nuevos or reemplazos:
+        resumen.sumar_varios(nuevos + reemplazos)
+        estadisticas.invalidar(*{r[1] for r in nuevos + reemplazos})
+    return resultados
+
+
+LOTE_FALTAS = 1000
+
+
+def registrar_faltas(estudiantes, fechas, hora):
+    """
+    Registra falta a los ``estudiantes`` (queryset) sin asistencia en cada
+    una de las ``fechas`` (los días lectivos del rango).
+
+    Una sola pasada sobre los estudiantes: por cada grupo se cruzan sus ids
+    con todas las fechas y ``registrar_varios`` resuelve el grupo con una
+    consulta de existentes (``estudiante_id IN ... AND fecha IN ...``) y un
+    ``bulk_create``. Cada grupo tiene a lo sumo ``LOTE_FALTAS`` pares
+    estudiante-fecha, así que las consultas dependen del número de
+    estudiantes y no del número de días. Todo en una transacción. Devuelve
+    ``(revisados, {fecha: marcadas})``.
+    """
+    fechas = sorted(fechas)
+    marcadas = dict.fromkeys(fechas, 0)
+    if not fechas:
+        return 0, marcadas
+    por_grupo = max(1, LOTE_FALTAS // len(fechas))
+    revisados = 0
+
+    def _registrar(ids):
+        resultados = registrar_varios((est_id, fecha, hora, 'falta', None, None) for est_id in ids for fecha in fechas)
+        for (_, fecha), r in resultados.items():
+            marcadas[fecha] += r.creada
+
+    with transaction.atomic():
+        grupo = []
+        for est_id in estudiantes.order_by().values_list('id', flat=True).iterator(chunk_size=LOTE_FALTAS):
+            revisados += 1
+            grupo.append(est_id)
+            if len(grupo) == por_grupo:
+                _registrar(grupo)
+                grupo = []
+        if grupo:
+            _registrar(grupo)
+    return revisados, marcadas
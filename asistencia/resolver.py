@@ -0,0 +1,145 @@
+"""
+Resolución en memoria de códigos QR -> datos del estudiante.
+
+Cada worker mantiene un diccionario compacto ``codigo_qr -> EstudianteQR``
+con lo que necesita la vista de escaneo (id, nombre, grado y sección), de
+modo que un escaneo no tenga que ir a la base de datos para identificar al
+estudiante ni para armar el texto de grado/sección.
+
+El mapa se precarga al iniciar el worker (ver ``sistema_asistencia/wsgi.py``)
+y se invalida con las señales de ``Estudiante``, ``Grado`` y ``Seccion``
+(ver ``asistencia/signals.py``). Para que la invalidación llegue a todos los
+workers de gunicorn se guarda una "versión" en el cache de Django: cuando la
+versión cambia, el worker recarga el mapa completo en su siguiente consulta.
+"""
+
+import threading
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+
+from .versiones import Version
+
+EstudianteQR = namedtuple('EstudianteQR', ['id', 'nombre', 'grado', 'seccion'])
+
+_VERSION = Version('asistencia:resolver_qr:version')
+_CAMPOS = ('codigo_qr', 'id', 'nombre', 'apellido', 'grado__nombre', 'seccion__nombre', 'seccion__grado__nombre')
+
+_lock = threading.Lock()
+_mapa = None
+_version = None
+
+
+def _entrada(fila):
+    _, est_id, nombre, apellido, grado, seccion, seccion_grado = fila
+    # Mismo texto que producen Grado.__str__ y Seccion.__str__
+    return EstudianteQR(est_id, f'{nombre} {apellido}', grado, f'{seccion_grado} - Sección {seccion}')
+
+
+def _consulta():
+    from .models import Estudiante
+    return Estudiante.objects.values_list(*_CAMPOS)
+
+
+def _cargar():
+    global _mapa, _version
+    version = _VERSION.leer()
+    mapa = {fila[0]: _entrada(fila) for fila in _consulta().iterator(chunk_size=2000)}
+    with _lock:
+        _mapa = mapa
+        _version = version
+    return mapa
+
+
+def precargar():
+    """Carga (o recarga) el mapa completo con una sola consulta."""
+    return len(_cargar())
+
+
+def _vigente(version):
+    """El mapa de este worker si sigue en ``version`` (la del cache); si no, ``None``."""
+    mapa = _mapa
+    if mapa is None or version != _version:
+        return None
+    return mapa
+
+
+def _agregar(mapa, fila):
+    """Agrega al mapa la fila de una consulta puntual (``None`` si no existe)."""
+    if fila is None:
+        return None
+    entrada = _entrada(fila)
+    mapa[fila[0]] = entrada
+    return entrada
+
+
+def resolver(codigo_qr):
+    """
+    Devuelve el ``EstudianteQR`` para un código o ``None`` si no existe.
+
+    Con el mapa caliente no se hace ninguna consulta. Si el código no está en
+    el mapa se confirma con una consulta puntual (cubre estudiantes creados
+    en otro worker cuando el cache no es compartido).
+    """
+    if not codigo_qr:
+        return None
+    mapa = _vigente(_VERSION.leer())
+    if mapa is None:
+        mapa = _cargar()
+    entrada = mapa.get(codigo_qr)
+    if entrada is None:
+        entrada = _agregar(mapa, _consulta().filter(codigo_qr=codigo_qr).first())
+    return entrada
+
+
+async def aresolver(codigo_qr):
+    """Versión async de ``resolver`` para la vista ASGI (cache y consulta sin bloquear el loop)."""
+    if not codigo_qr:
+        return None
+    mapa = _vigente(await _VERSION.aleer())
+    if mapa is None:
+        mapa = await sync_to_async(_cargar)()
+    entrada = mapa.get(codigo_qr)
+    if entrada is None:
+        entrada = _agregar(mapa, await _consulta().filter(codigo_qr=codigo_qr).afirst())
+    return entrada
+
+
+def resolver_varios(codigos):
+    """
+    Resuelve varios códigos a la vez: ``{codigo_qr: EstudianteQR}``.
+
+    Los códigos que no estén en el mapa se confirman con una sola consulta
+    ``codigo_qr__in``; los inexistentes no aparecen en el resultado.
+    """
+    mapa = _vigente(_VERSION.leer())
+    if mapa is None:
+        mapa = _cargar()
+    encontrados = {}
+    faltantes = set()
+    for codigo in codigos:
+        if not codigo:
+            continue
+        entrada = mapa.get(codigo)
+        if entrada is None:
+            faltantes.add(codigo)
+        else:
+            encontrados[codigo] = entrada
+    if faltantes:
+        for fila in _consulta().filter(codigo_qr__in=faltantes):
+            encontrados[fila[0]] = _agregar(mapa, fila)
+    return encontrados
+
+
+def invalidar():
+    """
+    Marca el mapa como obsoleto en este worker y, al confirmar la
+    transacción, en todos los demás.
+
+    La nueva versión se publica una sola vez por transacción (ver
+    ``versiones.Version``).
+    """
+    global _mapa
+    with _lock:
+        _mapa = None
+    _VERSION.publicar_al_confirmar()
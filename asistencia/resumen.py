@@ -0,0 +1,137 @@
+"""
+Mantenimiento de ``ResumenDiario`` (conteos por sección y día).
+
+Las rutas de escritura de ``registro.py`` suman cada registro nuevo con un
+``UPDATE ... SET puntuales = puntuales + 1`` sobre la fila de la sección; la
+primera vez en el día se crea la fila con el total de matriculados. Los
+borrados de ``Asistencia`` restan (ver ``signals.py``). Ante cualquier duda
+(ediciones manuales, cambios de sección) se reconstruye un rango con
+``reconstruir`` o ``python manage.py reconstruir_resumen``.
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Subquery, Sum
+
+from .models import Asistencia, Estudiante, ResumenDiario
+
+CAMPO_POR_ESTADO = {'puntual': 'puntuales', 'tarde': 'tardes', 'falta': 'faltas'}
+
+
+def _aplicar(fecha, seccion_id, conteo, actualizar=True):
+    """Suma ``conteo`` {estado: n} a la fila (fecha, seccion), creándola si no existe."""
+    cambios = {
+        CAMPO_POR_ESTADO[estado]: F(CAMPO_POR_ESTADO[estado]) + n
+        for estado, n in conteo.items() if estado in CAMPO_POR_ESTADO and n
+    }
+    if not cambios:
+        return
+    if actualizar and ResumenDiario.objects.filter(fecha=fecha, seccion_id=seccion_id).update(**cambios):
+        return
+    valores = {CAMPO_POR_ESTADO[e]: n for e, n in conteo.items() if e in CAMPO_POR_ESTADO}
+    try:
+        with transaction.atomic():
+            ResumenDiario.objects.create(
+                fecha=fecha,
+                seccion_id=seccion_id,
+                total_matriculados=Estudiante.objects.filter(seccion_id=seccion_id).count(),
+                **valores,
+            )
+    except IntegrityError:
+        # Otro worker creó la fila primero
+        ResumenDiario.objects.filter(fecha=fecha, seccion_id=seccion_id).update(**cambios)
+
+
+def sumar(estudiante_id, fecha, estado, signo=1):
+    """Suma un registro nuevo de ``estudiante_id`` (un solo UPDATE en el caso normal)."""
+    campo = CAMPO_POR_ESTADO.get(estado)
+    if not campo:
+        return
+    seccion = Estudiante.objects.filter(id=estudiante_id).values('seccion_id')
+    filas = ResumenDiario.objects.filter(fecha=fecha, seccion_id=Subquery(seccion))
+    if signo < 0:
+        # Nunca bajar de cero (los campos son PositiveIntegerField)
+        filas = filas.filter(**{f'{campo}__gt': 0})
+    actualizadas = filas.update(**{campo: F(campo) + signo})
+    if actualizadas or signo < 0:
+        return
+    seccion_id = seccion.values_list('seccion_id', flat=True).first()
+    if seccion_id is not None:
+        # Primer registro de la sección en el día: el UPDATE de arriba no encontró la fila
+        _aplicar(fecha, seccion_id, {estado: 1}, actualizar=False)
+
+
+def restar(estudiante_id, fecha, estado):
+    sumar(estudiante_id, fecha, estado, signo=-1)
+
+
+def sumar_varios(registros):
+    """``registros``: iterable de ``(estudiante_id, fecha, estado)`` recién creados."""
+    registros = list(registros)
+    if not registros:
+        return
+    secciones = dict(
+        Estudiante.objects.filter(id__in={r[0] for r in registros}).values_list('id', 'seccion_id')
+    )
+    conteos = defaultdict(Counter)
+    for estudiante_id, fecha, estado in registros:
+        if estudiante_id in secciones:
+            conteos[(fecha, secciones[estudiante_id])][estado] += 1
+    for (fecha, seccion_id), conteo in conteos.items():
+        _aplicar(fecha, seccion_id, conteo)
+
+
+def reconstruir(desde, hasta, secciones=None, fechas=None):
+    """
+    Recalcula ``ResumenDiario`` entre ``desde`` y ``hasta`` (inclusive) desde
+    ``Asistencia``. ``secciones`` y ``fechas`` (ids y fechas) limitan lo que
+    se recalcula a esas secciones y días del rango. Devuelve el número de
+    filas creadas.
+    """
+    asistencias = Asistencia.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+    resumenes = ResumenDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+    if secciones is not None:
+        asistencias = asistencias.filter(estudiante__seccion_id__in=secciones)
+        resumenes = resumenes.filter(seccion_id__in=secciones)
+    if fechas is not None:
+        asistencias = asistencias.filter(fecha__in=fechas)
+        resumenes = resumenes.filter(fecha__in=fechas)
+    agregados = (
+        asistencias
+        .values('fecha', 'estudiante__seccion_id')
+        .annotate(
+            puntuales=Count('id', filter=Q(estado='puntual')),
+            tardes=Count('id', filter=Q(estado='tarde')),
+            faltas=Count('id', filter=Q(estado='falta')),
+        )
+    )
+    estudiantes = Estudiante.objects.all()
+    if secciones is not None:
+        estudiantes = estudiantes.filter(seccion_id__in=secciones)
+    matriculados = dict(
+        estudiantes.values('seccion_id').annotate(n=Count('id')).values_list('seccion_id', 'n')
+    )
+    filas = [
+        ResumenDiario(
+            fecha=a['fecha'],
+            seccion_id=a['estudiante__seccion_id'],
+            puntuales=a['puntuales'],
+            tardes=a['tardes'],
+            faltas=a['faltas'],
+            total_matriculados=matriculados.get(a['estudiante__seccion_id'], 0),
+        )
+        for a in agregados.iterator(chunk_size=2000)
+    ]
+    with transaction.atomic():
+        resumenes.delete()
+        ResumenDiario.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+def totales(resumenes):
+    """Suma puntuales/tardes/faltas de un queryset de ``ResumenDiario``."""
+    datos = resumenes.aggregate(puntuales=Sum('puntuales'), tardes=Sum('tardes'), faltas=Sum('faltas'))
+    datos = {k: v or 0 for k, v in datos.items()}
+    datos['total'] = datos['puntuales'] + datos['tardes'] + datos['faltas']
+    return datos
@@ -0,0 +1,67 @@
+"""
+Señales del app asistencia.
+
+Se conectan desde ``AsistenciaConfig.ready``.
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import calendario, estadisticas, registrados, resolver, resumen
+from .models import Asistencia, DiaNoLectivo, Estudiante, Grado, Seccion
+
+
+@receiver(post_save, sender=Estudiante)
+@receiver(post_delete, sender=Estudiante)
+@receiver(post_save, sender=Grado)
+@receiver(post_delete, sender=Grado)
+@receiver(post_save, sender=Seccion)
+@receiver(post_delete, sender=Seccion)
+def invalidar_resolver_qr(sender, **kwargs):
+    # Cambió un estudiante o el nombre de un grado/sección: el mapa QR queda obsoleto
+    resolver.invalidar()
+
+
+@receiver(post_save, sender=Estudiante)
+@receiver(post_delete, sender=Estudiante)
+@receiver(post_save, sender=Grado)
+@receiver(post_delete, sender=Grado)
+def invalidar_totales_dashboard(sender, **kwargs):
+    estadisticas.invalidar(timezone.localdate())
+
+
+@receiver(pre_save, sender=Asistencia)
+def recordar_asistencia_anterior(sender, instance, raw=False, **kwargs):
+    # Lo que había antes de una edición (admin), para moverlo en ResumenDiario
+    instance._anterior = None
+    if instance.pk and not raw:
+        instance._anterior = Asistencia.objects.filter(pk=instance.pk).values_list(
+            'estudiante_id', 'fecha', 'estado'
+        ).first()
+
+
+@receiver(post_save, sender=Asistencia)
+def invalidar_dashboard_por_asistencia(sender, instance, created, **kwargs):
+    # Ediciones desde el admin. Las altas normales pasan por registro.py, que
+    # ya las suma al resumen; aquí solo se mueve el conteo de una edición
+    anterior = getattr(instance, '_anterior', None)
+    if not created and anterior and anterior != (instance.estudiante_id, instance.fecha, instance.estado):
+        resumen.restar(*anterior)
+        resumen.sumar(instance.estudiante_id, instance.fecha, instance.estado)
+        estadisticas.invalidar(anterior[1])
+    estadisticas.invalidar(instance.fecha)
+
+
+@receiver(post_delete, sender=Asistencia)
+def olvidar_registro_del_dia(sender, instance, **kwargs):
+    # Si se borra un registro (admin, rollback) el estudiante puede volver a marcar
+    registrados.olvidar(instance.estudiante_id, instance.fecha)
+    resumen.restar(instance.estudiante_id, instance.fecha, instance.estado)
+    estadisticas.invalidar(instance.fecha)
+
+
+@receiver(post_save, sender=DiaNoLectivo)
+@receiver(post_delete, sender=DiaNoLectivo)
+def invalidar_calendario(sender, **kwargs):
+    calendario.invalidar()
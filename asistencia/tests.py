@@ -1,29 +1,63 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
 from django.conf import settings
-from .models import Estudiante, Grado, Seccion, Apoderado, Asistencia
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from .models import (
+	Estudiante, Grado, Seccion, Apoderado, Asistencia, DiaNoLectivo, EjecucionTarea, ImportJob,
+	LoteImportacion, ResumenDiario,
+)
+from . import calendario, exportacion, planificador, qr, registrados, registro, resolver
+from .registro import registrar_asistencia, registrar_varios
+from .paginacion import paginar
+from .importacion import cola
+from .importacion.columnas import ErrorColumnas, resolver_columnas
+from .importacion.lectura import Lector, en_lotes
+from .importacion.lotes import ErrorReversion, revertir
+from .importacion.motor import MotorImportacion
+from .importacion.progreso import Progreso
+from .management.commands.import_estudiantes import _LogErrores
 import tempfile
 import os
 import csv
+import hashlib
+import io
+import json
+import shutil
+import openpyxl
+from io import StringIO
 from unittest.mock import patch
 from django.utils import timezone
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
+
+def media_temporal(test):
+	"""MEDIA_ROOT en un directorio temporal que se borra al terminar el test."""
+	tempdir = tempfile.mkdtemp()
+	test.addCleanup(shutil.rmtree, tempdir, ignore_errors=True)
+	ajustes = override_settings(MEDIA_ROOT=tempdir)
+	ajustes.enable()
+	test.addCleanup(ajustes.disable)
+	return tempdir
+
+
+def escribir_csv(directorio, nombre, columnas, filas):
+	"""Escribe un padrón CSV de prueba (encabezados y filas) y devuelve su ruta."""
+	ruta = os.path.join(directorio, nombre)
+	with open(ruta, 'w', newline='', encoding='utf-8') as f:
+		writer = csv.writer(f)
+		writer.writerow(columnas)
+		writer.writerows(filas)
+	return ruta
 
 
 class ImportEstudiantesCommandTest(TestCase):
 	def setUp(self):
-		self.tempdir = tempfile.mkdtemp()
-
-	def tearDown(self):
-		# limpiar archivos generados
-		qr_dir = os.path.join(settings.MEDIA_ROOT or 'media', 'qrcodes')
-		if os.path.exists(qr_dir):
-			for f in os.listdir(qr_dir):
-				if f.endswith('.png'):
-					try:
-						os.remove(os.path.join(qr_dir, f))
-					except Exception:
-						pass
+		# Los QR y los CSV de errores quedan en el temporal, no en media/
+		self.tempdir = media_temporal(self)
 
 	def test_import_csv_creates_students_and_qr(self):
 		csv_path = os.path.join(self.tempdir, 'estudiantes.csv')
@@ -57,9 +91,134 @@ class ImportEstudiantesCommandTest(TestCase):
 		qr_path = os.path.join(settings.MEDIA_ROOT or 'media', 'qrcodes', '12345678.png')
 		self.assertTrue(os.path.exists(qr_path))
 
+	def test_importacion_en_lote_conteos_y_consultas_constantes(self):
+		grado = Grado.objects.create(nombre='3')
+		Estudiante.objects.create(nombre='Viejo', apellido='Nombre', dni='70000000', grado=grado, seccion=Seccion.objects.create(nombre='A', grado=grado), codigo_qr='70000000')
+		columnas = ['DNI', 'NOMBRES', 'APELLIDO PATERNO', 'GRADO', 'SECCION', 'APODERADO_CORREO', 'APODERADO_NOMBRE']
+		filas = [['70000000', 'Nuevo', 'Nombre', '3', 'A', '', '']]
+		filas += [[f'7000{i:04d}', f'N{i}', 'Apellido', f'{i % 3 + 1}', 'AB'[i % 2], f'tutor{i % 5}@x.pe', 'Tutor'] for i in range(1, 60)]
+		filas += [['70000001', 'Repetido', 'Apellido', '1', 'B', '', ''], ['', 'Sin', 'Dni', '1', 'A', '', ''], ['70009999', 'Sin', 'Grado', '', '', '', '']]
+		ruta = escribir_csv(self.tempdir, 'lote.csv', columnas, filas)
+		salida = StringIO()
+		with CaptureQueriesContext(connection) as ctx:
+			call_command('import_estudiantes', ruta, periodo=2026, stdout=salida)
+		self.assertIn('Creados: 60, Actualizados: 2', salida.getvalue())
+		self.assertIn('Se salta fila incompleta', salida.getvalue())
+		# Sin consultas por fila
+		self.assertLess(len(ctx.captured_queries), 40)
+		self.assertEqual(Estudiante.objects.get(dni='70000000').nombre, 'Nuevo')
+		repetido = Estudiante.objects.get(dni='70000001')
+		self.assertEqual((repetido.nombre, repetido.grado.nombre, repetido.seccion.nombre), ('Repetido', '1', 'B'))
+		self.assertEqual(repetido.periodo, 2026)
+		self.assertEqual(Estudiante.objects.get(dni='70000002').apoderado.correo, 'tutor2@x.pe')
+		sin_grado = Estudiante.objects.get(dni='70009999')
+		self.assertEqual((sin_grado.grado.nombre, sin_grado.seccion.nombre), ('Sin Grado', 'Sin'))
+		self.assertEqual(Seccion.objects.filter(grado__nombre='3', nombre='A').count(), 1)
+
+	def test_mismos_resultados_que_el_comando_fila_por_fila(self):
+		# Resultados del comando original (fila por fila) con este mismo archivo
+		grado = Grado.objects.create(nombre='3')
+		Estudiante.objects.create(nombre='Rosa', apellido='Vega', dni='71000009', grado=grado, seccion=Seccion.objects.create(nombre='C', grado=grado), codigo_qr='71000009')
+		columnas = ['DNI', 'NOMBRES', 'APELLIDO PATERNO', 'GRADO', 'SECCION', 'OBSERVACIÓN', 'APODERADO_CORREO']
+		filas = [
+			['71000001', 'Ana', 'Perez', '1', 'A', '', 'tutor@x.pe'],
+			['71000001', 'Ana', 'Perez', '1', 'A', '', 'tutor@x.pe'],
+			['71000002', 'Luis', 'Diaz', '', '', '', ''],
+			['', 'Sin', 'Dni', '1', 'A', '', ''],
+			['71000003', '', 'Rojas', '2', 'B', 'falta nombre', ''],
+			['71000002', 'Luis', 'Diaz', '2', 'B', 'cambio', ''],
+			['71.000.005', 'Eva', 'Quispe', '2', 'B', '', ''],
+			['71000009', 'Rosa', 'Vega', '3', 'C', '', ''],
+		]
+		salida = StringIO()
+		call_command('import_estudiantes', escribir_csv(self.tempdir, 'padron.csv', columnas, filas), stdout=salida)
+		self.assertIn('Creados: 3, Actualizados: 3, Sin cambios: 0', salida.getvalue())
+		self.assertEqual(
+			[(e.dni, e.grado.nombre, e.seccion.nombre, e.observaciones) for e in Estudiante.objects.order_by('dni')],
+			[('71.000.005', '2', 'B', None), ('71000001', '1', 'A', None), ('71000002', '2', 'B', 'cambio'), ('71000009', '3', 'C', None)],
+		)
+		self.assertEqual(sorted(os.listdir(os.path.join(self.tempdir, 'qrcodes'))), ['71.000.005.png', '71000001.png', '71000002.png', '71000009.png'])
+		(log,) = os.listdir(os.path.join(self.tempdir, 'import_logs'))
+		with open(os.path.join(self.tempdir, 'import_logs', log), newline='', encoding='utf-8') as f:
+			lector = csv.DictReader(f)
+			errores = list(lector)
+		self.assertEqual(lector.fieldnames, ['dni', 'nombres', 'apellido_paterno', 'grado', 'seccion', 'observacion', 'apoderado_correo', 'error'])
+		incompleta = 'fila incompleta (dni/nombre/apellido)'
+		self.assertEqual(errores, [
+			{'dni': '', 'nombres': 'Sin', 'apellido_paterno': 'Dni', 'grado': '1', 'seccion': 'A', 'observacion': '', 'apoderado_correo': '', 'error': incompleta},
+			{'dni': '71000003', 'nombres': '', 'apellido_paterno': 'Rojas', 'grado': '2', 'seccion': 'B', 'observacion': 'falta nombre', 'apoderado_correo': '', 'error': incompleta},
+		])
+		# Reimportar: 71000001 (repetido) y 71000002 (sus dos filas difieren) se actualizan
+		salida = StringIO()
+		call_command('import_estudiantes', escribir_csv(self.tempdir, 'padron.csv', columnas, filas), stdout=salida)
+		self.assertIn('Creados: 0, Actualizados: 3, Sin cambios: 3', salida.getvalue())
+
+	def test_reimportacion_omite_filas_sin_cambios(self):
+		columnas = ['DNI', 'NOMBRES', 'APELLIDO PATERNO', 'GRADO', 'SECCION']
+		filas = [[f'6100{i:04d}', f'N{i}', 'Apellido', '2', 'A'] for i in range(30)]
+		ruta = escribir_csv(self.tempdir, 'padron.csv', columnas, filas)
+		call_command('import_estudiantes', ruta, qr='diferido', stdout=StringIO())
+		filas[3][1] = 'Cambiado'
+		ruta = escribir_csv(self.tempdir, 'padron.csv', columnas, filas)
+		salida = StringIO()
+		with CaptureQueriesContext(connection) as ctx:
+			call_command('import_estudiantes', ruta, qr='diferido', stdout=salida)
+		self.assertIn('Creados: 0, Actualizados: 1, Sin cambios: 29', salida.getvalue())
+		self.assertEqual(Estudiante.objects.get(dni='61000003').nombre, 'Cambiado')
+		self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "asistencia_estudiante"')]), 1)
+		# Otro periodo cambia la huella de todas las filas
+		salida = StringIO()
+		call_command('import_estudiantes', ruta, periodo=2027, qr='diferido', stdout=salida)
+		self.assertIn('Actualizados: 30, Sin cambios: 0', salida.getvalue())
+
+	def test_dry_run_no_escribe_y_coincide_con_la_importacion(self):
+		columnas = ['DNI', 'NOMBRES', 'APELLIDO PATERNO', 'GRADO', 'SECCION']
+		filas = [[f'6500{i:04d}', f'N{i}', 'Apellido', '2', 'A'] for i in range(10)]
+		call_command('import_estudiantes', escribir_csv(self.tempdir, 'base.csv', columnas, filas), qr='diferido', stdout=StringIO())
+		filas[0][1] = 'Cambiado'
+		filas += [['65009999', 'Nuevo', 'Alumno', '', ''], ['65009999', 'Nuevo', 'Alumno', '3', 'B'], ['', 'Sin', 'Dni', '', '']]
+		ruta = escribir_csv(self.tempdir, 'nuevo.csv', columnas, filas)
+		salida = StringIO()
+		with CaptureQueriesContext(connection) as ctx:
+			call_command('import_estudiantes', ruta, dry_run=True, stdout=salida)
+		self.assertFalse([q for q in ctx.captured_queries if not q['sql'].startswith('SELECT')])
+		self.assertLessEqual(len(ctx.captured_queries), 2)
+		self.assertIn("nombre: 'N0' -> 'Cambiado'", salida.getvalue())
+		self.assertIn('Se crearían: 1, Se actualizarían: 2, Sin cambios: 9, Rechazadas: 1', salida.getvalue())
+		# Por lotes, con el DNI repetido en dos lotes distintos: mismos conteos, una consulta por lote
+		salida = StringIO()
+		with patch('asistencia.importacion.vista_previa.TAMANO_LOTE', 11), CaptureQueriesContext(connection) as ctx:
+			call_command('import_estudiantes', ruta, dry_run=True, stdout=salida)
+		self.assertEqual(len(ctx.captured_queries), 2)
+		self.assertIn('Se crearían: 1, Se actualizarían: 2, Sin cambios: 9, Rechazadas: 1', salida.getvalue())
+		salida = StringIO()
+		call_command('import_estudiantes', ruta, qr='diferido', stdout=salida)
+		self.assertIn('Creados: 1, Actualizados: 2, Sin cambios: 9', salida.getvalue())
+
+	def test_qr_en_procesos_omite_existentes_y_diferido_en_vista(self):
+		ruta = escribir_csv(self.tempdir, 'qr.csv', ['DNI', 'NOMBRES', 'APELLIDO PATERNO'], [[f'6000{i:04d}', 'N', 'A'] for i in range(6)])
+		with patch.object(qr, 'MINIMO_PARALELO', 1):
+			salida = StringIO()
+			call_command('import_estudiantes', ruta, procesos=2, stdout=salida)
+			self.assertIn('QR generados: 6, ya existentes: 0', salida.getvalue())
+			self.assertEqual(len(os.listdir(os.path.join(self.tempdir, 'qrcodes'))), 6)
+			# Filas actualizadas: el PNG ya existe y no se vuelve a generar
+			salida = StringIO()
+			call_command('import_estudiantes', ruta, periodo=2027, procesos=2, stdout=salida)
+			self.assertIn('QR generados: 0, ya existentes: 6', salida.getvalue())
+
+			os.remove(qr.ruta('60000001'))
+			call_command('import_estudiantes', ruta, qr='diferido', stdout=StringIO())
+			self.assertFalse(os.path.exists(qr.ruta('60000001')))
+			respuesta = Client().get('/qr/60000001.png')
+			self.assertEqual((respuesta.status_code, respuesta['Content-Type']), (200, 'image/png'))
+			self.assertTrue(b''.join(respuesta.streaming_content).startswith(b'\x89PNG'))
+			self.assertEqual(Client().get('/qr/99999999.png').status_code, 404)
+
 
 class AsistenciaRulesTest(TestCase):
 	def setUp(self):
+		cache.clear()
 		self.grado = Grado.objects.create(nombre='1ro')
 		self.seccion = Seccion.objects.create(nombre='A', grado=self.grado)
 		self.est = Estudiante.objects.create(nombre='Test', apellido='Alumno', dni='87654321', fecha_nacimiento='2010-01-01', grado=self.grado, seccion=self.seccion, codigo_qr='87654321')
@@ -126,16 +285,812 @@ class AsistenciaRulesTest(TestCase):
 		est2 = Estudiante.objects.create(nombre='B', apellido='Dos', dni='90000002', fecha_nacimiento=None, grado=grado, seccion=seccion, codigo_qr='90000002')
 		est3 = Estudiante.objects.create(nombre='C', apellido='Tres', dni='90000003', fecha_nacimiento=None, grado=grado, seccion=seccion, codigo_qr='90000003')
 		# Preparar la fecha a usar (asegurar misma fecha para el registro y el comando)
-		fecha_str = timezone.now().date().strftime('%Y-%m-%d')
-		from datetime import datetime as _dt
-		fecha_obj = _dt.strptime(fecha_str, '%Y-%m-%d').date()
+		# (un día lectivo fijo: marcar_faltas omite fines de semana)
+		fecha_str = '2025-11-04'
+		fecha_obj = datetime.strptime(fecha_str, '%Y-%m-%d').date()
 		# Crear asistencia solo para est1 y forzar la fecha via update (evita auto_now_add override)
 		a = Asistencia.objects.create(estudiante=est1, estado='puntual')
 		Asistencia.objects.filter(id=a.id).update(fecha=fecha_obj)
-		from django.core.management import call_command
 		# pass options as keyword args to call_command to ensure they're parsed correctly
 		call_command('marcar_faltas', fecha=fecha_str)
 		# Ahora est2 y est3 deben tener registro de falta (sin depender exactamente de la fecha,
 		# algunas diferencias de timezone en el runner pueden afectar la fecha guardada).
 		self.assertTrue(Asistencia.objects.filter(estudiante__dni=est2.dni, estado='falta').exists())
 		self.assertTrue(Asistencia.objects.filter(estudiante__dni=est3.dni, estado='falta').exists())
+
+	def test_marcar_faltas_rango_en_consultas_constantes(self):
+		grado = Grado.objects.create(nombre='5to')
+		seccion = Seccion.objects.create(nombre='C', grado=grado)
+		ests = [
+			Estudiante.objects.create(nombre='E', apellido=str(i), dni=f'9100000{i}', grado=grado, seccion=seccion, codigo_qr=f'9100000{i}', periodo=2025)
+			for i in range(6)
+		]
+		Estudiante.objects.create(nombre='Otro', apellido='Periodo', dni='91000099', grado=grado, seccion=seccion, codigo_qr='91000099', periodo=2024)
+		Asistencia.objects.create(estudiante=ests[0], fecha=date(2025, 11, 4), hora=time(12, 10), estado='puntual')
+		with CaptureQueriesContext(connection) as un_dia:
+			call_command('marcar_faltas', desde='2025-11-03', hasta='2025-11-03', periodo=2025)
+		with CaptureQueriesContext(connection) as otro_dia:
+			call_command('marcar_faltas', desde='2025-11-04', hasta='2025-11-05', periodo=2025)
+		# Una sola pasada: dos días cuestan las mismas consultas a asistencias que uno
+		# (el resumen sí tiene una fila por fecha y sección)
+		def a_asistencias(capturadas):
+			return [q for q in capturadas if 'asistencia_asistencia' in q['sql']]
+		self.assertEqual(len(a_asistencias(otro_dia.captured_queries)), len(a_asistencias(un_dia.captured_queries)))
+		self.assertEqual(Asistencia.objects.filter(fecha=date(2025, 11, 3), estado='falta', estudiante__in=ests).count(), 6)
+		self.assertEqual(Asistencia.objects.filter(fecha=date(2025, 11, 4), estado='falta', estudiante__in=ests).count(), 5)
+		self.assertEqual(Asistencia.objects.filter(fecha=date(2025, 11, 5), estado='falta', estudiante__in=ests).count(), 6)
+		self.assertFalse(Asistencia.objects.filter(estudiante__periodo=2024).exists())
+
+
+class ResolverQRTest(TestCase):
+	def setUp(self):
+		self.resolver = resolver
+		self.grado = Grado.objects.create(nombre='3ro')
+		self.seccion = Seccion.objects.create(nombre='C', grado=self.grado)
+		self.est = Estudiante.objects.create(nombre='Luis', apellido='Rojas', dni='11112222', grado=self.grado, seccion=self.seccion, codigo_qr='11112222')
+
+	def test_resuelve_sin_consultas_con_mapa_caliente(self):
+		self.resolver.precargar()
+		with self.assertNumQueries(0):
+			entrada = self.resolver.resolver('11112222')
+		self.assertEqual(entrada.id, self.est.id)
+		self.assertEqual(entrada.nombre, 'Luis Rojas')
+		self.assertEqual(entrada.grado, str(self.grado))
+		self.assertEqual(entrada.seccion, str(self.seccion))
+
+	def test_codigo_inexistente(self):
+		self.resolver.precargar()
+		self.assertIsNone(self.resolver.resolver('no-existe'))
+
+	def test_invalida_al_cambiar_grado(self):
+		self.resolver.precargar()
+		self.grado.nombre = '3ro Sec'
+		self.grado.save()
+		entrada = self.resolver.resolver('11112222')
+		self.assertEqual(entrada.grado, '3ro Sec')
+		self.assertEqual(entrada.seccion, '3ro Sec - Sección C')
+
+
+class RegistroAsistenciaTest(TestCase):
+	def setUp(self):
+		cache.clear()
+		grado = Grado.objects.create(nombre='4to')
+		seccion = Seccion.objects.create(nombre='A', grado=grado)
+		self.est = Estudiante.objects.create(nombre='Eva', apellido='Soto', dni='33334444', grado=grado, seccion=seccion, codigo_qr='33334444')
+
+	def test_un_solo_insert_y_detecta_existente(self):
+		with CaptureQueriesContext(connection) as ctx:
+			r1 = registrar_asistencia(self.est.id, date(2025, 11, 4), time(12, 10), 'puntual')
+		# Un solo statement sobre la tabla de asistencias (el resto es el resumen diario)
+		self.assertEqual(len([q for q in ctx.captured_queries if '"asistencia_asistencia"' in q['sql']]), 1)
+		self.assertTrue(r1.creada)
+		r2 = registrar_asistencia(self.est.id, date(2025, 11, 4), time(12, 40), 'tarde')
+		self.assertFalse(r2.creada)
+		self.assertEqual(r2.id, r1.id)
+		self.assertEqual(r2.hora, time(12, 10))
+		self.assertEqual(Asistencia.objects.filter(estudiante=self.est).count(), 1)
+
+	def test_restriccion_unica_por_dia(self):
+		Asistencia.objects.create(estudiante=self.est, fecha='2025-11-04', estado='puntual')
+		with self.assertRaises(IntegrityError), transaction.atomic():
+			Asistencia.objects.create(estudiante=self.est, fecha='2025-11-04', estado='tarde')
+
+
+class RegistroLoteTest(TestCase):
+	def setUp(self):
+		cache.clear()
+		grado = Grado.objects.create(nombre='5to')
+		seccion = Seccion.objects.create(nombre='B', grado=grado)
+		self.est1 = Estudiante.objects.create(nombre='Ana', apellido='Paz', dni='55550001', grado=grado, seccion=seccion, codigo_qr='55550001')
+		self.est2 = Estudiante.objects.create(nombre='Beto', apellido='Paz', dni='55550002', grado=grado, seccion=seccion, codigo_qr='55550002')
+		self.client = Client()
+
+	def test_lote_aplica_horario_por_escaneo(self):
+		escaneos = [
+			{'codigo_qr': '55550001', 'scanned_at': '2025-11-04T12:40:00', 'kiosk_id': 'k1'},
+			{'codigo_qr': '55550001', 'scanned_at': '2025-11-04T12:10:00', 'kiosk_id': 'k2'},
+			{'codigo_qr': '55550002', 'scanned_at': '2025-11-04T09:00:00', 'kiosk_id': 'k1'},
+			{'codigo_qr': 'desconocido', 'scanned_at': '2025-11-04T12:10:00', 'kiosk_id': 'k1'},
+		]
+		resp = self.client.post('/asistencia/escanear/lote/', data=json.dumps(escaneos), content_type='application/json')
+		self.assertEqual(resp.status_code, 200)
+		data = resp.json()
+		self.assertEqual(data['registrados'], 1)
+		r = data['resultados']
+		self.assertFalse(r[0]['success'])
+		self.assertTrue(r[1]['success'])
+		self.assertEqual(r[1]['estado'], 'puntual')
+		self.assertEqual(r[1]['kiosk_id'], 'k2')
+		self.assertFalse(r[2]['success'])
+		self.assertFalse(r[3]['success'])
+		a = Asistencia.objects.get(estudiante=self.est1)
+		self.assertEqual(str(a.fecha), '2025-11-04')
+		self.assertEqual(a.estado, 'puntual')
+		self.assertFalse(Asistencia.objects.filter(estudiante=self.est2).exists())
+
+	def test_lote_reenviado_con_misma_clave_no_duplica(self):
+		escaneo = [{'codigo_qr': '55550002', 'scanned_at': '2025-11-04T12:45:00-05:00', 'kiosk_id': 'k1', 'idempotency_key': 'abc-123'}]
+		primero = self.client.post('/asistencia/escanear/lote/', data=json.dumps(escaneo), content_type='application/json').json()
+		segundo = self.client.post('/asistencia/escanear/lote/', data=json.dumps({'escaneos': escaneo * 2}), content_type='application/json').json()
+		self.assertTrue(primero['resultados'][0]['success'])
+		self.assertEqual(segundo['registrados'], 0)
+		for r in segundo['resultados']:
+			self.assertTrue(r['success'])
+			self.assertTrue(r['repetido'])
+			self.assertEqual(r['estado'], 'tarde')
+		self.assertEqual(Asistencia.objects.filter(clave_idempotencia='abc-123').count(), 1)
+
+	def test_registrar_varios_no_cuenta_filas_insertadas_por_otro(self):
+		fecha = date(2025, 11, 4)
+		est3 = Estudiante.objects.create(nombre='Ciro', apellido='Paz', dni='55550003', grado=self.est1.grado, seccion=self.est1.seccion, codigo_qr='55550003')
+		# Ya existía antes de la llamada
+		previo = Asistencia.objects.create(estudiante=est3, fecha=fecha, hora=time(12, 5), estado='puntual')
+		original = registro._insertar_varios
+
+		def con_carrera(filas):
+			# Un escaneo simultáneo inserta al est1 entre la consulta de existentes y el INSERT
+			Asistencia.objects.create(estudiante=self.est1, fecha=fecha, hora=time(12, 40), estado='tarde')
+			return original(filas)
+
+		with patch.object(registro, '_insertar_varios', con_carrera):
+			resultados = registro.registrar_varios([
+				(self.est1.id, fecha, time(12, 10), 'puntual', None, None),
+				(self.est2.id, fecha, time(12, 15), 'puntual', None, None),
+				(est3.id, fecha, time(12, 20), 'puntual', None, None),
+			])
+		self.assertEqual(resultados[(self.est1.id, fecha)][1:], (time(12, 40), 'tarde', False))
+		self.assertEqual(resultados[(est3.id, fecha)], (previo.id, time(12, 5), 'puntual', False))
+		nuevo = resultados[(self.est2.id, fecha)]
+		self.assertTrue(nuevo.creada)
+		self.assertEqual(Asistencia.objects.get(pk=nuevo.id).estudiante_id, self.est2.id)
+		# Solo la fila de esta llamada se suma al resumen
+		fila = ResumenDiario.objects.get(fecha=fecha, seccion=self.est1.seccion)
+		self.assertEqual((fila.puntuales, fila.tardes), (1, 0))
+
+	def test_lote_sincronizado_tras_marcar_faltas_reemplaza_la_falta(self):
+		# El kiosko estuvo sin conexión: marcar_faltas corrió antes de que llegara el escaneo
+		call_command('marcar_faltas', fecha='2025-11-04')
+		escaneo = [{'codigo_qr': '55550001', 'scanned_at': '2025-11-04T12:20:00', 'kiosk_id': 'k1', 'idempotency_key': 'sync-1'}]
+		data = self.client.post('/asistencia/escanear/lote/', data=json.dumps(escaneo), content_type='application/json').json()
+		self.assertTrue(data['resultados'][0]['success'])
+		self.assertEqual(data['resultados'][0]['estado'], 'puntual')
+		a = Asistencia.objects.get(estudiante=self.est1, fecha=date(2025, 11, 4))
+		self.assertEqual((a.estado, a.clave_idempotencia), ('puntual', 'sync-1'))
+		fila = ResumenDiario.objects.get(fecha=date(2025, 11, 4), seccion=self.est1.seccion)
+		self.assertEqual((fila.puntuales, fila.faltas), (1, 1))
+		# Un reenvío no vuelve a contar
+		otra = self.client.post('/asistencia/escanear/lote/', data=json.dumps(escaneo), content_type='application/json').json()
+		self.assertTrue(otra['resultados'][0]['repetido'])
+		fila.refresh_from_db()
+		self.assertEqual((fila.puntuales, fila.faltas), (1, 1))
+
+
+class AsistenciaAsyncTest(TransactionTestCase):
+	def setUp(self):
+		cache.clear()
+		grado = Grado.objects.create(nombre='1ro')
+		seccion = Seccion.objects.create(nombre='D', grado=grado)
+		Estudiante.objects.create(nombre='Ciro', apellido='Vega', dni='66667777', grado=grado, seccion=seccion, codigo_qr='66667777')
+
+	async def test_registro_async_y_doble_marca(self):
+		dt = timezone.make_aware(datetime(2025, 11, 4, 12, 20))
+		with patch('asistencia.views.timezone.localtime', lambda *args, **kwargs: dt):
+			r1 = await self.async_client.post('/asistencia/escanear/async/', {'codigo_qr': '66667777'})
+			r2 = await self.async_client.post('/asistencia/escanear/async/', {'codigo_qr': '66667777'})
+			r3 = await self.async_client.post('/asistencia/escanear/async/', {'codigo_qr': 'nada'})
+		self.assertTrue(r1.json()['success'])
+		self.assertEqual(r1.json()['estado'], 'puntual')
+		self.assertEqual(r1.json()['seccion'], '1ro - Sección D')
+		self.assertFalse(r2.json()['success'])
+		self.assertIn('ya registró', r2.json()['message'])
+		self.assertFalse(r3.json()['success'])
+
+
+class RegistradosDelDiaTest(TestCase):
+	def setUp(self):
+		cache.clear()
+		grado = Grado.objects.create(nombre='2do')
+		seccion = Seccion.objects.create(nombre='A', grado=grado)
+		self.est = Estudiante.objects.create(nombre='Rosa', apellido='Luna', dni='77778888', grado=grado, seccion=seccion, codigo_qr='77778888')
+		self.client = Client()
+
+	def post_qr(self, when_dt):
+		with patch('asistencia.views.timezone.localtime', lambda *args, **kwargs: when_dt):
+			return self.client.post('/asistencia/escanear/', {'codigo_qr': '77778888'})
+
+	def test_los_tests_usan_cache_en_memoria(self):
+		# Lo cambia el TEST_RUNNER, no la línea de comandos
+		self.assertEqual(settings.CACHES['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+
+	def test_escaneo_repetido_sin_consultas(self):
+		dt = timezone.make_aware(datetime(2025, 11, 4, 12, 5))
+		self.assertTrue(self.post_qr(dt).json()['success'])
+		resolver.precargar()
+		with self.assertNumQueries(0):
+			data = self.post_qr(dt).json()
+		self.assertFalse(data['success'])
+		self.assertIn('ya registró', data['message'])
+
+	def test_reconstruye_desde_asistencia(self):
+		Asistencia.objects.create(estudiante=self.est, fecha=date(2025, 11, 4), hora=time(12, 7), estado='puntual')
+		cache.clear()
+		self.assertEqual(registrados.hora_registrada(self.est.id, date(2025, 11, 4)), time(12, 7))
+		self.assertIsNone(registrados.hora_registrada(self.est.id, date(2025, 11, 5)))
+
+	def test_una_clave_por_dia_y_sin_faltas(self):
+		hoy = timezone.localdate()
+		otro = Estudiante.objects.create(nombre='Otro', apellido='B', dni='77778889', grado=self.est.grado, seccion=self.est.seccion, codigo_qr='77778889')
+		self.assertIsNone(registrados.hora_registrada(self.est.id, hoy))
+		registrar_varios([(self.est.id, hoy, time(12, 5), 'puntual', None, None), (otro.id, hoy, time(17, 30), 'falta', None, None)])
+		self.assertEqual(cache.get(registrados._clave(hoy)), {self.est.id: time(12, 5)})
+		cache.clear()
+		# La reconstrucción desde la base de datos tampoco incluye las faltas
+		self.assertIsNone(registrados.hora_registrada(otro.id, hoy))
+		self.assertEqual(registrados.hora_registrada(self.est.id, hoy), time(12, 5))
+
+
+class DashboardTest(TestCase):
+	def setUp(self):
+		cache.clear()
+		grado = Grado.objects.create(nombre='1ro')
+		seccion = Seccion.objects.create(nombre='A', grado=grado)
+		Grado.objects.create(nombre='2do')
+		self.est = Estudiante.objects.create(nombre='Ana', apellido='Ruiz', dni='10101010', grado=grado, seccion=seccion, codigo_qr='10101010')
+		Estudiante.objects.create(nombre='Bea', apellido='Ruiz', dni='10101011', grado=grado, seccion=seccion, codigo_qr='10101011')
+		self.client = Client()
+
+	def test_estadisticas_en_dos_consultas_y_cacheadas(self):
+		hoy = timezone.localdate()
+		registrar_asistencia(self.est.id, hoy, time(12, 40), 'tarde')
+		with self.assertNumQueries(2):
+			resp = self.client.get('/')
+		self.assertEqual(resp.context['total_estudiantes'], 2)
+		self.assertEqual(resp.context['total_grados'], 2)
+		self.assertEqual(resp.context['asistencias_hoy'], 1)
+		self.assertEqual(resp.context['tardes'], 1)
+		self.assertEqual(resp.context['puntuales'], 0)
+		with self.assertNumQueries(0):
+			self.client.get('/')
+		# Un registro nuevo invalida el cache
+		registrar_asistencia(Estudiante.objects.get(dni='10101011').id, hoy, time(12, 10), 'puntual')
+		resp = self.client.get('/')
+		self.assertEqual(resp.context['asistencias_hoy'], 2)
+		self.assertEqual(resp.context['puntuales'], 1)
+
+
+class ResumenDiarioTest(TestCase):
+	def setUp(self):
+		cache.clear()
+		grado = Grado.objects.create(nombre='3ro')
+		self.sec_a = Seccion.objects.create(nombre='A', grado=grado)
+		self.sec_b = Seccion.objects.create(nombre='B', grado=grado)
+		self.e1 = Estudiante.objects.create(nombre='A', apellido='Uno', dni='20000001', grado=grado, seccion=self.sec_a, codigo_qr='20000001')
+		self.e2 = Estudiante.objects.create(nombre='B', apellido='Dos', dni='20000002', grado=grado, seccion=self.sec_a, codigo_qr='20000002')
+		self.e3 = Estudiante.objects.create(nombre='C', apellido='Tres', dni='20000003', grado=grado, seccion=self.sec_b, codigo_qr='20000003')
+
+	def test_incremental_y_reconstruccion_coinciden(self):
+		fecha = date(2025, 11, 4)
+		registrar_asistencia(self.e1.id, fecha, time(12, 10), 'puntual')
+		registrar_asistencia(self.e1.id, fecha, time(12, 50), 'tarde')  # duplicado: no suma
+		registrar_varios([
+			(self.e2.id, fecha, time(12, 40), 'tarde', None, None),
+			(self.e3.id, fecha, time(12, 5), 'puntual', None, None),
+		])
+		call_command('marcar_faltas', fecha='2025-11-04')
+		a = ResumenDiario.objects.get(fecha=fecha, seccion=self.sec_a)
+		self.assertEqual((a.puntuales, a.tardes, a.faltas, a.total_matriculados), (1, 1, 0, 2))
+		b = ResumenDiario.objects.get(fecha=fecha, seccion=self.sec_b)
+		self.assertEqual((b.puntuales, b.tardes, b.faltas), (1, 0, 0))
+
+		Asistencia.objects.get(estudiante=self.e2).delete()
+		a.refresh_from_db()
+		self.assertEqual(a.tardes, 0)
+		# Edición desde el admin: el conteo pasa de un estado a otro
+		editada = Asistencia.objects.get(estudiante=self.e1)
+		editada.estado = 'tarde'
+		editada.save()
+		a.refresh_from_db()
+		self.assertEqual((a.puntuales, a.tardes), (0, 1))
+
+		incremental = list(ResumenDiario.objects.order_by('seccion_id').values_list('seccion_id', 'puntuales', 'tardes', 'faltas'))
+		call_command('reconstruir_resumen', desde='2025-11-01', hasta='2025-11-30')
+		reconstruido = list(ResumenDiario.objects.order_by('seccion_id').values_list('seccion_id', 'puntuales', 'tardes', 'faltas'))
+		self.assertEqual(incremental, reconstruido)
+
+
+class ReportePaginadoTest(TestCase):
+	def setUp(self):
+		cache.clear()
+		grado = Grado.objects.create(nombre='4to')
+		seccion = Seccion.objects.create(nombre='A', grado=grado)
+		# Dos asistencias con la misma fecha y hora: el desempate es por id
+		self.ids = []
+		for i, (dia, hora) in enumerate([(5, 12), (5, 12), (4, 13), (4, 12), (3, 12)]):
+			est = Estudiante.objects.create(nombre='E', apellido=str(i), dni=f'3000000{i}', grado=grado, seccion=seccion, codigo_qr=f'3000000{i}')
+			self.ids.append(Asistencia.objects.create(estudiante=est, fecha=date(2025, 11, dia), hora=time(hora, 0), estado='puntual').id)
+
+	def test_recorre_todas_las_filas_en_orden_y_vuelve(self):
+		qs = Asistencia.objects.all()
+		p1 = paginar(qs, tamano=2)
+		p2 = paginar(qs, despues=p1.siguiente, tamano=2)
+		p3 = paginar(qs, despues=p2.siguiente, tamano=2)
+		vistos = [a.id for p in (p1, p2, p3) for a in p.objetos]
+		self.assertEqual(vistos, self.ids)
+		self.assertIsNone(p1.anterior)
+		self.assertIsNone(p3.siguiente)
+		atras = paginar(qs, antes=p3.anterior, tamano=2)
+		self.assertEqual([a.id for a in atras.objetos], [a.id for a in p2.objetos])
+		self.assertEqual(paginar(qs, despues='basura', tamano=2).objetos, p1.objetos)
+
+	def test_vista_muestra_una_pagina(self):
+		resp = Client().get('/reportes/', {'fecha_inicio': '2025-11-01', 'fecha_fin': '2025-11-30'})
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(len(resp.context['asistencias']), 5)
+		self.assertIsNone(resp.context['url_siguiente'])
+
+	def test_exportacion_csv_y_xlsx_con_filtros(self):
+		resp = Client().get('/reportes/exportar/csv/', {'fecha_inicio': '2025-11-04'})
+		self.assertEqual(resp.status_code, 200)
+		lineas = b''.join(resp.streaming_content).decode('utf-8-sig').splitlines()
+		self.assertEqual(lineas[0].split(',')[0], 'Fecha')
+		self.assertEqual(len(lineas), 1 + 4)
+		self.assertTrue(lineas[1].startswith('05/11/2025,12:00,E 0,'))
+		resp = Client().get('/reportes/exportar/xlsx/')
+		hoja = openpyxl.load_workbook(io.BytesIO(b''.join(resp.streaming_content))).active
+		self.assertEqual(hoja.max_row, 1 + 5)
+		self.assertEqual([c.value for c in hoja[1]], exportacion.ENCABEZADOS)
+		# Fecha y hora son celdas de fecha/hora, no texto
+		fecha, hora = hoja['A2'], hoja['B2']
+		self.assertTrue(fecha.is_date)
+		self.assertEqual((fecha.value.date(), fecha.number_format), (date(2025, 11, 5), 'DD/MM/YYYY'))
+		self.assertEqual((hora.value, hora.number_format), (time(12, 0), 'HH:MM'))
+		self.assertEqual(Client().get('/reportes/exportar/pdf/').status_code, 400)
+
+	def test_explicar_consultas_usa_los_indices(self):
+		salida = StringIO()
+		call_command('explicar_consultas', fecha='2025-11-04', stdout=salida)
+		plan = salida.getvalue()
+		if 'sqlite' in plan:
+			self.assertIn('asistencia_fecha_hora_idx', plan)
+			self.assertIn('asistencia_fecha_estado_idx', plan)
+
+
+class CalendarioEscolarTest(TestCase):
+	def setUp(self):
+		cache.clear()
+		grado = Grado.objects.create(nombre='6to')
+		seccion = Seccion.objects.create(nombre='A', grado=grado)
+		self.est = Estudiante.objects.create(nombre='Ana', apellido='Paz', dni='40000001', grado=grado, seccion=seccion, codigo_qr='40000001')
+		# Jueves 2025-11-06 feriado; 2025-11-08/09 fin de semana
+		DiaNoLectivo.objects.create(fecha=date(2025, 11, 6), motivo='Feriado')
+
+	def test_aritmetica_de_dias_lectivos(self):
+		desde, hasta = date(2025, 3, 1), date(2025, 12, 31)
+		esperado = [
+			desde + timedelta(days=i) for i in range((hasta - desde).days + 1)
+			if calendario.es_lectivo(desde + timedelta(days=i))
+		]
+		self.assertEqual(calendario.dias_lectivos(desde, hasta), esperado)
+		self.assertEqual(calendario.contar_lectivos(desde, hasta), len(esperado))
+		self.assertEqual(calendario.contar_lectivos(date(2025, 11, 3), date(2025, 11, 9)), 4)
+		# Se recarga al cambiar el calendario
+		DiaNoLectivo.objects.filter(fecha=date(2025, 11, 6)).delete()
+		self.assertEqual(calendario.contar_lectivos(date(2025, 11, 3), date(2025, 11, 9)), 5)
+
+	def test_backfill_de_faltas_omite_dias_no_lectivos(self):
+		call_command('marcar_faltas', desde='2025-11-03', hasta='2025-11-09')
+		fechas = sorted(str(f) for f in Asistencia.objects.filter(estudiante=self.est).values_list('fecha', flat=True))
+		self.assertEqual(fechas, ['2025-11-03', '2025-11-04', '2025-11-05', '2025-11-07'])
+		resp = Client().get('/reportes/', {'fecha_inicio': '2025-11-03', 'fecha_fin': '2025-11-09'})
+		self.assertEqual(resp.context['dias_lectivos'], 4)
+		self.assertEqual(resp.context['faltas'], 4)
+		self.assertEqual(resp.context['porcentaje_asistencia'], 0.0)
+
+
+
+class PlanificadorTest(TestCase):
+	def setUp(self):
+		cache.clear()
+		grado = Grado.objects.create(nombre='1ro')
+		seccion = Seccion.objects.create(nombre='A', grado=grado)
+		Estudiante.objects.create(nombre='Ana', apellido='Sol', dni='50000001', grado=grado, seccion=seccion, codigo_qr='50000001')
+
+	def _ahora(self, dia, hora, minuto):
+		return timezone.make_aware(datetime(2025, 11, dia, hora, minuto))
+
+	def test_tareas_una_vez_por_dia_a_su_hora(self):
+		with patch.dict(planificador.TAREAS, {k: v for k, v in planificador.TAREAS.items() if k != 'limpiar_subidas'}, clear=True):
+			self.assertEqual(planificador.ciclo(self._ahora(4, 12, 0)), [])
+			ejecutadas = planificador.ciclo(self._ahora(4, 17, 31))
+			self.assertEqual([e.nombre for e in ejecutadas], ['marcar_faltas'])
+			self.assertEqual(ejecutadas[0].estado, 'ok')
+			self.assertIsNotNone(ejecutadas[0].duracion)
+			self.assertEqual(Asistencia.objects.filter(fecha=date(2025, 11, 4), estado='falta').count(), 1)
+			# Otra instancia (sin memoria de lo hecho) no la repite
+			self.assertEqual([e.nombre for e in planificador.ciclo(self._ahora(4, 18, 0))], ['reconstruir_resumen'])
+			self.assertEqual(planificador.ciclo(self._ahora(4, 19, 0)), [])
+			# Sábado: marcar_faltas es solo para días lectivos
+			self.assertEqual([e.nombre for e in planificador.ciclo(self._ahora(8, 18, 0))], ['reconstruir_resumen'])
+		self.assertEqual(EjecucionTarea.objects.filter(nombre='marcar_faltas').count(), 1)
+
+	def test_error_registrado_y_reintento_manual(self):
+		fallas = []
+
+		def tarea_que_falla(fecha):
+			if not fallas:
+				fallas.append(fecha)
+				raise RuntimeError('sin conexión')
+			return 'ok'
+
+		t = planificador.Tarea('prueba', time(1, 0), tarea_que_falla, False)
+		fecha = date(2025, 11, 4)
+		ejecucion = planificador.ejecutar(t, fecha)
+		self.assertEqual(ejecucion.estado, 'error')
+		self.assertIn('sin conexión', ejecucion.mensaje)
+		self.assertIsNone(planificador.ejecutar(t, fecha))
+		self.assertEqual(planificador.ejecutar(t, fecha, reintentar=True).estado, 'ok')
+
+
+	def test_limpiar_subidas_conserva_importaciones_activas_y_revertibles(self):
+		tempdir = media_temporal(self)
+		uploads = os.path.join(tempdir, 'uploads')
+		os.makedirs(uploads)
+		viejo = timezone.now() - timedelta(days=60)
+		pendiente = ImportJob.objects.create(archivo='pendiente.csv')
+		revertible = ImportJob.objects.create(archivo='revertible.csv', estado='ok')
+		LoteImportacion.objects.create(archivo='revertible.csv', trabajo=revertible)
+		terminado = ImportJob.objects.create(archivo='terminado.csv', estado='ok')
+		ImportJob.objects.filter(pk__in=[pendiente.pk, revertible.pk, terminado.pk]).update(creado=viejo)
+		for nombre in ('pendiente.csv', 'pendiente.csv.status.json', 'revertible.csv', 'terminado.csv', 'huerfano.csv.part'):
+			ruta = os.path.join(uploads, nombre)
+			open(ruta, 'w').close()
+			os.utime(ruta, (viejo.timestamp(), viejo.timestamp()))
+		planificador.limpiar_subidas(date(2025, 11, 4))
+		self.assertEqual(sorted(os.listdir(uploads)), ['pendiente.csv', 'pendiente.csv.status.json', 'revertible.csv'])
+		self.assertEqual(
+			sorted(ImportJob.objects.values_list('archivo', flat=True)), ['pendiente.csv', 'revertible.csv'],
+		)
+		self.assertTrue(LoteImportacion.objects.filter(trabajo__archivo='revertible.csv', estado='activo').exists())
+
+
+class LecturaStreamingTest(TestCase):
+	def setUp(self):
+		self.tempdir = media_temporal(self)
+
+	def test_csv_y_xlsx_por_lotes_sin_cargar_el_archivo(self):
+		ruta_csv = escribir_csv(self.tempdir, 'p.csv', ['DNI', 'Apellido Paterno', 'NOMBRES'], [['1', 'Uno', 'A'], [], ['2', 'Dos'], ['3', 'Tres', 'C', 'extra']])
+		with Lector(ruta_csv) as lector:
+			self.assertEqual(lector.encabezados, ['dni', 'apellido_paterno', 'nombres'])
+			self.assertEqual(lector.total_estimado(), 4)
+			filas = list(lector)
+		self.assertEqual(filas, [('1', 'Uno', 'A'), ('2', 'Dos', None), ('3', 'Tres', 'C')])
+
+		ruta_xlsx = os.path.join(self.tempdir, 'p.xlsx')
+		libro = openpyxl.Workbook(write_only=True)
+		hoja = libro.create_sheet()
+		hoja.append(['DNI', 'Nombres'])
+		for i in range(25):
+			hoja.append([str(i), f'N{i}'])
+		libro.save(ruta_xlsx)
+		with Lector(ruta_xlsx) as lector:
+			lotes = en_lotes(lector.dicts(), 10)
+			primero = next(lotes)
+			self.assertEqual(primero[0], {'dni': '0', 'nombres': 'N0'})
+			self.assertEqual([len(primero)] + [len(l) for l in lotes], [10, 10, 5])
+
+	def test_rollback_import_en_streaming(self):
+		grado = Grado.objects.create(nombre='Sin Grado')
+		seccion = Seccion.objects.create(nombre='Sin', grado=grado)
+		Estudiante.objects.create(nombre='A', apellido='B', dni='80000001', grado=grado, seccion=seccion, codigo_qr='80000001')
+		ruta = escribir_csv(self.tempdir, 'r.csv', ['DOCUMENTO', 'NOMBRES'], [['80000001', 'A'], ['80000002', 'B'], ['80000001', 'A']])
+		salida = StringIO()
+		call_command('rollback_import', ruta, yes=True, stdout=salida)
+		self.assertIn('Estudiantes eliminados: 1', salida.getvalue())
+		self.assertFalse(Estudiante.objects.filter(dni='80000001').exists())
+
+
+class MapeoColumnasTest(TestCase):
+	def test_resuelve_encabezados_y_extrae_por_indice(self):
+		encabezados = ['nro', 'documento', 'dni', 'apellidos_y_nombres', 'nombres', 'grado', 'tutor_correo', 'foto']
+		mapeo = resolver_columnas(encabezados)
+		self.assertEqual(mapeo.indices['dni'], (2, 1))
+		self.assertEqual(mapeo.ignoradas, ['nro', 'foto'])
+		extraer = mapeo.extractor()
+		datos = extraer(('1', '111', '', 'PEREZ GOMEZ, ANA LUZ', '', '3 B', ' a@b.pe ', None))
+		self.assertEqual(
+			(datos['dni'], datos['apellido'], datos['nombre'], datos['grado'], datos['seccion'], datos['ap_correo']),
+			('111', 'PEREZ GOMEZ', 'ANA LUZ', '3', 'B', 'a@b.pe'),
+		)
+
+	def test_dni_parcial_no_toma_el_del_apoderado(self):
+		mapeo = resolver_columnas(['dni_apoderado', 'documento_tutor', 'numero_de_dni', 'nombres', 'apellido'])
+		self.assertEqual(mapeo.indices['dni'], (2,))
+		with self.assertRaisesMessage(ErrorColumnas, 'falta dni'):
+			resolver_columnas(['dni_del_padre', 'nro_documento_madre', 'nombres', 'apellido'])
+
+	def test_formato_desconocido_falla_antes_de_importar(self):
+		ruta = escribir_csv(media_temporal(self), 'x.csv', ['codigo', 'alumno'], [['1', 'Ana']])
+		with self.assertRaisesMessage(CommandError, 'falta dni, nombres'):
+			call_command('import_estudiantes', ruta)
+		self.assertFalse(Estudiante.objects.exists())
+
+
+class ColaImportacionTest(TestCase):
+	def setUp(self):
+		self.tempdir = media_temporal(self)
+		ajustes = override_settings(ASISTENCIA_QR_IMPORTACION='diferido')
+		ajustes.enable()
+		self.addCleanup(ajustes.disable)
+		self.client = Client()
+		self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+
+	def _subir(self, contenido):
+		archivo = SimpleUploadedFile('padron.csv', contenido.encode('utf-8'), content_type='text/csv')
+		self.client.post('/importar/', {'archivo': archivo, 'periodo': 2026})
+		return ImportJob.objects.latest('creado')
+
+	def test_la_vista_encola_y_el_worker_importa(self):
+		trabajo = self._subir('DNI,NOMBRES,APELLIDO PATERNO\n62000001,Ana,Perez\n62000002,Luis,Rojas\n')
+		self.assertEqual(trabajo.estado, 'pendiente')
+		self.assertFalse(Estudiante.objects.exists())
+		self.assertEqual(self.client.get(f'/import_status/{trabajo.archivo}/').json()['status']['status'], 'queued')
+
+		call_command('procesar_importaciones', una_vez=True, stdout=StringIO())
+		trabajo.refresh_from_db()
+		self.assertEqual((trabajo.estado, trabajo.intentos, trabajo.creados, trabajo.procesados, trabajo.total), ('ok', 1, 2, 2, 2))
+		self.assertEqual(Estudiante.objects.get(dni='62000002').periodo, 2026)
+		estado = self.client.get(f'/import_status/{trabajo.archivo}/').json()['status']
+		self.assertEqual((estado['status'], estado['created']), ('done', 2))
+
+		malo = self._subir('codigo,alumno\n1,Ana\n')
+		call_command('procesar_importaciones', una_vez=True, stdout=StringIO())
+		malo.refresh_from_db()
+		# Error del archivo: no se reintenta
+		self.assertEqual((malo.estado, malo.intentos), ('error', 1))
+		self.assertIn('falta dni', malo.mensaje)
+
+	def test_concurrencia_latidos_y_reintentos(self):
+		activo = self._subir('DNI,NOMBRES,APELLIDO PATERNO\n62000003,Ana,Perez\n')
+		ahora = timezone.now()
+		self.assertEqual(cola.tomar(ahora).pk, activo.pk)
+		self._subir('DNI,NOMBRES,APELLIDO PATERNO\n62000004,Ana,Perez\n')
+		ahora = timezone.now()
+		# Concurrencia 1: con un trabajo activo no se toma otro
+		self.assertIsNone(cola.tomar(ahora))
+
+		# El worker muere: sin latido el trabajo vuelve a la cola con espera
+		despues = ahora + cola.LATIDO_VENCIDO + timedelta(seconds=1)
+		self.assertEqual(cola.recuperar_vencidos(despues), 1)
+		activo.refresh_from_db()
+		self.assertEqual(activo.estado, 'pendiente')
+		self.assertGreater(activo.disponible_desde, despues)
+		# Mientras espera se toma el otro pendiente
+		self.assertNotEqual(cola.tomar(despues).pk, activo.pk)
+
+		# --concurrencia del worker: su límite reemplaza al de la configuración
+		otro = self._subir('DNI,NOMBRES,APELLIDO PATERNO\n62000006,Ana,Perez\n')
+		self.assertIsNone(cola.tomar(despues))
+		self.assertEqual(cola.tomar(despues, limite=2).pk, otro.pk)
+
+		with self.settings(ASISTENCIA_IMPORTACION_INTENTOS=2, ASISTENCIA_IMPORTACION_CONCURRENCIA=5):
+			mas_tarde = activo.disponible_desde
+			self.assertEqual(cola.tomar(mas_tarde).pk, activo.pk)
+			self.assertEqual(cola.recuperar_vencidos(mas_tarde + cola.LATIDO_VENCIDO * 2), 3)
+			activo.refresh_from_db()
+			self.assertEqual((activo.estado, activo.intentos), ('error', 2))
+
+	def test_import_status_responde_304_sin_cambios(self):
+		trabajo = self._subir('DNI,NOMBRES,APELLIDO PATERNO\n62000005,Ana,Perez\n')
+		url = f'/import_status/{trabajo.archivo}/'
+		r = self.client.get(url)
+		etag = r['ETag']
+		self.assertEqual(r.status_code, 200)
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		# La espera larga vence sin cambios: 304
+		with self.settings(ASISTENCIA_IMPORT_STATUS_ESPERA=0.1):
+			self.assertEqual(self.client.get(url + '?esperar=5', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		cola.tomar()
+		r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual((r.status_code, r.json()['status']['status']), (200, 'processing'))
+		self.assertNotEqual(r['ETag'], etag)
+
+	def test_reintento_sigue_desde_el_punto_de_control(self):
+		# Una fila con error en el primer lote y otra en el que se interrumpe
+		filas = 'sin-nombre-1,,\n' + ''.join(f'6300000{i},Ana,Perez\n' for i in range(2)) + 'sin-nombre-2,,\n'
+		filas += ''.join(f'6300000{i},Ana,Perez\n' for i in range(2, 5))
+		trabajo = self._subir('DNI,NOMBRES,APELLIDO PATERNO\n' + filas)
+		original = MotorImportacion.procesar
+		lotes = []
+
+		def procesar(motor, filas):
+			lotes.append([f[0] for f in filas])
+			if len(lotes) == 2:
+				raise RuntimeError('worker reciclado')
+			return original(motor, filas)
+
+		with patch('asistencia.management.commands.import_estudiantes.TAMANO_LOTE', 2), \
+				patch.object(MotorImportacion, 'procesar', procesar):
+			cola.ejecutar(cola.tomar())
+			trabajo.refresh_from_db()
+			control = trabajo.punto_control
+			self.assertEqual((trabajo.estado, control['filas'], control['errores']), ('pendiente', 2, 1))
+			self.assertEqual(Estudiante.objects.count(), 1)
+			cola.ejecutar(cola.tomar(trabajo.disponible_desde + timedelta(seconds=1)))
+		trabajo.refresh_from_db()
+		# El reintento no vuelve a leer el primer lote ya confirmado
+		self.assertEqual(lotes[2], ['63000001', 'sin-nombre-2'])
+		self.assertEqual(len(lotes), 5)
+		self.assertEqual((trabajo.estado, trabajo.creados, trabajo.punto_control), ('ok', 5, None))
+		self.assertEqual(trabajo.lotes.get().creados, 5)
+		# El reintento sigue el mismo CSV de errores, sin repetir filas
+		self.assertEqual(trabajo.errores_log, control['log'])
+		with open(os.path.join(self.tempdir, trabajo.errores_log), newline='', encoding='utf-8') as f:
+			self.assertEqual([r['dni'] for r in csv.DictReader(f)], ['sin-nombre-1', 'sin-nombre-2'])
+
+	def test_log_de_errores_descarta_lo_no_confirmado(self):
+		mapeo = resolver_columnas(['dni', 'nombres', 'apellido'])
+		log = _LogErrores(mapeo)
+		log.agregar([{'dni': '1', 'error': 'a'}])
+		confirmado = log.tamano
+		log.agregar([{'dni': '2', 'error': 'b'}])
+		# El proceso murió antes de confirmar el segundo lote: el reintento sigue desde el punto de control
+		reintento = _LogErrores(mapeo, log.relativa, confirmado)
+		reintento.agregar([{'dni': '2', 'error': 'b'}, {'dni': '3', 'error': 'c'}])
+		with open(reintento.ruta, newline='', encoding='utf-8') as f:
+			self.assertEqual([r['dni'] for r in csv.DictReader(f)], ['1', '2', '3'])
+
+	def test_subida_por_partes_reanudable(self):
+		contenido = 'DNI,NOMBRES,APELLIDO PATERNO\n62000010,Ana,Perez\n62000011,Luis,Rojas\n'.encode('utf-8')
+		with self.settings(ASISTENCIA_SUBIDA_PARTE=32):
+			r = self.client.post('/importar/subidas/', {'nombre': 'padron.csv', 'tamano': len(contenido), 'periodo': 2026}, content_type='application/json')
+			self.assertEqual(r.status_code, 201)
+			url = f"/importar/subidas/{r.json()['subida']['id']}/"
+			partes = [contenido[i:i + 32] for i in range(0, len(contenido), 32)]
+			self.assertEqual(self.client.put(url + '?inicio=0', partes[0], content_type='application/octet-stream').status_code, 200)
+			# Parte repetida (se perdió la respuesta): 409 con lo recibido
+			r = self.client.put(url + '?inicio=0', partes[0], content_type='application/octet-stream')
+			self.assertEqual((r.status_code, r.json()['recibidos']), (409, 32))
+			r = self.client.put(url + '?inicio=32', partes[1], content_type='application/octet-stream', HTTP_X_SHA256='0' * 64)
+			self.assertEqual(r.status_code, 400)
+			# Restos de un intento que murió antes de registrar su parte
+			archivo = self.client.get(url).json()['subida']['archivo']
+			with open(os.path.join(self.tempdir, 'uploads', archivo + '.part'), 'ab') as f:
+				f.write(b'basura')
+			inicio = 32
+			for parte in partes[1:]:
+				suma = hashlib.sha256(parte).hexdigest()
+				# El renombre y el encolado esperan a que se confirme la transacción
+				with self.captureOnCommitCallbacks(execute=True) as al_confirmar:
+					r = self.client.put(f'{url}?inicio={inicio}', parte, content_type='application/octet-stream', HTTP_X_SHA256=suma)
+				self.assertEqual(r.status_code, 200)
+				self.assertEqual(len(al_confirmar), 1 if parte is partes[-1] else 0)
+				inicio += len(parte)
+			subida = self.client.get(url).json()['subida']
+		self.assertEqual(subida['estado'], 'completa')
+		# Huella de las sumas de cada parte: no se vuelve a leer el archivo
+		sumas = ''.join(hashlib.sha256(parte).hexdigest() for parte in partes)
+		self.assertEqual(subida['huella'], hashlib.sha256(sumas.encode()).hexdigest())
+		with open(os.path.join(self.tempdir, 'uploads', archivo), 'rb') as f:
+			self.assertEqual(f.read(), contenido)
+		trabajo = ImportJob.objects.get(pk=subida['trabajo'])
+		self.assertEqual((trabajo.archivo, trabajo.periodo, trabajo.estado), (archivo, 2026, 'pendiente'))
+		self.assertEqual(self.client.post('/importar/subidas/', {'nombre': 'x.pdf', 'tamano': 10}, content_type='application/json').status_code, 400)
+
+	def test_subida_completa_se_publica_aunque_falle_al_confirmar(self):
+		contenido = b'DNI,NOMBRES,APELLIDO PATERNO\n62000030,Ana,Perez\n'
+
+		def subir(fallo):
+			r = self.client.post('/importar/subidas/', {'nombre': 'padron.csv', 'tamano': len(contenido)}, content_type='application/json')
+			url = f"/importar/subidas/{r.json()['subida']['id']}/"
+			with fallo, self.captureOnCommitCallbacks(execute=True):
+				r = self.client.put(url + '?inicio=0', contenido, content_type='application/octet-stream')
+			self.assertEqual(r.status_code, 200)
+			subida = r.json()['subida']
+			self.assertEqual((subida['estado'], subida['trabajo']), ('completa', None))
+			return url, subida['archivo']
+
+		# Falla el encolado: el archivo ya tiene su nombre final y el reenvío de la parte lo encola
+		url, archivo = subir(patch.object(cola, 'encolar', side_effect=DatabaseError('sin conexión')))
+		self.assertTrue(os.path.exists(os.path.join(self.tempdir, 'uploads', archivo)))
+		self.assertFalse(ImportJob.objects.exists())
+		r = self.client.put(url + '?inicio=0', contenido, content_type='application/octet-stream')
+		self.assertEqual((r.status_code, r.json()['recibidos']), (409, len(contenido)))
+		self.assertEqual(ImportJob.objects.get().archivo, archivo)
+		self.client.put(url + '?inicio=0', contenido, content_type='application/octet-stream')
+		self.assertEqual(ImportJob.objects.count(), 1)
+
+		# Falla el renombre: queda el .part y el worker la publica antes de tomar trabajos
+		url, archivo = subir(patch('asistencia.importacion.subidas.os.replace', side_effect=OSError('disco lleno')))
+		self.assertTrue(os.path.exists(os.path.join(self.tempdir, 'uploads', archivo + '.part')))
+		call_command('procesar_importaciones', una_vez=True, stdout=StringIO())
+		self.assertEqual(ImportJob.objects.get(archivo=archivo).estado, 'ok')
+		self.assertTrue(Estudiante.objects.filter(dni='62000030').exists())
+		self.assertEqual(self.client.get(url).json()['subida']['trabajo'], ImportJob.objects.get(archivo=archivo).pk)
+
+	def test_vista_previa_web_antes_de_encolar(self):
+		archivo = SimpleUploadedFile('padron.csv', b'DNI,NOMBRES,APELLIDO PATERNO\n62000020,Ana,Perez\n,Sin,Dni\n', content_type='text/csv')
+		r = self.client.post('/importar/', {'archivo': archivo, 'periodo': 2026, 'vista_previa': 'on'})
+		self.assertIn('/import_vista_previa/', r['Location'])
+		self.assertFalse(ImportJob.objects.exists())
+		r = self.client.get(r['Location'])
+		self.assertEqual((r.context['vista']['creados'], r.context['vista']['rechazados']), (1, 1))
+		self.assertFalse(Estudiante.objects.exists())
+		nombre = r.context['nombre']
+		self.client.post(f'/import_vista_previa/{nombre}/', {'periodo': 2026})
+		trabajo = ImportJob.objects.get()
+		self.assertEqual((trabajo.archivo, trabajo.periodo), (nombre, 2026))
+
+	def test_progreso_limita_escrituras(self):
+		escritos = []
+		reloj = iter([0, 0.2, 0.5, 1.1, 1.1, 1.5, 1.6])
+		progreso = Progreso(lambda n: escritos.append(n), cada_segundos=1.0, reloj=lambda: next(reloj))
+		for n in (500, 1000, 1500, 2000, 2000, 2500):
+			progreso.avanzar(n)
+		progreso.terminar(2600)
+		self.assertEqual(escritos, [500, 2000, 2600])
+
+
+class LoteImportacionTest(TestCase):
+	def setUp(self):
+		self.tempdir = media_temporal(self)
+		self.grado = Grado.objects.create(nombre='4')
+		self.seccion = Seccion.objects.create(nombre='A', grado=self.grado)
+		self.existente = Estudiante.objects.create(
+			nombre='Original', apellido='Quispe', dni='64000000', grado=self.grado, seccion=self.seccion,
+			codigo_qr='64000000', fecha_nacimiento=datetime(2014, 5, 1).date(), periodo=2025,
+		)
+
+	def _importar(self, filas):
+		ruta = escribir_csv(self.tempdir, 'p.csv', ['DNI', 'NOMBRES', 'APELLIDO PATERNO', 'GRADO', 'SECCION', 'FECHA_NACIMIENTO'], filas)
+		call_command('import_estudiantes', ruta, periodo=2026, qr='diferido', stdout=StringIO())
+		return LoteImportacion.objects.latest('id')
+
+	def test_revertir_lote_borra_creados_y_restaura_actualizados(self):
+		lote = self._importar([
+			['64000000', 'Cambiado', 'Quispe', '5', 'B', '2015-01-02'],
+			['64000001', 'Nuevo', 'Uno', '5', 'B', ''],
+			['64000002', 'Nuevo', 'Dos', '5', 'B', ''],
+		])
+		self.assertEqual((lote.creados, lote.actualizados, lote.cambios.count()), (2, 1, 3))
+		nuevo = Estudiante.objects.get(dni='64000001')
+		fecha = date(2025, 11, 4)
+		registrar_asistencia(nuevo.id, fecha, time(12, 10), 'puntual')
+		registrar_asistencia(self.existente.id, fecha, time(12, 40), 'tarde')
+		self.assertEqual(registrados.hora_registrada(nuevo.id, fecha), time(12, 10))
+
+		salida = StringIO()
+		call_command('rollback_import', lote=lote.pk, yes=True, stdout=salida)
+		self.assertIn('Eliminados: 2, Restaurados: 1', salida.getvalue())
+		self.assertEqual(list(Estudiante.objects.values_list('dni', flat=True)), ['64000000'])
+		self.assertEqual(list(Asistencia.objects.values_list('estudiante__dni', flat=True)), ['64000000'])
+		# Lo que harían las señales de borrado: el día se olvida y el resumen se rehace
+		self.assertIsNone(registrados.hora_registrada(nuevo.id, fecha))
+		self.assertEqual(
+			list(ResumenDiario.objects.filter(fecha=fecha).values_list('seccion_id', 'puntuales', 'tardes')),
+			[(self.existente.seccion_id, 0, 1)],
+		)
+		self.existente.refresh_from_db()
+		self.assertEqual(
+			(self.existente.nombre, self.existente.grado_id, self.existente.seccion_id, self.existente.periodo, self.existente.fecha_nacimiento, self.existente.huella_importacion),
+			('Original', self.grado.pk, self.seccion.pk, 2025, datetime(2014, 5, 1).date(), ''),
+		)
+		with self.assertRaisesMessage(CommandError, 'ya fue revertido'):
+			call_command('rollback_import', lote=lote.pk, yes=True, stdout=StringIO())
+
+	def test_no_revierte_si_un_lote_posterior_toco_los_mismos_estudiantes(self):
+		primero = self._importar([['64000001', 'Nuevo', 'Uno', '5', 'B', '']])
+		segundo = self._importar([['64000001', 'Otro', 'Uno', '5', 'B', '']])
+		with self.assertRaisesMessage(ErrorReversion, str(segundo.pk)):
+			revertir(primero.pk)
+		self.assertEqual(revertir(segundo.pk), (0, 1))
+		self.assertEqual(Estudiante.objects.get(dni='64000001').nombre, 'Nuevo')
+		self.assertEqual(revertir(primero.pk), (1, 0))
+		self.assertFalse(Estudiante.objects.filter(dni='64000001').exists())
+
+	def test_no_revierte_si_un_modelo_referencia_sin_borrar(self):
+		# El DELETE directo no sigue cascadas: con una relación sin cubrir no se borra nada
+		lote = self._importar([['64000001', 'Nuevo', 'Uno', '5', 'B', '']])
+		with patch('asistencia.importacion.lotes._BORRAR_ANTES', (Asistencia,)):
+			with self.assertRaisesMessage(ErrorReversion, 'no sabe borrar'):
+				revertir(lote.pk)
+		self.assertTrue(Estudiante.objects.filter(dni='64000001').exists())
@@ -11,17 +11,25 @@ urlpatterns = [
     # Sistema de QR
     path('estudiante/<int:estudiante_id>/qr/', views.ver_qr_estudiante, name='ver_qr_estudiante'),
     path('estudiante/<int:estudiante_id>/generar-qr/', views.generar_qr_estudiante, name='generar_qr_estudiante'),
+    path('qr/<str:dni>.png', views.qr_imagen, name='qr_imagen'),
     
     # Registro de asistencia
     path('asistencia/registrar/', views.registrar_asistencia_manual, name='registrar_asistencia_manual'),
     path('asistencia/escanear/', views.registrar_asistencia_qr, name='registrar_asistencia_qr'),
+    path('asistencia/escanear/async/', views.registrar_asistencia_qr_async, name='registrar_asistencia_qr_async'),
+    path('asistencia/escanear/lote/', views.registrar_asistencia_lote, name='registrar_asistencia_lote'),
     
     # Reportes
     path('reportes/', views.reporte_asistencia, name='reporte_asistencia'),
+    path('reportes/exportar/<str:formato>/', views.exportar_reporte, name='exportar_reporte'),
     path('secciones/registrar-multiples/', views.registrar_secciones_multiples, name='registrar_secciones_multiples'),
     path('ajax/secciones/', views.secciones_por_grado, name='ajax_secciones_por_grado'),
     # Importador vía web (staff)
     path('importar/', views.importar_estudiantes_web, name='importar_estudiantes_web'),
+    path('importar/subidas/', views.import_subida_crear, name='import_subida_crear'),
+    path('importar/subidas/<uuid:subida_id>/', views.import_subida, name='import_subida'),
     path('import_status/<str:upload_name>/', views.import_status, name='import_status'),
     path('import_delete/<str:upload_name>/', views.import_delete_upload, name='import_delete_upload'),
+    path('import_revertir/<str:upload_name>/', views.import_revertir, name='import_revertir'),
+    path('import_vista_previa/<str:upload_name>/', views.import_vista_previa, name='import_vista_previa'),
 ]
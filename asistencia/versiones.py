@@ -0,0 +1,40 @@
+"""
+Versiones compartidas en el cache para invalidar datos en memoria.
+
+``resolver.py`` y ``calendario.py`` guardan datos en memoria de cada worker.
+Para que un cambio llegue a todos los workers cada uno lee una "versión" del
+cache de Django: si no coincide con la que cargó, recarga. ``Version``
+encapsula esa clave:
+
+- ``leer``/``aleer`` devuelven la versión publicada;
+- ``publicar_al_confirmar`` publica una versión nueva al confirmar la
+  transacción, una sola vez por transacción aunque se llame miles de veces
+  (una importación que guarda miles de estudiantes escribe una vez en el
+  cache).
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class Version:
+    def __init__(self, clave):
+        self.clave = clave
+
+    def leer(self):
+        return cache.get(self.clave)
+
+    async def aleer(self):
+        return await cache.aget(self.clave)
+
+    def publicar(self):
+        cache.set(self.clave, uuid.uuid4().hex, None)
+
+    def publicar_al_confirmar(self):
+        conn = transaction.get_connection()
+        # Los métodos ligados al mismo objeto son iguales (==), no idénticos
+        if conn.in_atomic_block and any(item[1] == self.publicar for item in conn.run_on_commit):
+            return
+        transaction.on_commit(self.publicar)
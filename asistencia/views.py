@@ -1,26 +1,44 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse, FileResponse, Http404
 from django.contrib import messages
 from django.utils import timezone
-from datetime import datetime, time
+from datetime import datetime
 import qrcode
 from io import BytesIO
 import base64
-from .models import Estudiante, Asistencia, Grado, Seccion, Apoderado
+from .models import Estudiante, Asistencia, Grado, Seccion, Apoderado, ResumenDiario, ImportJob, LoteImportacion, SubidaArchivo
 from .forms import SeccionMultipleForm
 from django.contrib.auth.decorators import user_passes_test
 from .forms import ImportFileForm
 from django.core.files.storage import FileSystemStorage
 from django.conf import settings
-from django.core.management import call_command
 import os
 import uuid
 from django.views.decorators.http import require_http_methods
 import json
-from . import tasks
-import threading
+from . import resolver
+from . import registro
+from . import horario
+from . import registrados
+from . import estadisticas
+from . import resumen
+from . import paginacion
+from . import exportacion
+from . import calendario
+from . import qr
+from .importacion import cola
+from .importacion import subidas
+from .importacion.columnas import ErrorColumnas, resolver_columnas
+from .importacion.lectura import ErrorLectura, Lector
+from .importacion.lotes import ErrorReversion, revertir
+from .importacion.subidas import DesfaseSubida, ErrorSubida
+from .importacion.vista_previa import previsualizar
+from django.db.models import Count, Q
 import re
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.utils.dateparse import parse_datetime
+from asgiref.sync import sync_to_async
 
 # =====================================================
 # VISTA PRINCIPAL - Dashboard
@@ -29,21 +47,8 @@ def dashboard(request):
     """
     Vista principal del sistema que muestra estadísticas generales
     """
-    total_estudiantes = Estudiante.objects.count()
-    total_grados = Grado.objects.count()
-    
-    # Asistencias de hoy
-    hoy = timezone.now().date()
-    asistencias_hoy = Asistencia.objects.filter(fecha=hoy)
-    
-    context = {
-        'total_estudiantes': total_estudiantes,
-        'total_grados': total_grados,
-        'asistencias_hoy': asistencias_hoy.count(),
-        'puntuales': asistencias_hoy.filter(estado='puntual').count(),
-        'tardes': asistencias_hoy.filter(estado='tarde').count(),
-        'faltas': asistencias_hoy.filter(estado='falta').count(),
-    }
+    # Totales del día desde el cache (ver estadisticas.py)
+    context = estadisticas.resumen_del_dia(timezone.localdate())
     return render(request, 'asistencia/dashboard.html', context)
 
 # =====================================================
@@ -140,6 +145,21 @@ def ver_qr_estudiante(request, estudiante_id):
     }
     return render(request, 'asistencia/ver_qr.html', context)
 
+
+@require_http_methods(["GET"])
+def qr_imagen(request, dni):
+    """
+    PNG del QR de un estudiante importado (``MEDIA_ROOT/qrcodes/<dni>.png``).
+    Con importación en modo diferido el archivo se genera aquí la primera vez.
+    """
+    destino = qr.ruta(dni)
+    if destino is None or not Estudiante.objects.filter(dni=dni).exists():
+        raise Http404('Estudiante no encontrado')
+    qr.asegurar(dni)
+    response = FileResponse(open(destino, 'rb'), content_type='image/png')
+    response['Content-Disposition'] = f'inline; filename="qr_{dni}.png"'
+    return response
+
 # =====================================================
 # REGISTRO DE ASISTENCIA
 # =====================================================
@@ -154,52 +174,27 @@ def registrar_asistencia_manual(request):
         
         estudiante = get_object_or_404(Estudiante, id=estudiante_id)
         
-        # Verificar si ya existe registro hoy
-        hoy = timezone.localdate()
         # usar hora local y comparar con objetos time naive
         _now_local = timezone.localtime()
         hora_actual = _now_local.time().replace(tzinfo=None)
-        # Comprobar existencia de asistencia para la fecha local calculada
-        asistencia_existente = Asistencia.objects.filter(estudiante=estudiante, fecha=hoy).first()
 
-        if asistencia_existente:
-            messages.warning(request, f'Ya existe un registro de asistencia para {estudiante} hoy.')
+        # Reglas de horario para registro manual (ver horario.py)
+        # No permitir registros antes del horario de inicio permitido
+        if hora_actual < horario.EARLIEST_REGISTRO:
+            # Mostrar en formato 12 horas para evitar ambigüedades (ej. 12:00 PM)
+            messages.error(request, f'No se puede registrar asistencia: el horario de registro inicia a las {horario.formato_hora(horario.EARLIEST_REGISTRO)}')
+        # Si se intenta registrar después del fin de clases, no se permite desde la UI
+        elif hora_actual > horario.FIN_CLASE:
+            messages.error(request, f'No se puede registrar asistencia: el día lectivo terminó a las {horario.formato_hora(horario.FIN_CLASE)}')
         else:
-            # Reglas de horario actualizadas para registro manual:
-            # - Registro permitido desde las 12:00 hasta las 17:30
-            # - Puntual: 12:00 - 12:30 (inclusive)
-            # - Tarde: después de 12:30 hasta 17:30
-            earliest_registro = time(12, 0)
-            inicio_clase = time(12, 30)
-            limite_puntual = time(12, 30)
-            fin_clase = time(17, 30)
-
-            # No permitir registros antes del horario de inicio permitido
-            if hora_actual < earliest_registro:
-                # Mostrar en formato 12 horas para evitar ambigüedades (ej. 12:00 PM)
-                messages.error(request, f'No se puede registrar asistencia: el horario de registro inicia a las {earliest_registro.strftime("%I:%M %p").lstrip("0").replace("AM","am").replace("PM","pm")}')
-            else:
-                # Si se intenta registrar después del fin de clases, no se permite desde la UI
-                if hora_actual > fin_clase:
-                    messages.error(request, f'No se puede registrar asistencia: el día lectivo terminó a las {fin_clase.strftime("%I:%M %p").lstrip("0").replace("AM","am").replace("PM","pm")}')
-                else:
-                    # Si el estado no fue enviado, deducir en base a la hora
-                    if not estado:
-                        if earliest_registro <= hora_actual <= limite_puntual:
-                            estado_calculado = 'puntual'
-                        else:
-                            estado_calculado = 'tarde'
-                    else:
-                        estado_calculado = estado
-
-                Asistencia.objects.create(
-                    estudiante=estudiante,
-                    fecha=_now_local.date(),
-                    hora=hora_actual,
-                    estado=estado_calculado,
-                    observacion=observacion
-                )
+            # Si el estado no fue enviado, deducir en base a la hora
+            estado_calculado = estado or horario.estado_para(hora_actual)
+
+            resultado = registro.registrar_asistencia(estudiante.id, _now_local.date(), hora_actual, estado_calculado, observacion)
+            if resultado.creada:
                 messages.success(request, f'Asistencia registrada para {estudiante} ({estado_calculado})')
+            else:
+                messages.warning(request, f'Ya existe un registro de asistencia para {estudiante} hoy.')
         
         return redirect('registrar_asistencia_manual')
     
@@ -220,124 +215,348 @@ def registrar_asistencia_qr(request):
     if request.method == 'POST':
         codigo_qr = request.POST.get('codigo_qr')
         
-        try:
-            estudiante = Estudiante.objects.get(codigo_qr=codigo_qr)
-            
-            # Verificar si ya se registró hoy
-            hoy = timezone.localdate()
-            # Comprobar existencia de asistencia para la fecha local calculada (más robusto)
-            # DEBUG: imprimir fecha local y registros existentes (solo para diagnóstico en tests)
-            try:
-                print(f"DEBUG: hoy={hoy} - existing_count={Asistencia.objects.filter(estudiante=estudiante, fecha=hoy).count()}")
-            except Exception:
-                pass
-            asistencia_existente = Asistencia.objects.filter(estudiante=estudiante, fecha=hoy).first()
-
-            if asistencia_existente:
-                return JsonResponse({
-                    'success': False,
-                    'message': f'{estudiante.nombre} {estudiante.apellido} ya registró asistencia hoy a las {asistencia_existente.hora.strftime("%I:%M %p").lstrip("0").replace("AM","am").replace("PM","pm")}'
-                })
-
-            # Determinar el estado según la hora y las reglas del centro
-            # usar hora local y comparar con objetos time naive
-            _now_local = timezone.localtime()
-            hora_actual = _now_local.time().replace(tzinfo=None)
-            # Reglas de horario actualizadas:
-            # - Registro permitido desde las 12:00 hasta las 17:30
-            # - Puntual: 12:00 - 12:30 (inclusive)
-            # - Tarde: después de 12:30 hasta 17:30
-            earliest_registro = time(12, 0)
-            inicio_clase = time(12, 30)
-            limite_puntual = time(12, 30)
-            fin_clase = time(17, 30)
-
-            # No permitir registros antes del horario de inicio permitido
-            if hora_actual < earliest_registro:
-                return JsonResponse({
-                    'success': False,
-                    'message': f'No es posible registrar asistencia: el horario de registro inicia a las {earliest_registro.strftime("%I:%M %p").lstrip("0").replace("AM","am").replace("PM","pm")}'
-                })
-
-            # Si ya pasó el fin de clases, no registramos via QR (las faltas se marcarán con comando al final del día)
-            if hora_actual > fin_clase:
-                return JsonResponse({
-                    'success': False,
-                    'message': f'No es posible registrar asistencia: el horario de clase finalizó a las {fin_clase.strftime("%I:%M %p").lstrip("0").replace("AM","am").replace("PM","pm")}'
-                })
-
-            # Determinar puntual/tarde
-            if earliest_registro <= hora_actual <= limite_puntual:
-                estado = 'puntual'
-            else:
-                estado = 'tarde'
-
-            # Crear el registro usando la fecha/hora local calculada (evita dependencias de auto_now_add en tests)
-            asistencia = Asistencia.objects.create(
-                estudiante=estudiante,
-                fecha=_now_local.date(),
-                hora=hora_actual,
-                estado=estado
-            )
-            try:
-                print(f"DEBUG: created asistencia id={asistencia.id} fecha={asistencia.fecha} total_for_student={Asistencia.objects.filter(estudiante=estudiante).count()}")
-            except Exception:
-                pass
-            
+        # Identificar al estudiante desde el mapa en memoria (sin consultar la BD)
+        estudiante = resolver.resolver(codigo_qr)
+        if estudiante is None:
             return JsonResponse({
-                'success': True,
-                'estudiante': f'{estudiante.nombre} {estudiante.apellido}',
-                'grado': str(estudiante.grado),
-                'seccion': str(estudiante.seccion),
-                'estado': estado,
-                'hora': asistencia.hora.strftime('%I:%M:%S %p').lstrip('0').replace('AM','am').replace('PM','pm')
+                'success': False,
+                'message': 'Código QR no válido'
             })
-            
-        except Estudiante.DoesNotExist:
+
+        # usar hora local y comparar con objetos time naive
+        _now_local = timezone.localtime()
+        hora_actual = _now_local.time().replace(tzinfo=None)
+
+        # Escaneo repetido: se responde desde el cache de registrados del día
+        hora_previa = registrados.hora_registrada(estudiante.id, _now_local.date())
+        if hora_previa:
             return JsonResponse({
                 'success': False,
-                'message': 'Código QR no válido'
+                'message': f'{estudiante.nombre} ya registró asistencia hoy a las {horario.formato_hora(hora_previa)}'
             })
+
+        # Determinar el estado según la hora y las reglas del centro (ver horario.py)
+        estado = horario.estado_para(hora_actual)
+        if estado is None:
+            # Fuera del horario de registro (las faltas se marcarán con comando al final del día)
+            return JsonResponse({
+                'success': False,
+                'message': horario.mensaje_fuera_de_horario(hora_actual)
+            })
+
+        # Un solo INSERT; si ya existía el registro de hoy se informa la hora original
+        resultado = registro.registrar_asistencia(estudiante.id, _now_local.date(), hora_actual, estado)
+        if not resultado.creada:
+            return JsonResponse({
+                'success': False,
+                'message': f'{estudiante.nombre} ya registró asistencia hoy a las {horario.formato_hora(resultado.hora)}'
+            })
+
+        return JsonResponse({
+            'success': True,
+            'estudiante': estudiante.nombre,
+            'grado': estudiante.grado,
+            'seccion': estudiante.seccion,
+            'estado': estado,
+            'hora': horario.formato_hora(resultado.hora, segundos=True)
+        })
     
     return render(request, 'asistencia/escanear_qr.html')
 
+async def registrar_asistencia_qr_async(request):
+    """
+    Versión async (ASGI) de ``registrar_asistencia_qr``.
+
+    Mismas reglas y respuestas, pero usa el ORM async, así un solo proceso
+    uvicorn atiende muchos kioskos a la vez sin un hilo por petición.
+    """
+    if request.method != 'POST':
+        return await sync_to_async(render)(request, 'asistencia/escanear_qr.html')
+
+    codigo_qr = request.POST.get('codigo_qr')
+    estudiante = await resolver.aresolver(codigo_qr)
+    if estudiante is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Código QR no válido'
+        })
+
+    _now_local = timezone.localtime()
+    hora_actual = _now_local.time().replace(tzinfo=None)
+
+    hora_previa = await registrados.ahora_registrada(estudiante.id, _now_local.date())
+    if hora_previa:
+        return JsonResponse({
+            'success': False,
+            'message': f'{estudiante.nombre} ya registró asistencia hoy a las {horario.formato_hora(hora_previa)}'
+        })
+
+    estado = horario.estado_para(hora_actual)
+    if estado is None:
+        return JsonResponse({
+            'success': False,
+            'message': horario.mensaje_fuera_de_horario(hora_actual)
+        })
+
+    resultado = await registro.aregistrar_asistencia(estudiante.id, _now_local.date(), hora_actual, estado)
+    if not resultado.creada:
+        return JsonResponse({
+            'success': False,
+            'message': f'{estudiante.nombre} ya registró asistencia hoy a las {horario.formato_hora(resultado.hora)}'
+        })
+
+    return JsonResponse({
+        'success': True,
+        'estudiante': estudiante.nombre,
+        'grado': estudiante.grado,
+        'seccion': estudiante.seccion,
+        'estado': estado,
+        'hora': horario.formato_hora(resultado.hora, segundos=True)
+    })
+
+
+MAX_ESCANEOS_POR_LOTE = 1000
+
+
+def _hora_local_escaneo(scanned_at):
+    """Convierte el ``scanned_at`` ISO 8601 de un kiosko a fecha y hora local (naive)."""
+    momento = parse_datetime(str(scanned_at or ''))
+    if momento is None:
+        return None
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    momento = timezone.localtime(momento)
+    return momento.date(), momento.time().replace(tzinfo=None)
+
+
+@require_http_methods(["POST"])
+def registrar_asistencia_lote(request):
+    """
+    Registra un lote de escaneos acumulados por un kiosko.
+
+    Recibe JSON: una lista (o ``{"escaneos": [...]}``) de objetos
+    ``{codigo_qr, scanned_at, kiosk_id, idempotency_key}``. Los códigos se
+    resuelven de una vez, las reglas de horario se aplican con el
+    ``scanned_at`` de cada escaneo y todo se escribe con un solo
+    ``bulk_create``. Devuelve un resultado por escaneo, en el mismo orden.
+
+    ``idempotency_key`` (opcional) la genera el kiosko sin conexión: si un
+    escaneo con esa clave ya fue registrado, se responde el mismo resultado
+    sin volver a escribir.
+    """
+    try:
+        payload = json.loads(request.body or b'null')
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'success': False, 'message': 'JSON no válido'}, status=400)
+    escaneos = payload.get('escaneos') if isinstance(payload, dict) else payload
+    if not isinstance(escaneos, list):
+        return JsonResponse({'success': False, 'message': 'Se esperaba una lista de escaneos'}, status=400)
+    if len(escaneos) > MAX_ESCANEOS_POR_LOTE:
+        return JsonResponse({'success': False, 'message': f'Máximo {MAX_ESCANEOS_POR_LOTE} escaneos por lote'}, status=400)
+
+    escaneos = [e if isinstance(e, dict) else {} for e in escaneos]
+    estudiantes = resolver.resolver_varios({str(e.get('codigo_qr') or '') for e in escaneos})
+
+    # Escaneos reenviados: la clave ya quedó guardada en un registro anterior
+    claves = {str(e['idempotency_key'])[:64] for e in escaneos if e.get('idempotency_key')}
+    ya_guardados = {}
+    if claves:
+        ya_guardados = {
+            clave: (hora, estado)
+            for clave, hora, estado in Asistencia.objects.filter(clave_idempotencia__in=claves).values_list('clave_idempotencia', 'hora', 'estado')
+        }
+
+    resultados = []
+    candidatos = []
+    por_clave = {}
+    for indice, escaneo in enumerate(escaneos):
+        codigo_qr = str(escaneo.get('codigo_qr') or '')
+        clave = str(escaneo['idempotency_key'])[:64] if escaneo.get('idempotency_key') else None
+        resultado = {'indice': indice, 'codigo_qr': codigo_qr, 'kiosk_id': escaneo.get('kiosk_id'), 'success': False}
+        if clave:
+            resultado['idempotency_key'] = clave
+            if clave in por_clave:
+                # Misma clave repetida dentro del lote: se completa al final
+                resultados.append(resultado)
+                continue
+            por_clave[clave] = resultado
+        resultados.append(resultado)
+        estudiante = estudiantes.get(codigo_qr)
+        if estudiante is None:
+            resultado['message'] = 'Código QR no válido'
+            continue
+        if clave in ya_guardados:
+            hora, estado = ya_guardados[clave]
+            resultado.update({
+                'success': True,
+                'repetido': True,
+                'estudiante': estudiante.nombre,
+                'grado': estudiante.grado,
+                'seccion': estudiante.seccion,
+                'estado': estado,
+                'hora': horario.formato_hora(hora, segundos=True),
+            })
+            continue
+        resultado['estudiante'] = estudiante.nombre
+        momento = _hora_local_escaneo(escaneo.get('scanned_at'))
+        if momento is None:
+            resultado['message'] = 'scanned_at no válido'
+            continue
+        fecha, hora = momento
+        estado = horario.estado_para(hora)
+        if estado is None:
+            resultado['message'] = horario.mensaje_fuera_de_horario(hora)
+            continue
+        candidatos.append((hora, estudiante, fecha, estado, clave, resultado))
+
+    # El primer escaneo del día (por hora) es el que cuenta
+    candidatos.sort(key=lambda c: c[0])
+    por_estudiante = registro.registrar_varios(
+        (estudiante.id, fecha, hora, estado, None, clave) for hora, estudiante, fecha, estado, clave, _ in candidatos
+    )
+    vistos = set()
+    for hora, estudiante, fecha, estado, _, resultado in candidatos:
+        registrado = por_estudiante[(estudiante.id, fecha)]
+        if registrado.creada and (estudiante.id, fecha) not in vistos:
+            vistos.add((estudiante.id, fecha))
+            resultado.update({
+                'success': True,
+                'grado': estudiante.grado,
+                'seccion': estudiante.seccion,
+                'estado': registrado.estado,
+                'hora': horario.formato_hora(registrado.hora, segundos=True),
+            })
+        else:
+            resultado['message'] = f'{estudiante.nombre} ya registró asistencia el {fecha:%d/%m/%Y} a las {horario.formato_hora(registrado.hora)}'
+
+    # Las repeticiones dentro del lote copian el resultado final de su clave
+    for resultado in resultados:
+        clave = resultado.get('idempotency_key')
+        if clave and por_clave[clave] is not resultado:
+            resultado.update({k: v for k, v in por_clave[clave].items() if k not in ('indice', 'kiosk_id')})
+
+    return JsonResponse({
+        'success': True,
+        'registrados': len(vistos),
+        'rechazados': sum(1 for r in resultados if not r['success']),
+        'resultados': resultados,
+    })
+
 # =====================================================
 # REPORTES
 # =====================================================
+def _filtrar_reporte(params):
+    """
+    Aplica los filtros del reporte (``fecha_inicio``, ``fecha_fin``, ``grado``,
+    ``estudiante``). Devuelve el queryset de asistencias y los filtros usados.
+    """
+    filtros = {
+        'fecha_inicio': params.get('fecha_inicio'),
+        'fecha_fin': params.get('fecha_fin'),
+        'grado_id': params.get('grado'),
+        'estudiante_id': params.get('estudiante'),
+    }
+    asistencias = Asistencia.objects.all()
+    if filtros['fecha_inicio']:
+        asistencias = asistencias.filter(fecha__gte=filtros['fecha_inicio'])
+    if filtros['fecha_fin']:
+        asistencias = asistencias.filter(fecha__lte=filtros['fecha_fin'])
+    if filtros['grado_id']:
+        asistencias = asistencias.filter(estudiante__grado_id=filtros['grado_id'])
+    if filtros['estudiante_id']:
+        asistencias = asistencias.filter(estudiante_id=filtros['estudiante_id'])
+    return asistencias, filtros
+
+
+def _totales_reporte(asistencias, filtros):
+    """
+    Conteos del reporte, calculados aparte de la página que se muestra.
+    Solo cuentan los días lectivos (ver ``calendario.py``).
+    """
+    # Sin filtro por estudiante se suman las filas de ResumenDiario
+    # (una por sección y día) en lugar de recontar las asistencias
+    if filtros['estudiante_id']:
+        return calendario.excluir_no_lectivos(asistencias).aggregate(
+            total=Count('id'),
+            puntuales=Count('id', filter=Q(estado='puntual')),
+            tardes=Count('id', filter=Q(estado='tarde')),
+            faltas=Count('id', filter=Q(estado='falta')),
+        )
+    resumenes = ResumenDiario.objects.all()
+    if filtros['fecha_inicio']:
+        resumenes = resumenes.filter(fecha__gte=filtros['fecha_inicio'])
+    if filtros['fecha_fin']:
+        resumenes = resumenes.filter(fecha__lte=filtros['fecha_fin'])
+    if filtros['grado_id']:
+        resumenes = resumenes.filter(seccion__grado_id=filtros['grado_id'])
+    return resumen.totales(calendario.excluir_no_lectivos(resumenes))
+
+
+def _porcentaje_asistencia(totales, filtros):
+    """
+    Días lectivos del rango y porcentaje de asistencia (puntuales + tardes
+    sobre días lectivos x estudiantes). ``(None, None)`` sin rango completo.
+    """
+    try:
+        desde = datetime.strptime(filtros['fecha_inicio'], '%Y-%m-%d').date()
+        hasta = datetime.strptime(filtros['fecha_fin'], '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None, None
+    dias = calendario.contar_lectivos(desde, hasta)
+    if filtros['estudiante_id']:
+        estudiantes = 1
+    else:
+        estudiantes = Estudiante.objects.all()
+        if filtros['grado_id']:
+            estudiantes = estudiantes.filter(grado_id=filtros['grado_id'])
+        estudiantes = estudiantes.count()
+    esperados = dias * estudiantes
+    if not esperados:
+        return dias, None
+    return dias, round(100 * (totales['puntuales'] + totales['tardes']) / esperados, 1)
+
+
+def _url_cursor(request, nombre, cursor):
+    if not cursor:
+        return None
+    params = request.GET.copy()
+    params.pop('despues', None)
+    params.pop('antes', None)
+    params[nombre] = cursor
+    return '?' + params.urlencode()
+
+
 def reporte_asistencia(request):
     """
-    Genera reportes de asistencia con filtros
+    Genera reportes de asistencia con filtros.
+
+    La tabla se pagina por cursor (``?despues=`` / ``?antes=``, ver
+    ``paginacion.py``) y los totales se calculan aparte, así el tiempo de
+    respuesta no crece con el rango de fechas.
     """
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-    grado_id = request.GET.get('grado')
-    estudiante_id = request.GET.get('estudiante')
-    
-    asistencias = Asistencia.objects.all().select_related('estudiante', 'estudiante__grado', 'estudiante__seccion')
-    
-    if fecha_inicio:
-        asistencias = asistencias.filter(fecha__gte=fecha_inicio)
-    if fecha_fin:
-        asistencias = asistencias.filter(fecha__lte=fecha_fin)
-    if grado_id:
-        asistencias = asistencias.filter(estudiante__grado_id=grado_id)
-    if estudiante_id:
-        asistencias = asistencias.filter(estudiante_id=estudiante_id)
-    
-    # Ordenar por fecha descendente
-    asistencias = asistencias.order_by('-fecha', '-hora')
-    
-    # Estadísticas
-    total = asistencias.count()
-    puntuales = asistencias.filter(estado='puntual').count()
-    tardes = asistencias.filter(estado='tarde').count()
-    faltas = asistencias.filter(estado='falta').count()
+    asistencias, filtros = _filtrar_reporte(request.GET)
+    pagina = paginacion.paginar(
+        asistencias.select_related('estudiante', 'estudiante__grado', 'estudiante__seccion'),
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+    )
+
+    totales = _totales_reporte(asistencias, filtros)
+    total = totales['total']
+    puntuales = totales['puntuales']
+    tardes = totales['tardes']
+    faltas = totales['faltas']
+    dias_lectivos, porcentaje_asistencia = _porcentaje_asistencia(totales, filtros)
     
     grados = Grado.objects.all()
     estudiantes = Estudiante.objects.all().select_related('grado', 'seccion')
     
     context = {
-        'asistencias': asistencias,
+        'asistencias': pagina.objetos,
+        'dias_lectivos': dias_lectivos,
+        'porcentaje_asistencia': porcentaje_asistencia,
+        'url_siguiente': _url_cursor(request, 'despues', pagina.siguiente),
+        'url_anterior': _url_cursor(request, 'antes', pagina.anterior),
         'total': total,
         'puntuales': puntuales,
         'tardes': tardes,
@@ -347,6 +566,30 @@ def reporte_asistencia(request):
     }
     return render(request, 'asistencia/reporte_asistencia.html', context)
 
+@require_http_methods(["GET"])
+def exportar_reporte(request, formato):
+    """
+    Exporta el reporte (mismos filtros que ``reporte_asistencia``) como CSV o
+    XLSX, en streaming y sin cargar el resultado en memoria.
+    """
+    asistencias, _ = _filtrar_reporte(request.GET)
+    nombre = f"asistencias_{timezone.localdate().strftime('%Y%m%d')}"
+    if formato == 'csv':
+        response = StreamingHttpResponse(exportacion.csv_stream(asistencias), content_type='text/csv; charset=utf-8')
+    elif formato == 'xlsx':
+        try:
+            contenido = exportacion.xlsx_stream(asistencias)
+        except RuntimeError as e:
+            return HttpResponse(str(e), status=500)
+        response = StreamingHttpResponse(
+            contenido,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    else:
+        return HttpResponse('Formato no soportado. Usa csv o xlsx', status=400)
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+    return response
+
 # =====================================================
 # REGISTRO MÚLTIPLE DE SECCIONES POR GRADOS
 # =====================================================
@@ -397,21 +640,14 @@ def importar_estudiantes_web(request):
         archivo = form.cleaned_data['archivo']
         periodo = form.cleaned_data.get('periodo')
 
-        # Basic validation: extension and size
-        allowed_ext = ['.xlsx', '.xls', '.csv']
-        ext = os.path.splitext(archivo.name)[1].lower()
-        if ext not in allowed_ext:
-            messages.error(request, 'Tipo de archivo no soportado. Usa .xlsx, .xls o .csv')
+        # Basic validation: extension (and openpyxl for Excel) and size
+        try:
+            ext = subidas.validar_nombre(archivo.name)
+        except ErrorSubida as e:
+            messages.error(request, str(e))
             return redirect('importar_estudiantes_web')
 
-        # If user uploaded an Excel file, ensure openpyxl is installed before accepting
-        if ext in ('.xls', '.xlsx'):
-            try:
-                import openpyxl  # noqa: F401
-            except Exception:
-                messages.error(request, 'Soporte para .xlsx no disponible en el servidor (falta openpyxl). Convierte a CSV o instala openpyxl.')
-                return redirect('importar_estudiantes_web')
-
+        # Archivos más grandes: subida por partes (import_subida_crear)
         max_size = 10 * 1024 * 1024  # 10 MB
         if archivo.size > max_size:
             messages.error(request, 'Archivo demasiado grande. Límite: 10 MB')
@@ -421,91 +657,195 @@ def importar_estudiantes_web(request):
         unique_name = f"import_{uuid.uuid4().hex}{ext}"
         fs = FileSystemStorage(location=uploads_dir)
         filename = fs.save(unique_name, archivo)
-        filepath = fs.path(filename)
-
-        # Create a status json next to the file
-        status_path = f"{filepath}.status.json"
-        status = {
-            'id': os.path.basename(filename),
-            'filename': filename,
-            'uploaded_at': str(datetime.now()),
-            'status': 'queued',
-            'periodo': periodo,
-        }
-        try:
-            with open(status_path, 'w', encoding='utf-8') as sf:
-                json.dump(status, sf, default=str, ensure_ascii=False)
-        except Exception:
-            pass
 
-        # Lanzar la importación en background (Thread) para no bloquear la request
+        if form.cleaned_data.get('vista_previa'):
+            # Se encola al confirmar la vista previa
+            url = reverse('import_vista_previa', args=[filename])
+            return redirect(f'{url}?periodo={periodo}' if periodo else url)
+
+        # La importación la hace el worker (procesar_importaciones); aquí solo se encola
         try:
-            if getattr(tasks, 'import_file_task', None):
-                try:
-                    thread = threading.Thread(target=tasks.import_file_task, args=(filepath, periodo), daemon=True)
-                    thread.start()
-                    messages.success(request, 'Archivo subido. Importación iniciada en segundo plano.')
-                except Exception as e:
-                    messages.error(request, f'Error iniciando importación en background: {e}')
-            else:
-                # Fallback: ejecutar el comando directamente (síncrono)
-                try:
-                    call_command('import_estudiantes', filepath, periodo=periodo)
-                    messages.success(request, 'Archivo subido. Importación ejecutada vía comando.')
-                except Exception as e:
-                    messages.error(request, f'Error ejecutando importación vía comando: {e}')
+            cola.encolar(filename, periodo)
+            messages.success(request, 'Archivo subido. Importación en cola.')
         except Exception as e:
-            messages.error(request, f'Error iniciando importación: {e}')
+            messages.error(request, f'Error encolando importación: {e}')
 
         return redirect('importar_estudiantes_web')
 
-    # GET: list uploads and statuses
+    # GET: list uploads and statuses (cola de importaciones y, para subidas
+    # anteriores a la cola, su .status.json)
     uploads = []
+    for trabajo in ImportJob.objects.prefetch_related('lotes')[:50]:
+        safe_id = re.sub(r'[^0-9a-zA-Z_-]', '_', trabajo.archivo)
+        uploads.append({'name': trabajo.archivo, 'path': cola.ruta(trabajo), 'status': cola.como_estado(trabajo), 'safe_id': safe_id})
+    en_cola = set(ImportJob.objects.values_list('archivo', flat=True))
     try:
         for fn in sorted(os.listdir(uploads_dir), reverse=True):
-            if fn.startswith('import_'):
+            if fn.startswith('import_') and not fn.endswith('.status.json') and fn not in en_cola:
                 full = os.path.join(uploads_dir, fn)
                 statusf = f"{full}.status.json"
-                status = None
-                if os.path.exists(statusf):
-                    try:
-                        with open(statusf, 'r', encoding='utf-8') as sf:
-                            status = json.load(sf)
-                    except Exception:
-                        status = {'status': 'unknown'}
+                if not os.path.exists(statusf):
+                    continue
+                try:
+                    with open(statusf, 'r', encoding='utf-8') as sf:
+                        status = json.load(sf)
+                except Exception:
+                    status = {'status': 'unknown'}
                 # create a safe id for DOM elements (no spaces or special chars)
                 safe_id = re.sub(r'[^0-9a-zA-Z_-]', '_', fn)
                 uploads.append({'name': fn, 'path': full, 'status': status, 'safe_id': safe_id})
     except Exception:
-        uploads = []
+        pass
 
-    return render(request, 'asistencia/importar_estudiantes.html', {'form': form, 'uploads': uploads})
+    return render(request, 'asistencia/importar_estudiantes.html', {
+        'form': form, 'uploads': uploads, 'espera': int(getattr(settings, 'ASISTENCIA_IMPORT_STATUS_ESPERA', 0)),
+    })
 
 
 @user_passes_test(lambda u: u.is_staff or u.is_superuser)
 @require_http_methods(["GET"])
-def import_status(request, upload_name):
-    """Return the parsed status JSON for a given upload file name (without directory)."""
+async def import_status(request, upload_name):
+    """
+    Progreso de una subida: fila de ImportJob o, si no hay, su .status.json.
+
+    Responde con ``ETag``; si el navegador manda el mismo en
+    ``If-None-Match`` devuelve 304 sin cuerpo. Con ``?esperar=N`` (hasta
+    ASISTENCIA_IMPORT_STATUS_ESPERA segundos) y un trabajo en curso, espera a
+    que el estado cambie antes de responder 304 (long polling).
+    """
     uploads_dir = os.path.join(settings.MEDIA_ROOT or 'media', 'uploads')
     # sanitize upload_name to avoid path traversal
     safe_name = os.path.basename(upload_name)
-    status_path = os.path.join(uploads_dir, safe_name) + '.status.json'
-    if os.path.exists(status_path):
+    anterior = request.headers.get('If-None-Match')
+    trabajo = await ImportJob.objects.prefetch_related('lotes').filter(archivo=safe_name).afirst()
+    if trabajo is not None:
+        version = await sync_to_async(cola.version)(trabajo.pk)
+        estado = await sync_to_async(cola.como_estado)(trabajo)
         try:
-            with open(status_path, 'r', encoding='utf-8') as sf:
-                data = json.load(sf)
-            return JsonResponse({'ok': True, 'status': data})
+            esperar = min(float(request.GET.get('esperar', 0)), getattr(settings, 'ASISTENCIA_IMPORT_STATUS_ESPERA', 0))
+        except ValueError:
+            esperar = 0
+        if esperar > 0 and anterior == cola.etag(estado) and trabajo.estado in cola.ESTADOS_ACTIVOS:
+            if await cola.aesperar(trabajo.pk, version, esperar):
+                trabajo = await ImportJob.objects.prefetch_related('lotes').filter(pk=trabajo.pk).afirst()
+                if trabajo is not None:
+                    estado = await sync_to_async(cola.como_estado)(trabajo)
+    else:
+        status_path = os.path.join(uploads_dir, safe_name) + '.status.json'
+        if not os.path.exists(status_path):
+            return JsonResponse({'ok': False, 'error': 'status file not found'}, status=404)
+        try:
+            estado = await sync_to_async(_leer_estado_json)(status_path)
         except Exception as e:
             return JsonResponse({'ok': False, 'error': str(e)}, status=500)
-    return JsonResponse({'ok': False, 'error': 'status file not found'}, status=404)
+    etiqueta = cola.etag(estado)
+    if anterior == etiqueta:
+        respuesta = HttpResponseNotModified()
+    else:
+        respuesta = JsonResponse({'ok': True, 'status': estado})
+    respuesta['ETag'] = etiqueta
+    respuesta['Cache-Control'] = 'no-cache'
+    return respuesta
+
+
+def _leer_estado_json(status_path):
+    with open(status_path, 'r', encoding='utf-8') as sf:
+        return json.load(sf)
+
+
+@user_passes_test(lambda u: u.is_staff or u.is_superuser)
+@require_http_methods(["GET", "POST"])
+def import_vista_previa(request, upload_name):
+    """
+    GET: simula la importación de una subida (como import_estudiantes
+    --dry-run) y muestra qué se crearía, actualizaría o rechazaría.
+    POST: la encola.
+    """
+    safe_name = os.path.basename(upload_name)
+    ruta = os.path.join(settings.MEDIA_ROOT or 'media', 'uploads', safe_name)
+    if not os.path.isfile(ruta):
+        raise Http404('Archivo no encontrado')
+    try:
+        periodo = int(request.POST.get('periodo') or request.GET.get('periodo') or 0) or None
+    except ValueError:
+        periodo = None
+    if ImportJob.objects.filter(archivo=safe_name).exists():
+        messages.info(request, 'Este archivo ya está en la cola de importaciones.')
+        return redirect('importar_estudiantes_web')
+
+    if request.method == 'POST':
+        trabajo = cola.encolar(safe_name, periodo)
+        SubidaArchivo.objects.filter(archivo=safe_name).update(trabajo=trabajo)
+        messages.success(request, 'Importación en cola.')
+        return redirect('importar_estudiantes_web')
+
+    error = None
+    vista = None
+    try:
+        with Lector(ruta) as lector:
+            vista = previsualizar(lector, resolver_columnas(lector.encabezados), periodo)
+    except (ErrorLectura, ErrorColumnas) as e:
+        error = str(e)
+    return render(request, 'asistencia/importar_vista_previa.html', {
+        'nombre': safe_name, 'periodo': periodo, 'vista': vista, 'error': error,
+    })
+
+
+@user_passes_test(lambda u: u.is_staff or u.is_superuser)
+@require_http_methods(["POST"])
+def import_subida_crear(request):
+    """
+    Inicia una subida por partes. Recibe JSON ``{nombre, tamano, periodo,
+    vista_previa}`` y devuelve el id de la subida y el tamaño de parte a usar.
+    """
+    try:
+        datos = json.loads(request.body or b'{}')
+        periodo = int(datos['periodo']) if datos.get('periodo') else None
+        subida = subidas.crear(
+            str(datos.get('nombre') or ''), int(datos.get('tamano') or 0), periodo, vista_previa=bool(datos.get('vista_previa')),
+        )
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'ok': False, 'error': f'Datos inválidos: {e}'}, status=400)
+    except ErrorSubida as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+    return JsonResponse({'ok': True, 'subida': subidas.como_estado(subida)}, status=201)
+
+
+@user_passes_test(lambda u: u.is_staff or u.is_superuser)
+@require_http_methods(["GET", "PUT"])
+def import_subida(request, subida_id):
+    """
+    GET: bytes recibidos (para reanudar). PUT ``?inicio=N``: agrega la parte
+    del cuerpo (application/octet-stream), opcionalmente con su sha256 en
+    ``X-Sha256``. Responde 409 con ``recibidos`` si la parte no empieza ahí.
+    """
+    subida = get_object_or_404(SubidaArchivo, pk=subida_id)
+    if request.method == 'PUT':
+        try:
+            inicio = int(request.GET.get('inicio', ''))
+            longitud = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return JsonResponse({'ok': False, 'error': 'Falta el parámetro inicio'}, status=400)
+        try:
+            # El cuerpo se lee por bloques desde la petición, sin request.body
+            subida = subidas.recibir(subida.pk, inicio, request, longitud, request.headers.get('X-Sha256'))
+        except DesfaseSubida as e:
+            return JsonResponse({'ok': False, 'error': str(e), 'recibidos': e.recibidos}, status=409)
+        except ErrorSubida as e:
+            return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+    return JsonResponse({'ok': True, 'subida': subidas.como_estado(subida)})
 
 
 @user_passes_test(lambda u: u.is_staff or u.is_superuser)
 @require_http_methods(["POST"])
 def import_delete_upload(request, upload_name):
-    """Delete an uploaded file and its status JSON. POST-only, staff-only."""
+    """Delete an uploaded file, its ImportJob and status JSON. POST-only, staff-only."""
     uploads_dir = os.path.join(settings.MEDIA_ROOT or 'media', 'uploads')
     safe_name = os.path.basename(upload_name)
+    if ImportJob.objects.filter(archivo=safe_name, estado='procesando').exists():
+        messages.error(request, 'La importación está en curso; espera a que termine para eliminarla.')
+        return redirect('importar_estudiantes_web')
+    ImportJob.objects.filter(archivo=safe_name).delete()
     file_path = os.path.join(uploads_dir, safe_name)
     status_path = f"{file_path}.status.json"
     removed = []
@@ -522,3 +862,21 @@ def import_delete_upload(request, upload_name):
 
     messages.success(request, f'Archivos eliminados: {len(removed)}')
     return redirect('importar_estudiantes_web')
+
+
+@user_passes_test(lambda u: u.is_staff or u.is_superuser)
+@require_http_methods(["POST"])
+def import_revertir(request, upload_name):
+    """Revierte el lote de una importación (como rollback_import --lote). POST-only, staff-only."""
+    safe_name = os.path.basename(upload_name)
+    lote = LoteImportacion.objects.filter(trabajo__archivo=safe_name, estado='activo').first()
+    if lote is None:
+        messages.error(request, 'Esta importación no tiene cambios para revertir.')
+        return redirect('importar_estudiantes_web')
+    try:
+        eliminados, restaurados = revertir(lote.pk)
+    except ErrorReversion as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, f'Importación revertida. Eliminados: {eliminados}, Restaurados: {restaurados}')
+    return redirect('importar_estudiantes_web')
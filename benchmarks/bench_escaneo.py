@@ -0,0 +1,139 @@
+"""
+Benchmark del endpoint de escaneo QR: WSGI (gunicorn sync) vs ASGI (uvicorn).
+
+Levanta cada servidor por separado y apunta este script a su URL, por ejemplo:
+
+    # WSGI (Procfile actual)
+    gunicorn sistema_asistencia.wsgi:application --workers 4 --bind 127.0.0.1:8000
+    python benchmarks/bench_escaneo.py http://127.0.0.1:8000/asistencia/escanear/ --codigo 12345678
+
+    # ASGI
+    gunicorn sistema_asistencia.asgi:application -k uvicorn_worker.UvicornWorker --workers 4 --bind 127.0.0.1:8001
+    python benchmarks/bench_escaneo.py http://127.0.0.1:8001/asistencia/escanear/async/ --codigo 12345678
+
+Reporta peticiones por segundo y latencias p50/p99. Si se repite el mismo
+código, a partir del segundo escaneo se mide la ruta "ya registró" (el caso
+típico de la cámara que lee el mismo carnet varias veces); con ``--codigos``
+se puede pasar un archivo con un código por línea.
+
+Solo usa la biblioteca estándar.
+"""
+
+import argparse
+import http.client
+import itertools
+import statistics
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+
+def _conexion(url):
+    partes = urlsplit(url)
+    clase = http.client.HTTPSConnection if partes.scheme == 'https' else http.client.HTTPConnection
+    return clase(partes.hostname, partes.port, timeout=30), partes.path or '/'
+
+
+def obtener_csrf(url):
+    """GET a la página de escaneo para obtener la cookie csrftoken."""
+    conn, path = _conexion(url)
+    conn.request('GET', path)
+    resp = conn.getresponse()
+    resp.read()
+    cookie = SimpleCookie()
+    for valor in resp.headers.get_all('Set-Cookie') or []:
+        cookie.load(valor)
+    conn.close()
+    if 'csrftoken' not in cookie:
+        raise SystemExit('No se recibió la cookie csrftoken; ¿la URL es la página de escaneo?')
+    return cookie['csrftoken'].value
+
+
+def correr(url, codigos, total, concurrencia, csrf):
+    latencias = []
+    errores = [0]
+    lock = threading.Lock()
+    contador = itertools.count()
+    ciclo = itertools.cycle(codigos)
+    host = urlsplit(url)
+    origen = f'{host.scheme}://{host.netloc}'
+
+    def trabajador():
+        conn, path = _conexion(url)
+        while next(contador) < total:
+            with lock:
+                codigo = next(ciclo)
+            cuerpo = urlencode({'codigo_qr': codigo})
+            headers = {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'Cookie': f'csrftoken={csrf}',
+                'X-CSRFToken': csrf,
+                'Referer': origen + path,
+            }
+            inicio = time.perf_counter()
+            try:
+                conn.request('POST', path, body=cuerpo, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn, path = _conexion(url)
+                ok = False
+            duracion = time.perf_counter() - inicio
+            with lock:
+                if ok:
+                    latencias.append(duracion)
+                else:
+                    errores[0] += 1
+        conn.close()
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(concurrencia)]
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return time.perf_counter() - inicio, latencias, errores[0]
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url', help='URL del endpoint de escaneo (sync o async)')
+    parser.add_argument('--codigo', action='append', default=[], help='Código QR a enviar (se puede repetir)')
+    parser.add_argument('--codigos', help='Archivo con un código QR por línea')
+    parser.add_argument('-n', '--total', type=int, default=2000, help='Número total de peticiones')
+    parser.add_argument('-c', '--concurrencia', type=int, default=50, help='Peticiones simultáneas (kioskos)')
+    args = parser.parse_args()
+
+    codigos = list(args.codigo)
+    if args.codigos:
+        with open(args.codigos, encoding='utf-8') as f:
+            codigos.extend(linea.strip() for linea in f if linea.strip())
+    if not codigos:
+        parser.error('Indica al menos un --codigo o un archivo --codigos')
+
+    csrf = obtener_csrf(args.url)
+    segundos, latencias, errores = correr(args.url, codigos, args.total, args.concurrencia, csrf)
+
+    print(f'URL:            {args.url}')
+    print(f'Peticiones:     {len(latencias)} ok, {errores} errores, concurrencia {args.concurrencia}')
+    print(f'Tiempo total:   {segundos:.2f} s')
+    print(f'Peticiones/s:   {len(latencias) / segundos:.1f}')
+    if latencias:
+        print(f'Latencia media: {statistics.mean(latencias) * 1000:.1f} ms')
+        print(f'Latencia p50:   {percentil(latencias, 50) * 1000:.1f} ms')
+        print(f'Latencia p99:   {percentil(latencias, 99) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
@@ -14,3 +15,12 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_asistencia.settings')
 
 application = get_asgi_application()
+
+# Precargar en cada worker el mapa de códigos QR usado por el escaneo
+# (ver asistencia/resolver.py). Si falla (p. ej. la base aún no está
+# migrada) se registra y el mapa se cargará en la primera consulta.
+try:
+    from asistencia import resolver
+    resolver.precargar()
+except Exception:
+    logging.getLogger(__name__).exception('No se pudo precargar el mapa de códigos QR')
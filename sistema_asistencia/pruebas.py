@@ -0,0 +1,24 @@
+"""
+Runner de tests del proyecto (``TEST_RUNNER``).
+
+Los tests usan un cache en memoria para no compartir datos (p. ej. los
+estudiantes ya registrados del día) con el servidor de desarrollo. El cambio
+se hace con ``override_settings`` al preparar el entorno de pruebas, así no
+depende de cómo se invocó ``manage.py``.
+"""
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+CACHES_TESTS = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class Runner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES=CACHES_TESTS)
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -124,6 +124,35 @@ else:
     }
 
 
+# Cache
+# Por defecto se usa un cache en archivos para que los workers de gunicorn del
+# mismo servidor compartan datos (p. ej. la versión del mapa de códigos QR).
+# Con varios servidores hace falta un cache compartido: Redis
+# (django.core.cache.backends.redis.RedisCache) o la base de datos
+# (django.core.cache.backends.db.DatabaseCache + manage.py createcachetable).
+# Se puede cambiar con DJANGO_CACHE_BACKEND / DJANGO_CACHE_LOCATION.
+#
+# MAX_ENTRIES: con el valor por defecto de Django (300) el cache en archivos
+# borra claves al azar apenas se llena, incluidas las versiones del mapa QR y
+# del calendario (timeout=None), y cada versión perdida obliga a todos los
+# workers a recargar. La aplicación guarda pocas claves (una por día para los
+# registrados, una versión por mapa), así que 10000 no se alcanza en uso normal.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', str(BASE_DIR / '.cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('DJANGO_CACHE_MAX_ENTRIES', '10000')),
+            # Al llenarse se borra 1/CULL_FREQUENCY de las claves
+            'CULL_FREQUENCY': int(os.environ.get('DJANGO_CACHE_CULL_FREQUENCY', '4')),
+        },
+    }
+}
+
+# Los tests cambian el cache por uno en memoria (ver sistema_asistencia/pruebas.py)
+TEST_RUNNER = 'sistema_asistencia.pruebas.Runner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -175,6 +204,30 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Planificador de tareas diarias (python manage.py run_scheduler, proceso
+# "clock" del Procfile). Horas locales por tarea, p. ej. {'marcar_faltas': '17:45'};
+# las que no se indiquen usan su hora por defecto (ver asistencia/planificador.py).
+ASISTENCIA_HORARIO_TAREAS = {}
+# Días que se conservan los archivos subidos en media/uploads
+ASISTENCIA_RETENCION_SUBIDAS_DIAS = int(os.environ.get('ASISTENCIA_RETENCION_SUBIDAS_DIAS', '30'))
+# QR de la importación: 'paralelo' (varios procesos durante la importación) o
+# 'diferido' (se generan al pedir /qr/<dni>.png). Ver asistencia/qr.py
+ASISTENCIA_QR_IMPORTACION = os.environ.get('ASISTENCIA_QR_IMPORTACION', 'paralelo')
+# Procesos para generar QR (vacío: núcleos disponibles)
+ASISTENCIA_QR_PROCESOS = int(os.environ.get('ASISTENCIA_QR_PROCESOS', '0')) or None
+# Cola de importaciones (python manage.py procesar_importaciones, proceso
+# "worker" del Procfile): importaciones simultáneas e intentos por archivo
+ASISTENCIA_IMPORTACION_CONCURRENCIA = int(os.environ.get('ASISTENCIA_IMPORTACION_CONCURRENCIA', '1'))
+ASISTENCIA_IMPORTACION_INTENTOS = int(os.environ.get('ASISTENCIA_IMPORTACION_INTENTOS', '3'))
+# Segundos mínimos entre escrituras del progreso de una importación
+ASISTENCIA_IMPORTACION_PROGRESO = float(os.environ.get('ASISTENCIA_IMPORTACION_PROGRESO', '1'))
+# Espera máxima (segundos) de import_status?esperar=N. 0 la desactiva; activarla
+# solo con un servidor ASGI (con workers síncronos cada espera ocupa un worker)
+ASISTENCIA_IMPORT_STATUS_ESPERA = float(os.environ.get('ASISTENCIA_IMPORT_STATUS_ESPERA', '0'))
+# Subida por partes (importar/subidas/): bytes por parte y tamaño máximo del archivo
+ASISTENCIA_SUBIDA_PARTE = int(os.environ.get('ASISTENCIA_SUBIDA_PARTE', str(2 * 1024 * 1024)))
+ASISTENCIA_SUBIDA_MAX = int(os.environ.get('ASISTENCIA_SUBIDA_MAX', str(200 * 1024 * 1024)))
+
 # Celery configuration removed — this project does not use Celery by default.
 # If you later decide to re-enable Celery, add your broker/backend settings
 # here using environment variables and recreate the Celery app module.
\ No newline at end of file